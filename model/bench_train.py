@@ -0,0 +1,180 @@
+"""
+训练流水线基准测试：生成与 scan_stats.csv 同分布形态的合成特征表，逐阶段记录
+墙钟时间、CPU 时间和峰值 RSS，结果写入 JSON 便于跨提交对比。
+
+  python bench_train.py --sizes 10000 100000 1000000 --output bench_train.json
+  python bench_train.py --sizes 10000 100000 --baseline bench_train_old.json
+
+阶段：impute_scale / k_search / labeling / smote / rf_fit / batch_scoring
+稠密 LabelSpreading 需要 n*n 内存，超过 --dense-limit 行时自动改用稀疏传播并在报告中注明。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from train_base import (feature_columns, stage_impute_scale, stage_k_search, stage_labeling,
+                        stage_rf_fit, stage_smote)
+
+
+def make_synthetic(n, random_state=42):
+    """按 scan_stats.csv 的形态生成 n 行：大多数地址只有 1~2 笔交易，少数长尾活跃地址"""
+    rng = np.random.RandomState(random_state)
+    sent = np.where(rng.rand(n) < 0.23, 0, np.floor(rng.pareto(1.6, n) + 1)).astype(np.int64)
+    received = np.where(rng.rand(n) < 0.58, 0, np.floor(rng.pareto(1.2, n) + 1)).astype(np.int64)
+    received[(sent + received) == 0] = 1
+    sent_to_contract = rng.binomial(sent, 0.6)
+    internal = np.zeros(n, dtype=np.int64)
+    balance = np.where(rng.rand(n) < 0.23, 0.0, rng.lognormal(-7, 4, n))
+    balance[rng.rand(n) < 0.0008] = np.nan
+
+    return pd.DataFrame({
+        'address': [f"0x{i:040x}" for i in range(n)],
+        'eth_balance': balance,
+        'total_txs': sent + received + internal,
+        'sent_txs': sent,
+        'received_txs': received,
+        'sent_to_contract_txs': sent_to_contract,
+        'received_from_contract_txs': internal,
+        'external_txs': sent + received,
+        'internal_txs': internal,
+    })
+
+
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import psutil
+        return psutil.Process().memory_info().rss
+
+
+class StageProfiler:
+    """记录每个阶段的墙钟/CPU 时间，并用后台线程采样该阶段内的峰值 RSS"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stages = []
+
+    def run(self, name, fn):
+        peak = [_rss_bytes()]
+        start_rss = peak[0]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(self.interval):
+                peak[0] = max(peak[0], _rss_bytes())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            result = fn()
+        finally:
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            stop.set()
+            sampler.join()
+        peak[0] = max(peak[0], _rss_bytes())
+        self.stages.append({
+            'stage': name,
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'peak_rss_mb': round(peak[0] / 2 ** 20, 1),
+            'rss_delta_mb': round((peak[0] - start_rss) / 2 ** 20, 1),
+        })
+        print(f"  {name:<14} wall={wall:8.2f}s cpu={cpu:8.2f}s peak_rss={peak[0] / 2 ** 20:8.1f}MB")
+        return result
+
+
+def bench_size(n, args):
+    data = make_synthetic(n)
+    X = data[feature_columns]
+    prof = StageProfiler()
+    labeling = args.labeling
+    if labeling == 'dense' and n > args.dense_limit:
+        labeling = 'sparse'
+
+    print(f"[bench] n={n} labeling={labeling}")
+    imputer, scaler, X_scaled = prof.run('impute_scale', lambda: stage_impute_scale(X))
+    stable_k, cluster_labels = prof.run('k_search', lambda: stage_k_search(X_scaled, args.k_search))
+    is_casual = cluster_labels == np.bincount(cluster_labels).argmax()
+    semi_pred = prof.run('labeling', lambda: stage_labeling(X_scaled, is_casual, labeling, args.knn, args.landmarks))
+    X_res, y_res, semi_pred = prof.run('smote', lambda: stage_smote(X_scaled, semi_pred))
+    rf = prof.run('rf_fit', lambda: stage_rf_fit(X_res, y_res))
+
+    def batch_scoring():
+        # 与 prediction.py 相同的 imputer -> scaler -> rf 链路，按块批量打分
+        out = np.empty(n)
+        for start in range(0, n, args.score_chunk):
+            chunk = X.iloc[start:start + args.score_chunk]
+            out[start:start + len(chunk)] = rf.predict_proba(scaler.transform(imputer.transform(chunk)))[:, 1]
+        return out
+
+    prof.run('batch_scoring', batch_scoring)
+    return {'rows': n, 'labeling': labeling, 'k_search': args.k_search, 'stable_k': int(stable_k),
+            'stages': prof.stages}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    """与旧报告逐阶段比较墙钟时间与峰值内存"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(r['rows'], s['stage']): s for r in baseline['results'] for s in r['stages']}
+    print(f"\n对比基线 {baseline_path}（commit {baseline.get('commit')}）:")
+    for r in report['results']:
+        for s in r['stages']:
+            o = old.get((r['rows'], s['stage']))
+            if not o:
+                continue
+            ratio = s['wall_seconds'] / o['wall_seconds'] if o['wall_seconds'] else float('inf')
+            print(f"  n={r['rows']:<9} {s['stage']:<14} wall x{ratio:5.2f}  "
+                  f"peak_rss {o['peak_rss_mb']:.0f}MB -> {s['peak_rss_mb']:.0f}MB")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="训练流水线逐阶段基准测试")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--k-search", choices=["full", "fast"], default="fast")
+    ap.add_argument("--labeling", choices=["dense", "sparse"], default="sparse")
+    ap.add_argument("--dense-limit", type=int, default=15000, help="超过该行数不再跑稠密 LabelSpreading")
+    ap.add_argument("--knn", type=int, default=10)
+    ap.add_argument("--landmarks", type=int, default=0)
+    ap.add_argument("--score-chunk", type=int, default=100000)
+    ap.add_argument("--output", default="bench_train.json")
+    ap.add_argument("--baseline", help="旧的报告文件，用于输出回归对比")
+    args = ap.parse_args()
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'sklearn': sklearn.__version__,
+        'cpu_count': os.cpu_count(),
+        'results': [bench_size(n, args) for n in args.sizes],
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n报告已写入 {args.output}")
+
+    if args.baseline:
+        compare(report, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
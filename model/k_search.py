@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans
+
+K_RANGE = range(2, 11)
+DEFAULT_K = 5
+
+
+def _is_stable(history, tol=0.01):
+    """最大簇规模连续两次相对变化都小于 tol 则认为稳定"""
+    if len(history) < 3:
+        return False
+    change1 = abs(history[-1] - history[-2]) / history[-2]
+    change2 = abs(history[-2] - history[-3]) / history[-3]
+    return change1 < tol and change2 < tol
+
+
+def search_k_full(X_scaled, k_range=K_RANGE, random_state=42):
+    """原始做法：逐个 k 在全量数据上跑 KMeans(n_init=10)，稳定后再重新拟合一次"""
+    stable_k = DEFAULT_K
+    cluster_size_history = []
+    for k in k_range:
+        kmeans = KMeans(n_clusters=k, random_state=random_state, n_init=10)
+        cluster_labels = kmeans.fit_predict(X_scaled)
+        cluster_size_history.append(np.bincount(cluster_labels).max())
+        if _is_stable(cluster_size_history):
+            stable_k = k
+            break
+
+    kmeans_final = KMeans(n_clusters=stable_k, random_state=random_state, n_init=10)
+    final_cluster_labels = kmeans_final.fit_predict(X_scaled)
+    return stable_k, kmeans_final, final_cluster_labels
+
+
+def _fit_candidate(X_fit, X_scaled, k, random_state, n_init):
+    model = KMeans(n_clusters=k, random_state=random_state, n_init=n_init)
+    model.fit(X_fit)
+    # 在子样本上拟合，但簇规模按全量数据统计，和原始判据口径一致
+    labels = model.labels_ if X_fit is X_scaled else model.predict(X_scaled)
+    return k, model, labels, np.bincount(labels, minlength=k).max()
+
+
+def search_k_fast(X_scaled, k_range=K_RANGE, random_state=42, sample_size=100000,
+                  n_init=10, n_jobs=-1):
+    """
+    快速 k 搜索：
+    - 数据量超过 sample_size 时只在子样本上拟合，簇规模仍按全量数据统计
+    - 候选 k 按 CPU 核数分批并行评估，批内结果按 k 顺序套用原始稳定判据
+    - 直接复用胜出候选的模型与标签，不再全量重拟合
+    注：MiniBatchKMeans 会把占绝大多数的普通用户簇拆散（最大簇规模剧烈波动），
+    选不出与原流程一致的 k，因此探索性拟合仍用 Lloyd KMeans，只靠子采样提速。
+    """
+    n = X_scaled.shape[0]
+    if sample_size and n > sample_size:
+        rng = np.random.RandomState(random_state)
+        X_fit = X_scaled[rng.choice(n, sample_size, replace=False)]
+    else:
+        X_fit = X_scaled
+
+    k_list = list(k_range)
+    wave = max(3, os.cpu_count() if n_jobs == -1 else n_jobs)
+    cluster_size_history = []
+    results = {}
+    with Parallel(n_jobs=n_jobs, prefer='threads') as parallel:
+        for i in range(0, len(k_list), wave):
+            batch = k_list[i:i + wave]
+            for k, model, labels, largest in parallel(
+                    delayed(_fit_candidate)(X_fit, X_scaled, k, random_state, n_init)
+                    for k in batch):
+                results[k] = (model, labels, largest)
+            for k in batch:
+                cluster_size_history.append(results[k][2])
+                if _is_stable(cluster_size_history):
+                    return k, results[k][0], results[k][1]
+
+    # 没有稳定点时沿用原始默认值
+    if DEFAULT_K not in results:
+        _, model, labels, _ = _fit_candidate(X_fit, X_scaled, DEFAULT_K, random_state, n_init)
+        return DEFAULT_K, model, labels
+    return DEFAULT_K, results[DEFAULT_K][0], results[DEFAULT_K][1]
+
+
+def find_stable_k(X_scaled, mode='full', **kwargs):
+    """返回 (stable_k, 最终 KMeans 模型, 全量簇标签)"""
+    if mode == 'fast':
+        return search_k_fast(X_scaled, **kwargs)
+    return search_k_full(X_scaled, **kwargs)
@@ -0,0 +1,114 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.neighbors import NearestNeighbors
+
+
+class SparseLabelSpreading:
+    """
+    稀疏 kNN 图上的 LabelSpreading，接口与 sklearn 的 LabelSpreading 保持一致
+    （fit 后提供 classes_ / label_distributions_ / transduction_ / n_iter_）。
+
+    - 近邻用 KD 树 / Ball 树检索，只保留每个点的 n_neighbors 条边，边权沿用 rbf: exp(-gamma*d^2)
+    - 迭代 F = alpha*S*F + (1-alpha)*Y 全程在稀疏矩阵上完成，内存约为 O(n * n_neighbors)
+    - 设置 n_landmarks 时只在按标签分层抽取的地标点上传播，其余点按最近地标加权插值
+    """
+
+    def __init__(self, n_neighbors=10, gamma=0.1, alpha=0.2, max_iter=500, tol=1e-3,
+                 n_landmarks=None, algorithm='auto', chunk_size=50000, random_state=42, n_jobs=None):
+        self.n_neighbors = n_neighbors
+        self.gamma = gamma
+        self.alpha = alpha
+        self.max_iter = max_iter
+        self.tol = tol
+        self.n_landmarks = n_landmarks
+        self.algorithm = algorithm
+        self.chunk_size = chunk_size
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+
+    def _knn_weights(self, nn, X, n_neighbors, skip_self):
+        """分块查询近邻，返回 (距离权重, 近邻下标)，避免一次性生成全量距离矩阵"""
+        k = n_neighbors + 1 if skip_self else n_neighbors
+        weights, indices = [], []
+        for start in range(0, X.shape[0], self.chunk_size):
+            dist, ind = nn.kneighbors(X[start:start + self.chunk_size], n_neighbors=k)
+            if skip_self:
+                dist, ind = dist[:, 1:], ind[:, 1:]
+            weights.append(np.exp(-self.gamma * dist ** 2))
+            indices.append(ind)
+        return np.vstack(weights), np.vstack(indices)
+
+    def _graph(self, X):
+        n = X.shape[0]
+        k = min(self.n_neighbors, n - 1)
+        nn = NearestNeighbors(algorithm=self.algorithm, n_jobs=self.n_jobs).fit(X)
+        weights, indices = self._knn_weights(nn, X, k, skip_self=True)
+        rows = np.repeat(np.arange(n), k)
+        W = sp.csr_matrix((weights.ravel(), (rows, indices.ravel())), shape=(n, n))
+        W = W.maximum(W.T)
+        W.setdiag(0)
+        W.eliminate_zeros()
+        # 归一化拉普拉斯对应的 S = D^-1/2 W D^-1/2，孤立点度数按 1 处理
+        degree = np.asarray(W.sum(axis=1)).ravel()
+        degree[degree == 0] = 1.0
+        d_inv_sqrt = sp.diags(1.0 / np.sqrt(degree))
+        return (d_inv_sqrt @ W @ d_inv_sqrt).tocsr()
+
+    def _propagate(self, X, Y_static):
+        S = self._graph(X)
+        F = Y_static.copy()
+        for n_iter in range(1, self.max_iter + 1):
+            F_prev = F
+            F = self.alpha * (S @ F) + (1 - self.alpha) * Y_static
+            if np.abs(F - F_prev).sum() < self.tol:
+                break
+        return F, n_iter
+
+    def _pick_landmarks(self, y):
+        """按标签分层抽取地标点，保证每个已知类别至少有一个地标"""
+        rng = np.random.RandomState(self.random_state)
+        frac = self.n_landmarks / len(y)
+        picked = []
+        for value in np.unique(y):
+            members = np.flatnonzero(y == value)
+            size = max(1, int(round(len(members) * frac)))
+            picked.append(rng.choice(members, min(size, len(members)), replace=False))
+        return np.sort(np.concatenate(picked))
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y)
+        n = X.shape[0]
+        self.classes_ = np.unique(y[y != -1])
+
+        Y_static = np.zeros((n, len(self.classes_)))
+        for i, c in enumerate(self.classes_):
+            Y_static[y == c, i] = 1.0
+
+        if self.n_landmarks and n > self.n_landmarks:
+            landmarks = self._pick_landmarks(y)
+            F_land, self.n_iter_ = self._propagate(X[landmarks], Y_static[landmarks])
+
+            # 非地标点：按最近 n_neighbors 个地标的 rbf 权重插值
+            nn = NearestNeighbors(algorithm=self.algorithm, n_jobs=self.n_jobs).fit(X[landmarks])
+            k = min(self.n_neighbors, len(landmarks))
+            F = np.empty_like(Y_static)
+            for start in range(0, n, self.chunk_size):
+                stop = min(start + self.chunk_size, n)
+                weights, ind = self._knn_weights(nn, X[start:stop], k, skip_self=False)
+                norm = weights.sum(axis=1, keepdims=True)
+                norm[norm == 0] = 1.0
+                interp = np.einsum('ij,ijc->ic', weights / norm, F_land[ind])
+                F[start:stop] = interp
+            # 已标注点保留自身标签，地标点直接用传播结果
+            labeled = y != -1
+            F[labeled] = Y_static[labeled]
+            F[landmarks] = F_land
+        else:
+            F, self.n_iter_ = self._propagate(X, Y_static)
+
+        normalizer = F.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0] = 1.0
+        self.label_distributions_ = F / normalizer
+        self.transduction_ = self.classes_[np.argmax(self.label_distributions_, axis=1)]
+        return self
@@ -1,16 +1,26 @@
-from langchain_openai import ChatOpenAI
-from langchain.agents import tool, AgentExecutor, create_openai_tools_agent
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import SystemMessage
+import os
+import re
+import threading
+import time
+
+try:
+    from . import prediction as pre
+    from .fast_score import UNCERTAINTY_BAND, RouteStats, clamp_score, deterministic_score, is_clear_cut
+    from .score_cache import ScoreCache, canonical_features, feature_columns
+except ImportError:
+    import prediction as pre
+    from fast_score import UNCERTAINTY_BAND, RouteStats, clamp_score, deterministic_score, is_clear_cut
+    from score_cache import ScoreCache, canonical_features, feature_columns
+
+
+SYSTEM_PROMPT = "你是defiAi领域专业信用评估师，对于评估流程，你会先使用你的工具去分析该用户是否为专业用户，在使用工具时，请严格输入如下方例子的数据，否则你的调用将会失败，例子:{'eth_balance': 1.6,'total_txs': 630,'sent_txs': 350,'received_txs': 280,'sent_to_contract_txs': 220,'received_from_contract_txs': 180,'external_txs' : 150,'internal_txs' : 100}；你将会得到一个专业度，专业度越高，代表该用户越有可能是专业用户，然后再根据用户基本情况给出你的信用评分(范围100-800)，只需要输出分数，如：150；不要做过多输出！"
 
 
-@tool
 def is_professional(data):
     """
     输入用户数据进行专业度预测
     用户数据例子:{'eth_balance': 1.6,'total_txs': 630,'sent_txs': 350,'received_txs': 280,'sent_to_contract_txs': 220,'received_from_contract_txs': 180,'external_txs' : 150,'internal_txs' : 100}
     """
-    from prediction_models import pre
     try:
         return f'专业度：{pre.predict_professional(data)}'
     except:
@@ -18,44 +28,124 @@ def is_professional(data):
 #目前有死循环bug，但不报错就没问题
 
 
+_agent_executor = None
+_agent_lock = threading.Lock()
 
-#为了安全考虑这里一般采用环境变量
 
-llm = ChatOpenAI(
-    model='ep-20250412204128-bhvmc',
-    api_key='e4324917-1d07-45b5-b157-f730db66b1c3',
-    temperature=0.5,
-    max_tokens=None,
-    base_url='https://ark.cn-beijing.volces.com/api/v3'
+def get_agent_executor():
+    """
+    按需构建 agent（每个进程只构建一次）。langchain 等重依赖在这里才导入，
+    只走本地快速通道的进程完全不需要加载它们
+    """
+    global _agent_executor
+    if _agent_executor is not None:
+        return _agent_executor
+    with _agent_lock:
+        if _agent_executor is not None:
+            return _agent_executor
+
+        from langchain_openai import ChatOpenAI
+        from langchain.agents import tool, AgentExecutor, create_openai_tools_agent
+        from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+        from langchain_core.messages import SystemMessage
+
+        #为了安全考虑这里一般采用环境变量
+
+        llm = ChatOpenAI(
+            model=os.environ.get('LLM_MODEL', 'ep-20250412204128-bhvmc'),
+            api_key=os.environ.get('LLM_API_KEY', 'e4324917-1d07-45b5-b157-f730db66b1c3'),
+            temperature=0.5,
+            max_tokens=None,
+            base_url=os.environ.get('LLM_BASE_URL', 'https://ark.cn-beijing.volces.com/api/v3')
+        )
+
+        #可适当调低温度
+
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=SYSTEM_PROMPT),
+            ("user", "{input}"),
+            MessagesPlaceholder(variable_name="agent_scratchpad"),
+        ])
+
+        tools = [tool(is_professional)]
+
+        agent = create_openai_tools_agent(llm, tools, prompt)
+
+        _agent_executor = AgentExecutor(
+            agent=agent,
+            tools=tools,
+            verbose=os.environ.get('AGENT_VERBOSE', '1') == '1',
+            handle_parsing_errors=True
+        )
+        return _agent_executor
+
+
+#信用分缓存：键为(模型版本, 规范化后的8维特征)，模型热重载时随专业度缓存一起清空
+score_cache = ScoreCache(
+    maxsize=int(os.environ.get('SCORE_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('SCORE_CACHE_TTL', '600')),
 )
+pre.reload_hooks.append(score_cache.clear)
 
-#可适当调低温度
 
-prompt = ChatPromptTemplate.from_messages([
-    SystemMessage(content="你是defiAi领域专业信用评估师，对于评估流程，你会先使用你的工具去分析该用户是否为专业用户，在使用工具时，请严格输入如下方例子的数据，否则你的调用将会失败，例子:{'eth_balance': 1.6,'total_txs': 630,'sent_txs': 350,'received_txs': 280,'sent_to_contract_txs': 220,'received_from_contract_txs': 180,'external_txs' : 150,'internal_txs' : 100}；你将会得到一个专业度，专业度越高，代表该用户越有可能是专业用户，然后再根据用户基本情况给出你的信用评分(范围100-800)，只需要输出分数，如：150；不要做过多输出！"),
-    ("user", "{input}"),
-    MessagesPlaceholder(variable_name="agent_scratchpad"),
-])
+#各评分通道的请求数与耗时：fast=本地确定性评分，llm=agent 评分，llm_fallback=agent 输出无法解析
+route_stats = RouteStats()
 
-tools = [is_professional]
 
+def parse_score(output):
+    """从模型输出中取最后一个落在 100-800 内的整数作为信用分，取不到返回 None"""
+    for m in reversed(re.findall(r'\d+', str(output))):
+        if 100 <= int(m) <= 800:
+            return int(m)
+    return None
 
 
-agent = create_openai_tools_agent(llm, tools, prompt)
+def _agent_input(user_features):
+    data = dict(zip(feature_columns, canonical_features(user_features)))
+    return {"input": f"用户数据:{data}请进行信用分判断，只需输出分数，不要做过多输出！不要做过多输出！不要做过多输出！"}
 
 
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    verbose=True,
-    handle_parsing_errors=True
-)
+def llm_score(user_features):
+    response = get_agent_executor().invoke(_agent_input(user_features))
+    return parse_score(response['output'])
+
+
+async def allm_score(user_features):
+    """llm_score 的异步版本，供批量并发评分使用"""
+    response = await get_agent_executor().ainvoke(_agent_input(user_features))
+    return parse_score(response['output'])
+
+
+def credit_score(user_features, use_cache=True, band=None):
+    """
+    给出信用分(100-800)：专业度明显偏低/偏高时直接用本地确定性评分，
+    只有落在不确定区间内的才调用 agent；相同特征、相同区间在缓存有效期内直接返回
+    """
+    band = tuple(band or UNCERTAINTY_BAND)
+
+    def run():
+        t0 = time.perf_counter()
+        pro = pre.predict_professional(user_features)
+        if is_clear_cut(pro, band):
+            score, path = deterministic_score(pro, user_features), 'fast'
+        else:
+            score, path = llm_score(user_features), 'llm'
+            if score is None:
+                score, path = deterministic_score(pro, user_features), 'llm_fallback'
+        route_stats.record(path, time.perf_counter() - t0)
+        return clamp_score(score)
+
+    if not use_cache:
+        return run()
+    key = (pre.model_version(), band, canonical_features(user_features))
+    return score_cache.get_or_compute(key, run)
+
 
-#data这里格式见上方工具的用户例子，一定是对应格式，不然会报错！(这里没定义，你看怎么写)
+if __name__ == "__main__":
+    #data这里格式见上方工具的用户例子，一定是对应格式，不然会报错！
 
-response = (agent_executor.invoke({"input": "用户数据:{'eth_balance': 1.6,'total_txs': 630,'sent_txs': 350,'received_txs': 280,'sent_to_contract_txs': 220,'received_from_contract_txs': 180,'external_txs' : 150,'internal_txs' : 100}请进行信用分判断，只需输出分数，不要做过多输出！不要做过多输出！不要做过多输出！"}))
-score = response['output']
+    score = credit_score({'eth_balance': 1.6,'total_txs': 630,'sent_txs': 350,'received_txs': 280,'sent_to_contract_txs': 220,'received_from_contract_txs': 180,'external_txs' : 150,'internal_txs' : 100})
 
-print(f'信用分：{score}')
+    print(f'信用分：{score}')
 
-#score就是输出分数
\ No newline at end of file
+    #score就是输出分数
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+批量并发信用评分：读取特征文件，通过 agent 异步并发评分，结果按完成顺序逐行写出。
+
+- --concurrency 控制同时在途的 agent 调用数，--rate 限制每秒发起的调用数（0=不限）
+- agent 输出无法解析时最多重试 --retries 次，仍失败则退回本地确定性评分并标记为 llm_fallback
+- 默认与 credit_score 相同：明显的样本走本地快速通道；--agent-only 则全部交给 agent
+- 单条评分出错（特征异常、模型报错等）只记一行 path=error 的结果，不影响其他行
+- --stub-latency 会在进程内启动 stub_llm 桩服务，离线压测吞吐量与并发表现
+
+  python batch_score.py --data scan_stats.csv --output scores.jsonl --concurrency 16 --rate 20
+  python batch_score.py --data scan_stats.csv --limit 500 --agent-only --stub-latency 0.5 --concurrency 32
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from score_cache import feature_columns
+
+
+class RateLimiter:
+    """简单的异步限速器：保证相邻两次放行至少间隔 1/rate 秒"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ResultWriter:
+    """按完成顺序逐行写出结果，支持 .jsonl 与 .csv"""
+
+    fields = ['index', 'address', 'score', 'path', 'professional', 'attempts', 'seconds', 'error']
+
+    def __init__(self, path):
+        self._f = open(path, 'w', encoding='utf-8', newline='')
+        self._csv = None
+        if path.endswith('.csv'):
+            self._csv = csv.DictWriter(self._f, fieldnames=self.fields)
+            self._csv.writeheader()
+
+    def write(self, row):
+        if self._csv:
+            self._csv.writerow(row)
+        else:
+            self._f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def iter_rows(path, chunksize=10000, limit=0):
+    """逐块读取特征文件，返回 (行号, 地址, 特征 dict)"""
+    n = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        for record in chunk.to_dict('records'):
+            if limit and n >= limit:
+                return
+            yield n, record.get('address'), {c: record.get(c) for c in feature_columns}
+            n += 1
+
+
+async def score_one(agent, features, limiter, retries, agent_only):
+    pro = await asyncio.to_thread(agent.pre.predict_professional, features)
+    if not agent_only and agent.is_clear_cut(pro):
+        return agent.deterministic_score(pro, features), 'fast', pro, 0
+
+    attempts = 0
+    for attempts in range(1, retries + 2):
+        await limiter.wait()
+        try:
+            score = await agent.allm_score(features)
+        except Exception as e:
+            print(f"[batch warn] agent 调用失败 attempt {attempts}: {e}")
+            score = None
+        if score is not None:
+            return score, 'llm', pro, attempts
+    return agent.deterministic_score(pro, features), 'llm_fallback', pro, attempts
+
+
+async def run_batch(agent, rows, writer, concurrency=8, rate=0.0, retries=2, agent_only=False):
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    limiter = RateLimiter(rate)
+    done = {'count': 0}
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            index, address, features = item
+            t0 = time.perf_counter()
+            # 任何异常都只影响这一行：worker 退出后生产者会卡在有界队列的 put 上
+            try:
+                score, path, pro, attempts = await score_one(agent, features, limiter, retries, agent_only)
+                elapsed = time.perf_counter() - t0
+                agent.route_stats.record(path, elapsed)
+                row = {'index': index, 'address': address, 'score': agent.clamp_score(score), 'path': path,
+                       'professional': round(pro, 6), 'attempts': attempts, 'seconds': round(elapsed, 4)}
+            except Exception as e:
+                print(f"[batch warn] 第 {index} 行评分失败: {e!r}")
+                row = {'index': index, 'address': address, 'score': None, 'path': 'error', 'professional': None,
+                       'attempts': 0, 'seconds': round(time.perf_counter() - t0, 4), 'error': repr(e)}
+            try:
+                writer.write(row)
+                done['count'] += 1
+            except Exception as e:
+                print(f"[batch warn] 第 {index} 行写出失败: {e!r}")
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for item in rows:
+        await queue.put(item)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    return done['count']
+
+
+def main():
+    ap = argparse.ArgumentParser(description="通过 agent 批量并发信用评分")
+    ap.add_argument("--data", default="scan_stats.csv")
+    ap.add_argument("--output", default="credit_scores.jsonl", help=".jsonl 或 .csv")
+    ap.add_argument("--limit", type=int, default=0, help="最多评分的行数（0=全部）")
+    ap.add_argument("--concurrency", type=int, default=8, help="同时在途的评分请求数")
+    ap.add_argument("--rate", type=float, default=0.0, help="每秒最多发起的 agent 调用数（0=不限）")
+    ap.add_argument("--retries", type=int, default=2, help="输出无法解析时的重试次数")
+    ap.add_argument("--agent-only", action="store_true", help="全部交给 agent，不走本地快速通道")
+    ap.add_argument("--stub-latency", type=float, default=None, help="启动本地桩 LLM 并设置其延迟（秒）")
+    args = ap.parse_args()
+
+    server = None
+    if args.stub_latency is not None:
+        from stub_llm import start_stub_server
+        server, base_url = start_stub_server(latency=args.stub_latency)
+        os.environ['LLM_BASE_URL'] = base_url
+        os.environ['LLM_API_KEY'] = 'stub'
+
+    os.environ.setdefault('AGENT_VERBOSE', '0')
+    import agent
+
+    writer = ResultWriter(args.output)
+    t0 = time.perf_counter()
+    try:
+        n = asyncio.run(run_batch(agent, iter_rows(args.data, limit=args.limit), writer,
+                                  args.concurrency, args.rate, args.retries, args.agent_only))
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - t0
+
+    print(json.dumps(agent.route_stats.stats(), indent=2, ensure_ascii=False))
+    print(f"共评分 {n} 条，耗时 {elapsed:.2f}s，吞吐 {n / elapsed if elapsed else 0:.1f} 条/秒，结果已写入 '{args.output}'")
+    if server:
+        print(f"桩 LLM 请求数 {server.state.requests}，最大并发 {server.state.max_in_flight}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
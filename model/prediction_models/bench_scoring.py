@@ -0,0 +1,48 @@
+"""
+信用评分通道压测：用本地桩 LLM 代替远端模型，统计快速通道占比与各通道耗时。
+
+  python bench_scoring.py --data ../../pythonFile/scan_stats.csv --rows 500 --latency 0.3
+  python bench_scoring.py --rows 200 --band 0.0 1.0     # 强制全部走 agent，对比纯 LLM 通道耗时
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm import start_stub_server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="信用评分快速通道/LLM 通道压测")
+    ap.add_argument("--data", default="scan_stats.csv")
+    ap.add_argument("--rows", type=int, default=500)
+    ap.add_argument("--latency", type=float, default=0.3, help="桩 LLM 每次请求的延迟（秒）")
+    ap.add_argument("--band", type=float, nargs=2, default=None, help="不确定区间 low high")
+    args = ap.parse_args()
+
+    server, base_url = start_stub_server(latency=args.latency)
+    os.environ['LLM_BASE_URL'] = base_url
+    os.environ['LLM_API_KEY'] = 'stub'
+    os.environ['AGENT_VERBOSE'] = '0'
+    import agent
+
+    rows = pd.read_csv(args.data).sample(n=args.rows, random_state=42, replace=True)
+    t0 = time.perf_counter()
+    for _, row in rows.iterrows():
+        agent.credit_score(row, use_cache=False, band=tuple(args.band) if args.band else None)
+    elapsed = time.perf_counter() - t0
+
+    stats = agent.route_stats.stats()
+    print(json.dumps(stats, indent=2, ensure_ascii=False))
+    fast = stats.get('fast', {}).get('fraction', 0.0)
+    print(f"快速通道占比: {fast:.2%}，共 {args.rows} 条，耗时 {elapsed:.2f}s，桩 LLM 请求数 {server.state.requests}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
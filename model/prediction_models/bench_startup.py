@@ -0,0 +1,58 @@
+"""
+冷启动测量：在全新子进程中测 agent 模块导入耗时与首次评分耗时（time-to-first-score）。
+
+  python bench_startup.py --runs 3
+  python bench_startup.py --runs 3 --latency 0.3   # LLM 通道使用的桩服务延迟
+
+path=fast 的首次评分只加载 pandas/sklearn/模型文件；path=llm 才会导入 langchain 并构建 agent。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from stub_llm import start_stub_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import agent
+t_import = time.perf_counter() - t0
+band = (0.0, 1.0) if sys.argv[1] == 'llm' else None
+sample = {'eth_balance': 1.6,'total_txs': 630,'sent_txs': 350,'received_txs': 280,'sent_to_contract_txs': 220,'received_from_contract_txs': 180,'external_txs' : 150,'internal_txs' : 100}
+t1 = time.perf_counter()
+agent.credit_score(sample, use_cache=False, band=band)
+t_first = time.perf_counter() - t1
+print(json.dumps({'import_s': t_import, 'first_score_s': t_first, 'total_s': t_import + t_first,
+                  'langchain_loaded': 'langchain' in sys.modules, 'sklearn_loaded': 'sklearn' in sys.modules}))
+'''
+
+
+def run_child(path, env):
+    out = subprocess.check_output([sys.executable, '-c', _CHILD, path], cwd=HERE, env=env, text=True)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="agent 冷启动耗时测量")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--latency", type=float, default=0.0, help="桩 LLM 延迟（秒）")
+    args = ap.parse_args()
+
+    server, base_url = start_stub_server(latency=args.latency)
+    env = dict(os.environ, LLM_BASE_URL=base_url, LLM_API_KEY='stub', AGENT_VERBOSE='0')
+
+    for path in ('fast', 'llm'):
+        results = [run_child(path, env) for _ in range(args.runs)]
+        best = min(results, key=lambda r: r['total_s'])
+        print(f"[{path}] 导入 {best['import_s'] * 1000:.1f}ms，首次评分 {best['first_score_s'] * 1000:.1f}ms，"
+              f"合计 {best['total_s'] * 1000:.1f}ms（{args.runs} 次取最优）"
+              f" langchain={'已加载' if best['langchain_loaded'] else '未加载'}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
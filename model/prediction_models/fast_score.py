@@ -0,0 +1,75 @@
+import math
+import os
+import threading
+from collections import deque
+
+try:
+    from .score_cache import canonical_features, feature_columns
+except ImportError:
+    from score_cache import canonical_features, feature_columns
+
+SCORE_MIN = 100
+SCORE_MAX = 800
+
+#专业度落在 (low, high) 区间内视为不确定，才交给 LLM agent 评估
+_band = os.environ.get('FAST_PATH_BAND', '0.25,0.6').split(',')
+UNCERTAINTY_BAND = (float(_band[0]), float(_band[1]))
+
+
+def clamp_score(score):
+    return max(SCORE_MIN, min(SCORE_MAX, int(round(score))))
+
+
+def deterministic_score(pro, user_features):
+    """
+    本地确定性信用分：专业度为主，辅以活跃度、余额和合约交互占比，线性映射到 100-800。
+    同样的输入永远得到同样的分数。
+    """
+    f = dict(zip(feature_columns, canonical_features(user_features)))
+    total_txs = f['total_txs'] or 0.0
+    sent_txs = f['sent_txs'] or 0.0
+    balance = max(f['eth_balance'] or 0.0, 0.0)
+
+    activity = min(1.0, math.log1p(max(total_txs, 0.0)) / math.log1p(1000))
+    wealth = min(1.0, math.log1p(balance) / math.log1p(100))
+    contract_ratio = min(1.0, (f['sent_to_contract_txs'] or 0.0) / sent_txs) if sent_txs > 0 else 0.0
+
+    s = 0.5 * float(pro) + 0.2 * activity + 0.2 * wealth + 0.1 * contract_ratio
+    return clamp_score(SCORE_MIN + (SCORE_MAX - SCORE_MIN) * s)
+
+
+def is_clear_cut(pro, band=None):
+    """专业度明显偏低或偏高时走本地快速通道"""
+    low, high = band or UNCERTAINTY_BAND
+    return pro < low or pro > high
+
+
+class RouteStats:
+    """统计各评分通道（fast / llm / llm_fallback）的请求数与耗时"""
+
+    def __init__(self, max_samples=10000):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._counts = {}
+        self.max_samples = max_samples
+
+    def record(self, path, seconds):
+        with self._lock:
+            self._latencies.setdefault(path, deque(maxlen=self.max_samples)).append(seconds)
+            self._counts[path] = self._counts.get(path, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = {k: sorted(v) for k, v in self._latencies.items()}
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        out = {}
+        for path, lat in snapshot.items():
+            out[path] = {
+                'count': counts[path],
+                'fraction': counts[path] / total if total else 0.0,
+                'mean_ms': 1000 * sum(lat) / len(lat),
+                'p50_ms': 1000 * lat[len(lat) // 2],
+                'p95_ms': 1000 * lat[min(len(lat) - 1, int(len(lat) * 0.95))],
+            }
+        return out
@@ -0,0 +1,230 @@
+"""
+按地址存储的本地特征库（SQLite，标准库即可用）。
+
+- features 表以 address 为主键，保存8维特征和来源信息（source、区块范围、更新时间）
+- 扫描器批量 upsert：merge 模式下交易计数累加、余额取最新值、区块范围取并集；
+  replace 模式整行覆盖（适用于 Etherscan 这类全历史统计）
+- 训练和预测通过主键做单点/批量/地址区间查询，或按最后区块号（带索引）增量读取
+- provenance 表记录每次写入的来源、区块范围和行数
+
+merge 模式要求各次写入的区块范围互不重叠（否则计数会重复累加）：带区块范围的 merge 写入
+会对照 provenance 里已合并的范围检查，重叠时抛 ValueError，整批不写。
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from .score_cache import feature_columns
+except ImportError:
+    from score_cache import feature_columns
+
+#累加型计数列（余额是快照，不累加）
+counter_columns = [c for c in feature_columns if c != 'eth_balance']
+provenance_columns = ['source', 'first_block', 'last_block', 'updated_at']
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS features (
+    address TEXT PRIMARY KEY,
+    eth_balance REAL,
+    {', '.join(f'{c} INTEGER NOT NULL DEFAULT 0' for c in counter_columns)},
+    source TEXT,
+    first_block INTEGER,
+    last_block INTEGER,
+    updated_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS features_last_block ON features (last_block);
+CREATE INDEX IF NOT EXISTS features_updated_at ON features (updated_at);
+CREATE TABLE IF NOT EXISTS provenance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT,
+    first_block INTEGER,
+    last_block INTEGER,
+    mode TEXT,
+    rows INTEGER,
+    written_at INTEGER
+);
+"""
+
+_INSERT_COLUMNS = ['address'] + feature_columns + provenance_columns
+
+_MERGE_SQL = f"""
+INSERT INTO features ({', '.join(_INSERT_COLUMNS)})
+VALUES ({', '.join('?' for _ in _INSERT_COLUMNS)})
+ON CONFLICT(address) DO UPDATE SET
+    eth_balance = COALESCE(excluded.eth_balance, features.eth_balance),
+    {', '.join(f'{c} = features.{c} + excluded.{c}' for c in counter_columns)},
+    source = excluded.source,
+    first_block = MIN(COALESCE(features.first_block, excluded.first_block), COALESCE(excluded.first_block, features.first_block)),
+    last_block = MAX(COALESCE(features.last_block, excluded.last_block), COALESCE(excluded.last_block, features.last_block)),
+    updated_at = excluded.updated_at
+"""
+
+_REPLACE_SQL = f"""
+INSERT OR REPLACE INTO features ({', '.join(_INSERT_COLUMNS)})
+VALUES ({', '.join('?' for _ in _INSERT_COLUMNS)})
+"""
+
+
+def _num(v):
+    """None / NaN 统一成 None"""
+    return None if v is None or v != v else v
+
+
+_SELECT = f"SELECT {', '.join(['address'] + feature_columns + provenance_columns)} FROM features"
+
+
+class FeatureStore:
+    """线程安全（同一连接加锁串行），多进程可共用同一个数据库文件（WAL）"""
+
+    def __init__(self, path='features.sqlite3'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # -------- 写入 --------
+    def upsert(self, rows, source, first_block=None, last_block=None, mode='merge'):
+        """
+        批量写入（一个事务 + executemany）。rows 为 dict 列表或 DataFrame，需含 address 与8维特征。
+        返回写入行数。
+        """
+        if mode not in ('merge', 'replace'):
+            raise ValueError(f"未知写入模式: {mode}")
+        if hasattr(rows, 'to_dict'):
+            rows = rows.to_dict('records')
+        now = int(time.time())
+        params = []
+        for r in rows:
+            balance = _num(r.get('eth_balance'))
+            params.append(
+                [str(r['address']).lower(), None if balance is None else float(balance)]
+                + [int(_num(r.get(c)) or 0) for c in counter_columns]
+                + [source, first_block, last_block, now]
+            )
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if mode == 'merge' and first_block is not None and last_block is not None:
+                    #在同一事务里检查，多进程并发写入也不会漏判
+                    hit = self._conn.execute(
+                        "SELECT source, first_block, last_block FROM provenance WHERE mode = 'merge'"
+                        " AND first_block <= ? AND last_block >= ? LIMIT 1", (last_block, first_block)).fetchone()
+                    if hit:
+                        raise ValueError(f"区块 [{first_block}, {last_block}] 与已合并的 {hit[0]} "
+                                         f"[{hit[1]}, {hit[2]}] 重叠，merge 会重复累加计数")
+                self._conn.executemany(_MERGE_SQL if mode == 'merge' else _REPLACE_SQL, params)
+                self._conn.execute(
+                    "INSERT INTO provenance (source, first_block, last_block, mode, rows, written_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, first_block, last_block, mode, len(params), now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(params)
+
+    # -------- 读取 --------
+    def _query(self, sql, args=()):
+        with self._lock:
+            cur = self._conn.execute(sql, args)
+            names = [d[0] for d in cur.description]
+            return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def get(self, address):
+        """单点查询，返回 dict 或 None"""
+        rows = self._query(f"{_SELECT} WHERE address = ?", (address.lower(),))
+        return rows[0] if rows else None
+
+    def get_many(self, addresses, batch=500):
+        """按主键批量查询，返回 {address: row}"""
+        keys = [a.lower() for a in addresses]
+        out = {}
+        for i in range(0, len(keys), batch):
+            part = keys[i:i + batch]
+            for row in self._query(f"{_SELECT} WHERE address IN ({', '.join('?' for _ in part)})", part):
+                out[row['address']] = row
+        return out
+
+    def range(self, start=None, end=None, min_block=None, limit=None):
+        """
+        地址区间 [start, end) 的主键范围扫描；min_block 只取 last_block >= min_block 的行（走索引）。
+        """
+        where, args = [], []
+        if start is not None:
+            where.append("address >= ?")
+            args.append(start.lower())
+        if end is not None:
+            where.append("address < ?")
+            args.append(end.lower())
+        if min_block is not None:
+            where.append("last_block >= ?")
+            args.append(int(min_block))
+        sql = _SELECT + (f" WHERE {' AND '.join(where)}" if where else "") + " ORDER BY address"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._query(sql, args)
+
+    def to_frame(self, min_block=None, source=None):
+        """读成训练用的 DataFrame（address + 8维特征 + 来源信息）"""
+        import pandas as pd
+
+        where, args = [], []
+        if min_block is not None:
+            where.append("last_block >= ?")
+            args.append(int(min_block))
+        if source is not None:
+            where.append("source = ?")
+            args.append(source)
+        sql = _SELECT + (f" WHERE {' AND '.join(where)}" if where else "") + " ORDER BY address"
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=args)
+
+    def fingerprint(self):
+        """数据版本指纹：行数 + 最后一次写入记录，用作训练阶段缓存的上游键"""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+            last = self._conn.execute("SELECT MAX(id), MAX(written_at) FROM provenance").fetchone()
+        return hashlib.sha256(f"{os.path.abspath(self.path)}|{count}|{last}".encode()).hexdigest()
+
+    def provenance(self):
+        return self._query("SELECT * FROM provenance ORDER BY id")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def import_csv(store, path, source=None, mode='replace', chunksize=50000):
+    """把已有的 scan_stats.csv / eth_stats.csv 等平面文件导入特征库"""
+    import pandas as pd
+
+    n = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        n += store.upsert(chunk, source or os.path.basename(path), mode=mode)
+    return n
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="特征库：导入平面文件 / 查看来源记录")
+    ap.add_argument("--store", default="features.sqlite3")
+    ap.add_argument("--import-csv", nargs="*", default=[], help="要导入的 CSV 文件")
+    ap.add_argument("--mode", choices=["merge", "replace"], default="replace")
+    args = ap.parse_args()
+
+    store = FeatureStore(args.store)
+    for p in args.import_csv:
+        t0 = time.perf_counter()
+        n = import_csv(store, p, mode=args.mode)
+        print(f"导入 {p}: {n} 行，耗时 {time.perf_counter() - t0:.2f}s")
+    print(f"特征库 {args.store}: {len(store)} 个地址")
+    for rec in store.provenance()[-10:]:
+        print(rec)
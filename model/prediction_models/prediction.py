@@ -1,21 +1,68 @@
-import pandas as pd
-import joblib
+import os
+import threading
 
-feature_columns = [
-    'eth_balance', 'total_txs', 'sent_txs', 'received_txs',
-    'sent_to_contract_txs', 'received_from_contract_txs',
-    'external_txs','internal_txs'
-]
+try:
+    from .score_cache import ScoreCache, canonical_features, feature_columns
+except ImportError:
+    from score_cache import ScoreCache, canonical_features, feature_columns
 
-MODEL_DIR = ''
+MODEL_DIR = os.environ.get('MODEL_DIR', os.path.dirname(os.path.abspath(__file__)))
+MODEL_FILES = ('random_forest_classifier.pkl', 'imputer.pkl', 'scaler.pkl')
 
+#专业度缓存，键为(模型版本, 规范化后的8维特征)
+pro_cache = ScoreCache(
+    maxsize=int(os.environ.get('PRO_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('PRO_CACHE_TTL', '600')),
+)
+
+_state = None  # (模型元组, 版本号)
+_model_lock = threading.Lock()
+
+#模型热重载后依次调用，供下游缓存（如信用分缓存）一起失效
+reload_hooks = []
+
+
+def _artifact_version():
+    """用三个模型文件的 mtime/大小 作为版本号，文件被替换后版本即变化"""
+    stamp = []
+    for name in MODEL_FILES:
+        st = os.stat(os.path.join(MODEL_DIR, name))
+        stamp.append((name, st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+def _current(force=False):
+    global _state
+    version = _artifact_version()
+    state = _state
+    if not force and state is not None and state[1] == version:
+        return state
+    with _model_lock:
+        if force or _state is None or _state[1] != version:
+            import joblib
+            models = tuple(joblib.load(os.path.join(MODEL_DIR, name)) for name in MODEL_FILES)
+            _state = (models, version)
+            pro_cache.clear()
+            for hook in reload_hooks:
+                hook()
+        return _state
+
+
+def load_models(force=False):
+    """加载（或热重载）模型，文件变化时自动重载并清空专业度缓存"""
+    return _current(force)[0]
+
+
+def model_version():
+    return _current()[1]
+
+
+def cache_stats():
+    return pro_cache.stats()
 
-def predict_professional(user_features):
-    """修复特征名称警告的预测函数"""
-    clf = joblib.load('random_forest_classifier.pkl')
-    imputer = joblib.load('imputer.pkl')
-    scaler = joblib.load('scaler.pkl')
 
+def _predict_uncached(clf, imputer, scaler, user_features):
+    import pandas as pd
 
     if isinstance(user_features, dict):
 
@@ -34,3 +81,48 @@ def predict_professional(user_features):
 
     pro = clf.predict_proba(features_scaled)[0, 1]
     return float(pro)
+
+
+def predict_professional(user_features, use_cache=True):
+    """修复特征名称警告的预测函数"""
+    (clf, imputer, scaler), version = _current()
+    if not use_cache:
+        return _predict_uncached(clf, imputer, scaler, user_features)
+
+    key = (version, canonical_features(user_features))
+    return pro_cache.get_or_compute(
+        key, lambda: _predict_uncached(clf, imputer, scaler, user_features))
+
+
+def predict_professional_batch(rows):
+    """批量预测：rows 为 DataFrame 或 dict 列表，一次 transform + predict_proba，返回专业度数组"""
+    import pandas as pd
+
+    (clf, imputer, scaler), _ = _current()
+    features_df = rows[feature_columns] if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows), columns=feature_columns)
+    if len(features_df) == 0:
+        return features_df.index.to_numpy(dtype=float)
+    features_scaled = scaler.transform(imputer.transform(features_df))
+    return clf.predict_proba(features_scaled)[:, 1]
+
+
+_feature_store = None
+
+
+def feature_store():
+    """按需打开特征库（路径取自环境变量 FEATURE_STORE）"""
+    global _feature_store
+    if _feature_store is None:
+        try:
+            from .feature_store import FeatureStore
+        except ImportError:
+            from feature_store import FeatureStore
+        _feature_store = FeatureStore(os.environ.get('FEATURE_STORE', 'features.sqlite3'))
+    return _feature_store
+
+
+def predict_addresses(addresses, store=None):
+    """从特征库按地址批量取特征并预测，返回 {address: 专业度}；库中没有的地址不出现在结果里"""
+    rows = list((store or feature_store()).get_many(addresses).values())
+    pros = predict_professional_batch(rows)
+    return {row['address']: float(pro) for row, pro in zip(rows, pros)}
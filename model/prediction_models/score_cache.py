@@ -0,0 +1,103 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+feature_columns = [
+    'eth_balance', 'total_txs', 'sent_txs', 'received_txs',
+    'sent_to_contract_txs', 'received_from_contract_txs',
+    'external_txs','internal_txs'
+]
+
+
+def canonical_features(user_features):
+    """把 dict / Series / 列表形式的8维特征统一成可哈希的元组（缺失值记为 None）"""
+    if hasattr(user_features, 'get'):
+        values = [user_features.get(c) for c in feature_columns]
+    else:
+        values = list(user_features)
+        if len(values) != len(feature_columns):
+            raise ValueError(f"特征长度应为{len(feature_columns)}，实际为{len(values)}")
+
+    out = []
+    for v in values:
+        if v is None:
+            out.append(None)
+            continue
+        v = float(v)
+        if math.isnan(v):
+            out.append(None)
+        else:
+            # -0.0 与 0.0 视为同一个键
+            out.append(v + 0.0)
+    return tuple(out)
+
+
+class ScoreCache:
+    """线程安全的 LRU + TTL 缓存，记录命中/未命中/淘汰次数"""
+
+    def __init__(self, maxsize=10000, ttl=600.0, clock=time.monotonic):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if self.ttl > 0 and expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,145 @@
+"""
+本地 OpenAI 兼容的桩 LLM 服务（/v1/chat/completions），用于离线调试和压测 agent。
+
+行为模拟真实模型在本项目里的调用流程：
+  1. 请求里带 tools 且还没有 tool 消息时，返回对 is_professional 的工具调用（参数取自用户消息中的特征字典）
+  2. 拿到工具结果（专业度）后，返回一个 100-800 的分数
+支持普通 JSON 与 stream=true 的 SSE 两种响应，可配置固定延迟；reply 可把最终回复换成固定文本
+（例如测试无法解析的输出）。
+
+  python stub_llm.py --port 8000 --latency 0.5
+  LLM_BASE_URL=http://127.0.0.1:8000/v1 python agent.py
+"""
+import argparse
+import ast
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _features_from_text(text):
+    m = re.search(r'\{.*?\}', text or '', re.S)
+    if not m:
+        return {}
+    try:
+        return ast.literal_eval(m.group())
+    except (ValueError, SyntaxError):
+        return {}
+
+
+def _score_from_tool_result(text):
+    m = re.search(r'[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?', text or '')
+    pro = float(m.group()) if m else 0.0
+    return int(100 + 700 * min(max(pro, 0.0), 1.0))
+
+
+class StubLLMState:
+    def __init__(self, latency=0.0, reply=None):
+        self.latency = latency
+        self.reply = reply
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def make_reply(body, reply=None):
+    """根据请求体构造一条 assistant 消息（工具调用或最终分数；给了 reply 时最终回复用它）"""
+    messages = body.get('messages', [])
+    tool_msgs = [m for m in messages if m.get('role') == 'tool']
+    if body.get('tools') and not tool_msgs:
+        user_text = next((m.get('content') for m in reversed(messages) if m.get('role') == 'user'), '')
+        name = body['tools'][0]['function']['name']
+        args = json.dumps({'data': _features_from_text(user_text)}, ensure_ascii=False)
+        return {'role': 'assistant', 'content': None,
+                'tool_calls': [{'id': 'call_stub_1', 'type': 'function',
+                                'function': {'name': name, 'arguments': args}}]}, 'tool_calls'
+    if reply is not None:
+        return {'role': 'assistant', 'content': reply}, 'stop'
+    score = _score_from_tool_result(tool_msgs[-1].get('content') if tool_msgs else '')
+    return {'role': 'assistant', 'content': str(score)}, 'stop'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server.state
+        state.enter()
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if state.latency:
+                time.sleep(state.latency)
+            message, finish = make_reply(body, state.reply)
+            base = {'id': 'chatcmpl-stub', 'created': int(time.time()), 'model': body.get('model', 'stub')}
+            if body.get('stream'):
+                self._send_stream(base, message, finish)
+            else:
+                payload = dict(base, object='chat.completion',
+                               choices=[{'index': 0, 'message': message, 'finish_reason': finish}],
+                               usage={'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0})
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+        finally:
+            state.leave()
+
+    def _send_stream(self, base, message, finish):
+        delta = dict(message)
+        if 'tool_calls' in delta:
+            delta['tool_calls'] = [dict(tc, index=i) for i, tc in enumerate(delta['tool_calls'])]
+        chunks = [
+            dict(base, object='chat.completion.chunk', choices=[{'index': 0, 'delta': delta, 'finish_reason': None}]),
+            dict(base, object='chat.completion.chunk', choices=[{'index': 0, 'delta': {}, 'finish_reason': finish}]),
+        ]
+        data = b''.join(f"data: {json.dumps(c)}\n\n".encode('utf-8') for c in chunks) + b"data: [DONE]\n\n"
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_server(host='127.0.0.1', port=0, latency=0.0, reply=None):
+    """在后台线程启动桩服务，返回 (server, base_url)；server.state 里有请求数与最大并发"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.state = StubLLMState(latency, reply)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="OpenAI 兼容的本地桩 LLM 服务")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    ap.add_argument("--reply", default=None, help="固定的最终回复文本（默认按专业度给分）")
+    args = ap.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    server.state = StubLLMState(args.latency, args.reply)
+    print(f"stub LLM listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# agent.py / prediction.py 以脚本方式导入同目录模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
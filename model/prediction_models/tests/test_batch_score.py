@@ -0,0 +1,38 @@
+"""run_batch：单条评分抛异常时记一行 error，其余照常完成，不会卡死。"""
+import asyncio
+import json
+import types
+
+import fast_score
+from batch_score import ResultWriter, run_batch
+
+
+def fake_agent(bad_rows):
+    def predict_professional(features):
+        if features['total_txs'] in bad_rows:
+            raise ValueError('bad features')
+        return 0.9
+
+    return types.SimpleNamespace(
+        pre=types.SimpleNamespace(predict_professional=predict_professional),
+        is_clear_cut=fast_score.is_clear_cut,
+        deterministic_score=fast_score.deterministic_score,
+        clamp_score=fast_score.clamp_score,
+        route_stats=fast_score.RouteStats(),
+    )
+
+
+def test_failing_rows_do_not_stall_the_batch(tmp_path):
+    out = tmp_path / 'scores.jsonl'
+    rows = [(i, f'0x{i:040x}', {c: float(i) for c in fast_score.feature_columns}) for i in range(50)]
+    bad = {3, 4, 5, 6, 7, 30}
+    writer = ResultWriter(str(out))
+    # 并发 2 时坏行多于 worker 数：修复前所有 worker 退出，生产者永远阻塞
+    n = asyncio.run(asyncio.wait_for(run_batch(fake_agent(bad), iter(rows), writer, concurrency=2), timeout=30))
+    writer.close()
+
+    results = {r['index']: r for r in map(json.loads, out.read_text(encoding='utf-8').splitlines())}
+    assert n == len(rows) == len(results)
+    assert {i for i, r in results.items() if r['path'] == 'error'} == bad
+    assert all(r['path'] == 'fast' and 100 <= r['score'] <= 800 for i, r in results.items() if i not in bad)
+    assert 'bad features' in results[3]['error']
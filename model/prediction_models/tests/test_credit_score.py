@@ -0,0 +1,99 @@
+"""credit_score 的路由：区间内走 agent（本地桩 LLM），区间外走确定性评分，输出无法解析时回退。"""
+import pytest
+
+import agent
+import fast_score
+import prediction as pre
+from stub_llm import start_stub_server
+
+FEATURES = {'eth_balance': 1.6, 'total_txs': 630, 'sent_txs': 350, 'received_txs': 280,
+            'sent_to_contract_txs': 220, 'received_from_contract_txs': 180, 'external_txs': 150, 'internal_txs': 100}
+BAND = (0.25, 0.6)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    servers = []
+
+    def start(reply=None):
+        server, base_url = start_stub_server(reply=reply)
+        servers.append(server)
+        monkeypatch.setenv('LLM_BASE_URL', base_url)
+        monkeypatch.setenv('LLM_API_KEY', 'stub')
+        monkeypatch.setenv('AGENT_VERBOSE', '0')
+        # agent 按进程只构建一次，换了桩服务地址要重建
+        monkeypatch.setattr(agent, '_agent_executor', None)
+        monkeypatch.setattr(agent, 'route_stats', fast_score.RouteStats())
+        agent.score_cache.clear()
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def use_professional(monkeypatch, pro):
+    monkeypatch.setattr(pre, 'predict_professional', lambda user_features, use_cache=True: pro)
+
+
+def routes():
+    return {path: s['count'] for path, s in agent.route_stats.stats().items()}
+
+
+def test_score_inside_band_goes_to_llm(stub, monkeypatch):
+    server = stub()
+    use_professional(monkeypatch, 0.4)
+    score = agent.credit_score(FEATURES, use_cache=False, band=BAND)
+    # 桩模型按工具返回的专业度给分：100 + 700 * 0.4
+    assert score == 380
+    assert routes() == {'llm': 1}
+    assert server.state.requests == 2   # 工具调用 + 最终回复
+
+
+@pytest.mark.parametrize('pro', [0.1, 0.9])
+def test_score_outside_band_is_deterministic(stub, monkeypatch, pro):
+    server = stub()
+    use_professional(monkeypatch, pro)
+    score = agent.credit_score(FEATURES, use_cache=False, band=BAND)
+    assert score == fast_score.deterministic_score(pro, FEATURES)
+    assert routes() == {'fast': 1}
+    assert server.state.requests == 0
+
+
+def test_unparseable_llm_output_falls_back(stub, monkeypatch):
+    server = stub(reply='无法判断')
+    use_professional(monkeypatch, 0.4)
+    score = agent.credit_score(FEATURES, use_cache=False, band=BAND)
+    assert score == fast_score.deterministic_score(0.4, FEATURES)
+    assert routes() == {'llm_fallback': 1}
+    assert server.state.requests == 2
+
+
+def test_out_of_range_llm_score_falls_back(stub, monkeypatch):
+    stub(reply='950')
+    use_professional(monkeypatch, 0.4)
+    assert agent.credit_score(FEATURES, use_cache=False, band=BAND) == fast_score.deterministic_score(0.4, FEATURES)
+    assert routes() == {'llm_fallback': 1}
+
+
+@pytest.mark.parametrize('pro, expected', [(-5.0, fast_score.SCORE_MIN), (5.0, fast_score.SCORE_MAX)])
+def test_scores_are_clamped(stub, monkeypatch, pro, expected):
+    stub()
+    use_professional(monkeypatch, pro)
+    assert agent.credit_score(FEATURES, use_cache=False, band=BAND) == expected
+
+
+def test_clamp_score():
+    assert fast_score.clamp_score(42) == fast_score.SCORE_MIN
+    assert fast_score.clamp_score(1234.5) == fast_score.SCORE_MAX
+    assert fast_score.clamp_score(456.6) == 457
+
+
+def test_cache_key_includes_band(stub, monkeypatch):
+    stub()
+    use_professional(monkeypatch, 0.4)
+    fast = agent.credit_score(FEATURES, band=(0.5, 0.6))
+    llm = agent.credit_score(FEATURES, band=BAND)
+    assert fast == fast_score.deterministic_score(0.4, FEATURES)
+    assert llm == 380
+    assert routes() == {'fast': 1, 'llm': 1}
@@ -0,0 +1,29 @@
+"""FeatureStore merge：不重叠的区块范围累加计数，重叠的范围整批拒绝。"""
+import pytest
+
+from feature_store import FeatureStore
+from score_cache import feature_columns
+
+
+def row(address, n):
+    r = {c: n for c in feature_columns}
+    r.update(address=address, eth_balance=1.5)
+    return r
+
+
+def test_merge_rejects_overlapping_block_ranges(tmp_path):
+    store = FeatureStore(str(tmp_path / 'features.sqlite3'))
+    store.upsert([row('0xAA', 2)], 'scan', 100, 199)
+    store.upsert([row('0xaa', 3)], 'scan', 200, 299)
+    assert store.get('0xaa')['total_txs'] == 5
+
+    with pytest.raises(ValueError):
+        store.upsert([row('0xaa', 7), row('0xbb', 1)], 'other_scan', 250, 350)
+    assert store.get('0xaa')['total_txs'] == 5
+    assert store.get('0xbb') is None
+    assert len(store.provenance()) == 2
+
+    # replace 模式与不带区块范围的写入不受限制
+    store.upsert([row('0xaa', 9)], 'etherscan', mode='replace')
+    assert store.get('0xaa')['total_txs'] == 9
+    store.close()
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import time
+
+import joblib
+
+
+def file_digest(path, block_size=1 << 20):
+    """按块计算文件 sha256，作为整条流水线的输入指纹"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def stage_key(parent_key, name, params):
+    """阶段缓存键 = 上游键 + 阶段名 + 参数（参数按键排序后序列化）"""
+    payload = json.dumps({'parent': parent_key, 'stage': name, 'params': params},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class StageCache:
+    """
+    以内容寻址的方式把各训练阶段的输出缓存到磁盘。
+    命中时直接读盘，并按首次计算耗时减去读盘耗时累计节省的时间。
+    """
+
+    def __init__(self, cache_dir='.stage_cache', enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.report = []
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, name, key):
+        base = os.path.join(self.cache_dir, f"{name}-{key[:16]}")
+        return base + '.pkl', base + '.json'
+
+    def run(self, name, parent_key, params, fn):
+        """返回 (阶段输出, 本阶段缓存键)"""
+        key = stage_key(parent_key, name, params)
+        data_path, meta_path = self._paths(name, key)
+
+        if self.enabled and os.path.exists(data_path) and os.path.exists(meta_path):
+            t0 = time.perf_counter()
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('key') == key:
+                result = joblib.load(data_path)
+                load_time = time.perf_counter() - t0
+                saved = max(0.0, meta['compute_seconds'] - load_time)
+                self.report.append({'stage': name, 'hit': True, 'seconds': load_time, 'saved_seconds': saved})
+                print(f"[stage] {name}: 命中缓存 {key[:12]}，读取 {load_time:.2f}s，节省约 {saved:.2f}s")
+                return result, key
+
+        t0 = time.perf_counter()
+        result = fn()
+        compute_time = time.perf_counter() - t0
+        if self.enabled:
+            joblib.dump(result, data_path)
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'stage': name, 'params': params,
+                           'compute_seconds': compute_time}, f, ensure_ascii=False, default=str)
+        self.report.append({'stage': name, 'hit': False, 'seconds': compute_time, 'saved_seconds': 0.0})
+        print(f"[stage] {name}: 重新计算 {key[:12]}，耗时 {compute_time:.2f}s")
+        return result, key
+
+    def summary(self):
+        hits = [r['stage'] for r in self.report if r['hit']]
+        saved = sum(r['saved_seconds'] for r in self.report)
+        print(f"[stage] 缓存命中阶段: {hits or '无'}，共节省约 {saved:.2f}s")
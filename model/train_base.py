@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
-from sklearn.cluster import KMeans
+import argparse
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.semi_supervised import LabelSpreading
 from sklearn.impute import SimpleImputer
@@ -11,8 +11,17 @@ from sklearn.metrics import (accuracy_score, precision_score, recall_score,
                               matthews_corrcoef, roc_auc_score)
 from imblearn.over_sampling import SMOTE
 
+from k_search import find_stable_k
+from label_propagation import SparseLabelSpreading
+from stage_cache import StageCache, file_digest
+
 MODEL_DIR = 'prediction_models'
-os.makedirs(MODEL_DIR, exist_ok=True)
+
+feature_columns = [
+    'eth_balance', 'total_txs', 'sent_txs', 'received_txs',
+    'sent_to_contract_txs', 'received_from_contract_txs',
+    'external_txs','internal_txs'
+]
 
 #这里采用手动定义f2分数的情况
 def f2_score(y_true, y_pred, zero_division=0):
@@ -23,127 +32,224 @@ def f2_score(y_true, y_pred, zero_division=0):
     return (5 * precision * recall) / (4 * precision + recall)
 
 
-data = pd.read_csv('scan_stats.csv')
-feature_columns = [
-    'eth_balance', 'total_txs', 'sent_txs', 'received_txs',
-    'sent_to_contract_txs', 'received_from_contract_txs',
-    'external_txs','internal_txs'
-]
-X = data[feature_columns].copy()
-user_addresses = data['address'].copy()
-
-imputer = SimpleImputer(strategy='mean')
-X_imputed = imputer.fit_transform(X)
-
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X_imputed)
-
-stable_k = 5
-cluster_size_history = []
-for k in range(2, 11):
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    cluster_labels = kmeans.fit_predict(X_scaled)
-    cluster_sizes = pd.Series(cluster_labels).value_counts()
-    largest_size = cluster_sizes.max()
-    cluster_size_history.append(largest_size)
-
-    if len(cluster_size_history) >= 3:
-        change1 = abs(cluster_size_history[-1] - cluster_size_history[-2]) / cluster_size_history[-2]
-        change2 = abs(cluster_size_history[-2] - cluster_size_history[-3]) / cluster_size_history[-3]
-        if change1 < 0.01 and change2 < 0.01:
-            stable_k = k
-            break
-
-kmeans_final = KMeans(n_clusters=stable_k, random_state=42, n_init=10)
-final_cluster_labels = kmeans_final.fit_predict(X_scaled)
-cluster_sizes = pd.Series(final_cluster_labels).value_counts()
-casual_cluster_label = cluster_sizes.idxmax()
-is_casual = (final_cluster_labels == casual_cluster_label)
-
-print(f"动态确定的最优k值: {stable_k}")
-print(f"普通用户（最大簇）数量: {sum(is_casual)}")
-print(f"潜在专业用户（其他簇）数量: {len(X) - sum(is_casual)}")
-
-semi_labels = np.full(len(X_scaled), -1)
-semi_labels[is_casual] = 0
-
-tsvm_simulator = LabelSpreading(
-    kernel='rbf',
-    gamma=0.1,
-    alpha=0.2,
-    max_iter=500,
-    n_jobs=-1
-)
-tsvm_simulator.fit(X_scaled, semi_labels)
-
-semi_pred = tsvm_simulator.transduction_
-semi_pred[semi_pred != 0] = 1
-
-unique_classes = np.unique(semi_pred)
-print(f"半监督预测的类别: {unique_classes}")
-
-X_train = X_scaled
-y_train = semi_pred
-
-if len(unique_classes) < 2:
-    print(f"警告：半监督预测仅产生{len(unique_classes)}个类别，手动调整标签")
-    if 0 in unique_classes:
-        y_train[:5] = 1
-    else:
-        y_train[:5] = 0
-    X_train_resampled, y_train_resampled = X_train, y_train
-else:
-    smote = SMOTE(random_state=42, sampling_strategy=0.3)
-    X_train_resampled, y_train_resampled = smote.fit_resample(X_train, y_train)
-    print(f"SMOTE过采样后 - 普通用户: {np.sum(y_train_resampled == 0)}, 专业用户: {np.sum(y_train_resampled == 1)}")
-
-rf = RandomForestClassifier(
-    n_estimators=200,
-    max_depth=10,
-    class_weight={0: 1, 1: 20},
-    random_state=42,
-    n_jobs=-1
-)
-rf.fit(X_train_resampled, y_train_resampled)
-
-
-rf_pred_proba = rf.predict_proba(X_scaled)[:, 1]
-final_pred = ((semi_pred == 1) & (rf_pred_proba > 0.4)).astype(int)
-
-final_counts = pd.Series(final_pred).value_counts()
-print(f"\n最终分类结果:")
-print(f"普通用户: {final_counts.get(0, 0)}")
-print(f"专业用户: {final_counts.get(1, 0)}")
-
-
-pseudo_labels = np.where(is_casual, 0, 1)
-print("\n评估指标:")
-print(f"AUC-ROC: {roc_auc_score(pseudo_labels, rf_pred_proba):.4f}")
-print(f"F2分数: {f2_score(pseudo_labels, final_pred):.4f}")
-print(f"MCC: {matthews_corrcoef(pseudo_labels, final_pred):.4f}")
-print(f"准确率: {accuracy_score(pseudo_labels, final_pred):.4f}")
-print(f"召回率: {recall_score(pseudo_labels, final_pred):.4f}")
-
-
-joblib.dump(rf, os.path.join(MODEL_DIR, 'random_forest_classifier.pkl'))
-
-joblib.dump(imputer, os.path.join(MODEL_DIR, 'imputer.pkl'))
-
-joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
-
-print(f"\n已保存预测必需的3个核心模型至 {MODEL_DIR} 目录")
-print(f"保存的文件: {os.listdir(MODEL_DIR)}")
-
-
-result = pd.DataFrame({
-    'address': user_addresses,
-    'user_type': np.where(final_pred == 1, 'professional', 'normal')
-})
-result = pd.concat([result, data[feature_columns]], axis=1)
-result.to_csv('ethereum_professional_users_final.csv', index=False)
-print("\n结果已保存至 'ethereum_professional_users_final.csv'")
+# ---------------------------
+# 各训练阶段（输入输出都是普通对象，便于按阶段缓存）
+# ---------------------------
 
+def stage_impute_scale(X):
+    imputer = SimpleImputer(strategy='mean')
+    X_imputed = imputer.fit_transform(X)
 
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X_imputed)
+    return imputer, scaler, X_scaled
 
 
+def stage_k_search(X_scaled, mode='full', sample_size=100000, n_jobs=-1):
+    if mode == 'fast':
+        stable_k, _, final_cluster_labels = find_stable_k(
+            X_scaled, mode='fast', sample_size=sample_size, n_jobs=n_jobs)
+    else:
+        stable_k, _, final_cluster_labels = find_stable_k(X_scaled)
+    return stable_k, final_cluster_labels
+
+
+def stage_labeling(X_scaled, is_casual, labeling='dense', knn=10, landmarks=0):
+    semi_labels = np.full(len(X_scaled), -1)
+    semi_labels[is_casual] = 0
+
+    if labeling == 'sparse':
+        tsvm_simulator = SparseLabelSpreading(
+            n_neighbors=knn,
+            gamma=0.1,
+            alpha=0.2,
+            max_iter=500,
+            n_landmarks=landmarks or None,
+            n_jobs=-1
+        )
+    else:
+        tsvm_simulator = LabelSpreading(
+            kernel='rbf',
+            gamma=0.1,
+            alpha=0.2,
+            max_iter=500,
+            n_jobs=-1
+        )
+    tsvm_simulator.fit(X_scaled, semi_labels)
+
+    semi_pred = tsvm_simulator.transduction_
+    semi_pred[semi_pred != 0] = 1
+    return semi_pred
+
+
+def stage_smote(X_train, semi_pred, sampling_strategy=0.3):
+    """返回 (过采样后的 X, 过采样后的 y, 调整后的 semi_pred)"""
+    y_train = semi_pred.copy()
+    unique_classes = np.unique(y_train)
+    if len(unique_classes) < 2:
+        print(f"警告：半监督预测仅产生{len(unique_classes)}个类别，手动调整标签")
+        if 0 in unique_classes:
+            y_train[:5] = 1
+        else:
+            y_train[:5] = 0
+        # 与原流程一致：手动调整的标签同样计入最终结果
+        return X_train, y_train, y_train
+
+    smote = SMOTE(random_state=42, sampling_strategy=sampling_strategy)
+    X_train_resampled, y_train_resampled = smote.fit_resample(X_train, y_train)
+    print(f"SMOTE过采样后 - 普通用户: {np.sum(y_train_resampled == 0)}, 专业用户: {np.sum(y_train_resampled == 1)}")
+    return X_train_resampled, y_train_resampled, y_train
+
+
+def stage_rf_fit(X_train_resampled, y_train_resampled, n_estimators=200, max_depth=10,
+                 positive_weight=20):
+    rf = RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        class_weight={0: 1, 1: positive_weight},
+        random_state=42,
+        n_jobs=-1
+    )
+    rf.fit(X_train_resampled, y_train_resampled)
+    return rf
+
+
+def run_upstream(X, data_key, cache, args):
+    """依次执行 rf_fit 之前的各阶段（带缓存），返回下游需要的中间结果"""
+    (imputer, scaler, X_scaled), key = cache.run(
+        'impute_scale', data_key, {}, lambda: stage_impute_scale(X))
+
+    (stable_k, final_cluster_labels), key = cache.run(
+        'k_search', key, {'mode': args.k_search, 'sample_size': args.k_sample_size},
+        lambda: stage_k_search(X_scaled, args.k_search, args.k_sample_size, args.n_jobs))
+    cluster_sizes = pd.Series(final_cluster_labels).value_counts()
+    casual_cluster_label = cluster_sizes.idxmax()
+    is_casual = (final_cluster_labels == casual_cluster_label)
+
+    print(f"动态确定的最优k值: {stable_k}")
+    print(f"普通用户（最大簇）数量: {sum(is_casual)}")
+    print(f"潜在专业用户（其他簇）数量: {len(X) - sum(is_casual)}")
+
+    labeling_params = {'labeling': args.labeling, 'gamma': 0.1, 'alpha': 0.2, 'max_iter': 500}
+    if args.labeling == 'sparse':
+        labeling_params.update({'knn': args.knn, 'landmarks': args.landmarks})
+    semi_pred, key = cache.run(
+        'labeling', key, labeling_params,
+        lambda: stage_labeling(X_scaled, is_casual, args.labeling, args.knn, args.landmarks))
+
+    unique_classes = np.unique(semi_pred)
+    print(f"半监督预测的类别: {unique_classes}")
+
+    (X_train_resampled, y_train_resampled, semi_pred), key = cache.run(
+        'smote', key, {'random_state': 42, 'sampling_strategy': 0.3},
+        lambda: stage_smote(X_scaled, semi_pred))
+
+    return {
+        'imputer': imputer, 'scaler': scaler, 'X_scaled': X_scaled,
+        'stable_k': stable_k, 'is_casual': is_casual, 'semi_pred': semi_pred,
+        'X_train_resampled': X_train_resampled, 'y_train_resampled': y_train_resampled,
+        'key': key,
+    }
+
+
+def load_data(args):
+    """返回 (特征表 DataFrame, 数据指纹)；指纹作为阶段缓存的上游键"""
+    if args.store:
+        from prediction_models.feature_store import FeatureStore
+        store = FeatureStore(args.store)
+        data = store.to_frame(min_block=args.store_min_block)
+        data_key = f"{store.fingerprint()}|{args.store_min_block}"
+        store.close()
+        print(f"从特征库 {args.store} 读取 {len(data)} 个地址")
+        return data, data_key
+    return pd.read_csv(args.data), (file_digest(args.data) if not args.no_cache else None)
+
+
+def add_upstream_args(parser):
+    parser.add_argument("--data", default="scan_stats.csv", help="特征表路径")
+    parser.add_argument("--store", default=None, help="从特征库（SQLite）读取特征，替代 --data")
+    parser.add_argument("--store-min-block", type=int, default=None, help="只取 last_block >= 该值的地址")
+    parser.add_argument("--k-search", choices=["full", "fast"], default="full",
+                        help="full=逐个k全量KMeans后重拟合；fast=并行评估候选k、大数据子采样并复用胜出模型")
+    parser.add_argument("--k-sample-size", type=int, default=100000, help="fast 模式下探索性拟合的最大样本数")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="fast 模式并行度")
+    parser.add_argument("--labeling", choices=["dense", "sparse"], default="dense",
+                        help="dense=rbf LabelSpreading（n*n 亲和矩阵）；sparse=kNN 稀疏图传播，内存约线性")
+    parser.add_argument("--knn", type=int, default=10, help="sparse 模式每个点的近邻数")
+    parser.add_argument("--landmarks", type=int, default=0, help="sparse 模式地标点个数（0=全量传播）")
+    parser.add_argument("--cache-dir", default=".stage_cache", help="阶段缓存目录")
+    parser.add_argument("--no-cache", action="store_true", help="不读写阶段缓存")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练专业用户分类模型")
+    add_upstream_args(parser)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--max-depth", type=int, default=10)
+    parser.add_argument("--positive-weight", type=float, default=20, help="专业用户类别权重")
+    parser.add_argument("--threshold", type=float, default=0.4, help="专业用户判定阈值")
+    args = parser.parse_args()
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    cache = StageCache(args.cache_dir, enabled=not args.no_cache)
+
+    data, data_key = load_data(args)
+    X = data[feature_columns].copy()
+    user_addresses = data['address'].copy()
+    if args.no_cache:
+        data_key = None
+
+    up = run_upstream(X, data_key, cache, args)
+    imputer, scaler, X_scaled = up['imputer'], up['scaler'], up['X_scaled']
+    is_casual, semi_pred = up['is_casual'], up['semi_pred']
+    X_train_resampled, y_train_resampled, key = up['X_train_resampled'], up['y_train_resampled'], up['key']
+
+    rf, key = cache.run(
+        'rf_fit', key,
+        {'n_estimators': args.n_estimators, 'max_depth': args.max_depth,
+         'positive_weight': args.positive_weight, 'random_state': 42},
+        lambda: stage_rf_fit(X_train_resampled, y_train_resampled,
+                             args.n_estimators, args.max_depth, args.positive_weight))
+
+
+    rf_pred_proba = rf.predict_proba(X_scaled)[:, 1]
+    final_pred = ((semi_pred == 1) & (rf_pred_proba > args.threshold)).astype(int)
+
+    final_counts = pd.Series(final_pred).value_counts()
+    print(f"\n最终分类结果:")
+    print(f"普通用户: {final_counts.get(0, 0)}")
+    print(f"专业用户: {final_counts.get(1, 0)}")
+
+
+    pseudo_labels = np.where(is_casual, 0, 1)
+    print("\n评估指标:")
+    print(f"AUC-ROC: {roc_auc_score(pseudo_labels, rf_pred_proba):.4f}")
+    print(f"F2分数: {f2_score(pseudo_labels, final_pred):.4f}")
+    print(f"MCC: {matthews_corrcoef(pseudo_labels, final_pred):.4f}")
+    print(f"准确率: {accuracy_score(pseudo_labels, final_pred):.4f}")
+    print(f"召回率: {recall_score(pseudo_labels, final_pred):.4f}")
+
+
+    joblib.dump(rf, os.path.join(MODEL_DIR, 'random_forest_classifier.pkl'))
+
+    joblib.dump(imputer, os.path.join(MODEL_DIR, 'imputer.pkl'))
+
+    joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
+
+    print(f"\n已保存预测必需的3个核心模型至 {MODEL_DIR} 目录")
+    print(f"保存的文件: {os.listdir(MODEL_DIR)}")
+
+
+    result = pd.DataFrame({
+        'address': user_addresses,
+        'user_type': np.where(final_pred == 1, 'professional', 'normal')
+    })
+    result = pd.concat([result, data[feature_columns]], axis=1)
+    result.to_csv('ethereum_professional_users_final.csv', index=False)
+    print("\n结果已保存至 'ethereum_professional_users_final.csv'")
+
+    cache.summary()
+
 
+if __name__ == "__main__":
+    main()
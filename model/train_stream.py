@@ -0,0 +1,167 @@
+"""
+分块流式训练：特征表可以大于内存（CSV 或 Parquet）。
+
+流程（每一遍都只在内存中保留一个数据块）：
+  1. 第一遍：增量统计各列均值（填充用），同时蓄水池抽样得到代表性样本
+  2. 第二遍：对填充后的数据块 partial_fit StandardScaler
+  3. 在样本上依次调用 train_base.py 的 k 搜索、半监督打标签、SMOTE 与随机森林阶段
+     （内存上限由 --sample-size 决定）
+  4. 第三遍（可选）：逐块打分并追加写出结果 CSV
+
+保存的 imputer.pkl / scaler.pkl / random_forest_classifier.pkl 与 train_base.py 的产物格式一致，
+prediction.py 可直接加载。
+
+  python train_stream.py --data scan_stats.csv --chunksize 100000 --sample-size 50000
+  python train_stream.py --data features.parquet --labeling sparse --landmarks 20000
+"""
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import accuracy_score, matthews_corrcoef, recall_score, roc_auc_score
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+# 打标签、SMOTE、随机森林与 train_base.py 共用同一套阶段函数，本文件只负责分块读入
+from train_base import f2_score, feature_columns, stage_k_search, stage_labeling, stage_rf_fit, stage_smote
+
+
+def iter_chunks(path, chunksize, columns):
+    """按块读取 CSV / Parquet，每次只返回 chunksize 行"""
+    if path.endswith('.parquet') or path.endswith('.pq'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("读取 Parquet 需要安装 pyarrow")
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunksize, usecols=columns):
+            yield chunk
+
+
+def fit_imputer_and_sample(path, chunksize, sample_size, random_state=42):
+    """第一遍：增量计算均值并做蓄水池抽样，返回 (imputer, 样本特征矩阵, 总行数)"""
+    rng = np.random.RandomState(random_state)
+    sums = np.zeros(len(feature_columns))
+    counts = np.zeros(len(feature_columns))
+    sample = np.empty((0, len(feature_columns)))
+    seen = 0
+
+    for chunk in iter_chunks(path, chunksize, feature_columns):
+        values = chunk[feature_columns].to_numpy(dtype=float)
+        sums += np.nansum(values, axis=0)
+        counts += np.sum(~np.isnan(values), axis=0)
+
+        # 蓄水池抽样（Algorithm R 的分块向量化版本）
+        take = min(sample_size - len(sample), len(values))
+        if take > 0:
+            sample = np.vstack([sample, values[:take]])
+        rest = np.arange(take, len(values))
+        if len(rest):
+            slots = (rng.random_sample(len(rest)) * (seen + rest + 1)).astype(np.int64)
+            hit = slots < sample_size
+            sample[slots[hit]] = values[rest[hit]]
+        seen += len(values)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    # 整列都是 NaN 时均值也是 NaN，SimpleImputer 会丢掉该列、打分时列数对不上；这类列按 0 填充
+    means = np.where(counts > 0, means, 0.0)
+    # 用一行“均值”拟合 SimpleImputer，得到与全量 fit 相同的 statistics_ 和列名信息
+    imputer = SimpleImputer(strategy='mean')
+    imputer.fit(pd.DataFrame([means], columns=feature_columns))
+    return imputer, pd.DataFrame(sample, columns=feature_columns), seen
+
+
+def fit_scaler(path, chunksize, imputer):
+    """第二遍：对填充后的数据块增量拟合 StandardScaler"""
+    scaler = StandardScaler()
+    for chunk in iter_chunks(path, chunksize, feature_columns):
+        scaler.partial_fit(imputer.transform(chunk[feature_columns]))
+    return scaler
+
+
+def label_sample(X_sample, args):
+    """在样本上做 k 搜索与半监督打标签，返回 (is_casual, semi_pred)"""
+    stable_k, cluster_labels = stage_k_search(X_sample, mode='fast', n_jobs=args.n_jobs)
+    is_casual = cluster_labels == np.bincount(cluster_labels).argmax()
+    print(f"动态确定的最优k值: {stable_k}")
+    print(f"样本中普通用户（最大簇）数量: {int(is_casual.sum())}，潜在专业用户: {int((~is_casual).sum())}")
+    semi_pred = stage_labeling(X_sample, is_casual, args.labeling, args.knn, args.landmarks)
+    return is_casual, semi_pred
+
+
+def main():
+    ap = argparse.ArgumentParser(description="分块流式训练专业用户分类模型")
+    ap.add_argument("--data", default="scan_stats.csv", help="特征表（.csv / .parquet）")
+    ap.add_argument("--chunksize", type=int, default=100000)
+    ap.add_argument("--sample-size", type=int, default=50000, help="聚类/打标签/训练使用的样本行数上限")
+    ap.add_argument("--labeling", choices=["dense", "sparse"], default="sparse")
+    ap.add_argument("--knn", type=int, default=10)
+    ap.add_argument("--landmarks", type=int, default=0)
+    ap.add_argument("--n-jobs", type=int, default=-1)
+    ap.add_argument("--n-estimators", type=int, default=200)
+    ap.add_argument("--max-depth", type=int, default=10)
+    ap.add_argument("--positive-weight", type=float, default=20, help="专业用户类别权重")
+    ap.add_argument("--threshold", type=float, default=0.4, help="专业用户判定阈值")
+    ap.add_argument("--model-dir", default="prediction_models")
+    ap.add_argument("--output", default="ethereum_professional_users_final.csv", help="逐块写出的结果文件（空字符串则跳过）")
+    args = ap.parse_args()
+
+    os.makedirs(args.model_dir, exist_ok=True)
+
+    imputer, sample, total_rows = fit_imputer_and_sample(args.data, args.chunksize, args.sample_size)
+    print(f"总行数: {total_rows}，样本行数: {len(sample)}")
+    scaler = fit_scaler(args.data, args.chunksize, imputer)
+
+    X_sample = scaler.transform(imputer.transform(sample[feature_columns]))
+    is_casual, semi_pred = label_sample(X_sample, args)
+
+    # 只对样本过采样，内存上限约为 sample_size * (1 + sampling_strategy)
+    X_train_resampled, y_train_resampled, semi_pred = stage_smote(X_sample, semi_pred)
+    rf = stage_rf_fit(X_train_resampled, y_train_resampled, args.n_estimators, args.max_depth, args.positive_weight)
+
+    proba = rf.predict_proba(X_sample)[:, 1]
+    final_pred = ((semi_pred == 1) & (proba > args.threshold)).astype(int)
+    pseudo_labels = np.where(is_casual, 0, 1)
+    print("\n样本上的评估指标:")
+    if len(np.unique(pseudo_labels)) > 1:
+        print(f"AUC-ROC: {roc_auc_score(pseudo_labels, proba):.4f}")
+    print(f"F2分数: {f2_score(pseudo_labels, final_pred):.4f}")
+    print(f"MCC: {matthews_corrcoef(pseudo_labels, final_pred):.4f}")
+    print(f"准确率: {accuracy_score(pseudo_labels, final_pred):.4f}")
+    print(f"召回率: {recall_score(pseudo_labels, final_pred, zero_division=0):.4f}")
+
+    joblib.dump(rf, os.path.join(args.model_dir, 'random_forest_classifier.pkl'))
+    joblib.dump(imputer, os.path.join(args.model_dir, 'imputer.pkl'))
+    joblib.dump(scaler, os.path.join(args.model_dir, 'scaler.pkl'))
+    print(f"\n已保存预测必需的3个核心模型至 {args.model_dir} 目录")
+
+    if args.output:
+        # 样本外的行用样本上的半监督结果做 kNN 投票，再与随机森林概率组合
+        semi_knn = KNeighborsClassifier(n_neighbors=args.knn).fit(X_sample, semi_pred)
+        professional = 0
+        header = True
+        for chunk in iter_chunks(args.data, args.chunksize, ['address'] + feature_columns):
+            X_chunk = scaler.transform(imputer.transform(chunk[feature_columns]))
+            chunk_pred = ((semi_knn.predict(X_chunk) == 1) &
+                          (rf.predict_proba(X_chunk)[:, 1] > args.threshold)).astype(int)
+            professional += int(chunk_pred.sum())
+            out = pd.DataFrame({
+                'address': chunk['address'].to_numpy(),
+                'user_type': np.where(chunk_pred == 1, 'professional', 'normal'),
+            })
+            out = pd.concat([out, chunk[feature_columns].reset_index(drop=True)], axis=1)
+            out.to_csv(args.output, mode='w' if header else 'a', header=header, index=False)
+            header = False
+        print(f"最终分类结果: 普通用户 {total_rows - professional}，专业用户 {professional}")
+        print(f"结果已保存至 '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Per-address activity bucketed by block range, for rolling-window features
+(7d / 30d ...) without rescanning.
+
+Each bucket (default 7200 blocks ~ one day of 12s slots) is a CompactAggregate
+(address_agg.py) of the blocks scanned into it; the store remembers which block
+ranges each bucket covers (so a block is never counted twice) and which
+addresses getCode reported as contracts. A window is the sum of its buckets;
+RollingWindow slides forward by merging the new buckets in and subtracting the
+expired ones, with no RPC involved.
+
+  python scan_eth_highperf_api.py --rpc ... --last-blocks 7200 --activity-store activity.pkl   # daily cron
+  python activity_buckets.py info --store activity.pkl
+  python activity_buckets.py window --store activity.pkl --buckets 7 --output window_7d.csv
+  python activity_buckets.py prune --store activity.pkl --keep 30
+"""
+
+import argparse
+import os
+import pickle
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from address_agg import CompactAggregate, address_key
+
+BUCKET_BLOCKS = 7200   # 12s 出块，约一天
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sorted [first, last] block ranges with overlapping/adjacent ones joined (also used by block_archive)."""
+    out: List[Tuple[int, int]] = []
+    for a, b in sorted(ranges):
+        if out and a <= out[-1][1] + 1:
+            out[-1] = (out[-1][0], max(out[-1][1], b))
+        else:
+            out.append((a, b))
+    return out
+
+
+class ActivityBuckets:
+    def __init__(self, bucket_blocks: int = BUCKET_BLOCKS):
+        self.bucket_blocks = bucket_blocks
+        self.buckets: Dict[int, CompactAggregate] = {}
+        self.covered: Dict[int, List[Tuple[int, int]]] = {}   # bucket -> scanned [first, last] block ranges
+        self.contracts: Set[bytes] = set()
+
+    # -------- layout --------
+    def bucket_of(self, block_number: int) -> int:
+        return block_number // self.bucket_blocks
+
+    def bucket_range(self, bucket: int) -> Tuple[int, int]:
+        return bucket * self.bucket_blocks, (bucket + 1) * self.bucket_blocks - 1
+
+    def split(self, first: int, last: int) -> Iterator[Tuple[int, int, int]]:
+        """(bucket, first, last) pieces of a block range."""
+        b = first
+        while b <= last:
+            bucket = self.bucket_of(b)
+            end = min(last, self.bucket_range(bucket)[1])
+            yield bucket, b, end
+            b = end + 1
+
+    def is_covered(self, first: int, last: int) -> bool:
+        """True if any block of [first, last] was already added."""
+        for bucket, a, b in self.split(first, last):
+            for x, y in self.covered.get(bucket, ()):
+                if a <= y and x <= b:
+                    return True
+        return False
+
+    # -------- writes --------
+    def add_part(self, bucket: int, part: CompactAggregate, first: int, last: int):
+        """
+        Merge a scan's aggregate of blocks [first, last] (all inside `bucket`) into the store.
+        Raises ValueError if any of those blocks was added before.
+        """
+        lo, hi = self.bucket_range(bucket)
+        if first < lo or last > hi:
+            raise ValueError(f"blocks [{first}, {last}] are not inside bucket {bucket} [{lo}, {hi}]")
+        if self.is_covered(first, last):
+            raise ValueError(f"blocks [{first}, {last}] overlap blocks already in bucket {bucket}")
+        cur = self.buckets.get(bucket)
+        if cur is None:
+            self.buckets[bucket] = part.finalize()
+        else:
+            cur.merge(part)
+        self.covered[bucket] = merge_ranges(self.covered.get(bucket, []) + [(first, last)])
+
+    def merge(self, other: "ActivityBuckets"):
+        """Fold another store (e.g. a shard worker's) into this one."""
+        if other.bucket_blocks != self.bucket_blocks:
+            raise ValueError("bucket_blocks differ")
+        for bucket, part in other.buckets.items():
+            for first, last in other.covered.get(bucket, []):
+                if self.is_covered(first, last):
+                    raise ValueError(f"blocks [{first}, {last}] overlap blocks already in bucket {bucket}")
+            cur = self.buckets.get(bucket)
+            if cur is None:
+                self.buckets[bucket] = part
+            else:
+                cur.merge(part)
+            self.covered[bucket] = merge_ranges(self.covered.get(bucket, []) + other.covered.get(bucket, []))
+        self.contracts |= other.contracts
+
+    def learn_contracts(self, is_contract: Dict[str, bool]):
+        """Remember getCode results so windowed sent_to_contract_txs needs no RPC later."""
+        for addr, ok in is_contract.items():
+            key = address_key(addr) if ok else None
+            if key is not None:
+                self.contracts.add(key)
+
+    def expire(self, before_bucket: int) -> int:
+        """Drop buckets older than before_bucket; returns how many were dropped."""
+        old = [b for b in self.buckets if b < before_bucket]
+        for b in old:
+            del self.buckets[b]
+            self.covered.pop(b, None)
+        return len(old)
+
+    # -------- reads --------
+    def latest_bucket(self) -> Optional[int]:
+        return max(self.buckets) if self.buckets else None
+
+    def window(self, last_bucket: int, n_buckets: int) -> CompactAggregate:
+        """Sum of buckets (last_bucket - n_buckets, last_bucket]; missing buckets count as empty."""
+        agg = CompactAggregate()
+        for b in range(last_bucket - n_buckets + 1, last_bucket + 1):
+            if b in self.buckets:
+                agg.merge(self.buckets[b])
+        return agg
+
+    def contract_map(self) -> Dict[str, bool]:
+        return {"0x" + k.hex(): True for k in self.contracts}
+
+    def window_frame(self, last_bucket: int, n_buckets: int, suffix: str = "") -> pd.DataFrame:
+        return frame_with_suffix(self.window(last_bucket, n_buckets), self.contract_map(), suffix)
+
+    def info(self) -> Dict:
+        return {
+            "bucket_blocks": self.bucket_blocks,
+            "buckets": len(self.buckets),
+            "first_bucket": min(self.buckets) if self.buckets else None,
+            "last_bucket": self.latest_bucket(),
+            "blocks": sum(p.blocks for p in self.buckets.values()),
+            "txs": sum(p.txs for p in self.buckets.values()),
+            "known_contracts": len(self.contracts),
+        }
+
+    # -------- persistence --------
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path: str, bucket_blocks: Optional[int] = None) -> "ActivityBuckets":
+        """Load a store, or start an empty one if the file does not exist yet."""
+        if not os.path.exists(path):
+            return ActivityBuckets(bucket_blocks or BUCKET_BLOCKS)
+        with open(path, "rb") as f:
+            store = pickle.load(f)
+        if bucket_blocks and store.bucket_blocks != bucket_blocks:
+            print(f"[activity] {path} uses {store.bucket_blocks} blocks per bucket (ignoring {bucket_blocks})")
+        return store
+
+
+def frame_with_suffix(agg: CompactAggregate, is_contract: Dict[str, bool], suffix: str) -> pd.DataFrame:
+    """Feature frame of a window (no balances); counter columns get `suffix`, e.g. '_7d'."""
+    df = agg.frame(is_contract, {}).drop(columns=["eth_balance"])
+    if suffix:
+        df = df.rename(columns={c: c + suffix for c in df.columns if c != "address"})
+    return df
+
+
+class RollingWindow:
+    """
+    Running sum over the last n_buckets buckets of a store. advance() merges newly
+    completed buckets in and subtracts the ones that fell out; cost is proportional to
+    the buckets that changed, not to the window length.
+
+    A bucket that was only partly scanned when it entered the window (the newest one,
+    usually) is kept as a copy; if later scans add blocks to it, advance() swaps the
+    copy for the bucket's current content.
+    """
+
+    def __init__(self, store: ActivityBuckets, n_buckets: int, last_bucket: Optional[int] = None):
+        self.store = store
+        self.n_buckets = n_buckets
+        self.last_bucket = store.latest_bucket() if last_bucket is None else last_bucket
+        # bucket -> (covered ranges when merged in, copy of the bucket if it was not full yet)
+        self.seen: Dict[int, Tuple[Tuple[Tuple[int, int], ...], Optional[CompactAggregate]]] = {}
+        self._rebuild()
+
+    def _window_buckets(self) -> range:
+        return range(self.last_bucket - self.n_buckets + 1, self.last_bucket + 1)
+
+    def _rebuild(self):
+        self.agg = CompactAggregate()
+        self.seen = {}
+        if self.last_bucket is not None:
+            for b in self._window_buckets():
+                self._add(b)
+
+    def _add(self, bucket: int):
+        covered = tuple(self.store.covered.get(bucket, ()))
+        part = self.store.buckets.get(bucket)
+        copy = None
+        if part is not None:
+            self.agg.merge(part)
+            if covered != (self.store.bucket_range(bucket),):
+                # 未扫满的桶之后还会变，记下合入时的内容，变了再换掉
+                copy = CompactAggregate().merge(part)
+        self.seen[bucket] = (covered, copy)
+
+    def _remove(self, bucket: int) -> bool:
+        """Subtract what _add merged for bucket; False if a full bucket was pruned from the store meanwhile."""
+        covered, copy = self.seen.pop(bucket)
+        if copy is not None:
+            self.agg.merge(copy, sign=-1)
+        elif covered:
+            part = self.store.buckets.get(bucket)
+            if part is None:
+                return False
+            self.agg.merge(part, sign=-1)   # 合入时已扫满，内容不会再变
+        return True
+
+    def advance(self, last_bucket: Optional[int] = None) -> CompactAggregate:
+        new_last = self.store.latest_bucket() if last_bucket is None else last_bucket
+        if new_last is None or self.last_bucket is not None and new_last < self.last_bucket:
+            return self.agg
+        if self.last_bucket is None or new_last - self.last_bucket >= self.n_buckets:
+            # 整个窗口都换了，直接重算
+            self.last_bucket = new_last
+            self._rebuild()
+            return self.agg
+        self.last_bucket = new_last
+        window = self._window_buckets()
+        ok = True
+        for b in [b for b in self.seen if b not in window]:
+            ok = self._remove(b) and ok
+        for b in window:
+            if b in self.seen and self.seen[b][0] != tuple(self.store.covered.get(b, ())):
+                ok = self._remove(b) and ok
+            if b not in self.seen:
+                self._add(b)
+        # 过期地址的 id 仍占着表项，失活过半时重建
+        if not ok or self.agg.active_count() * 2 < len(self.agg):
+            self._rebuild()
+        return self.agg
+
+    def frame(self, suffix: str = "") -> pd.DataFrame:
+        return frame_with_suffix(self.agg, self.store.contract_map(), suffix)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rolling-window activity buckets")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("info", help="Show bucket range and sizes")
+    p.add_argument("--store", required=True)
+    p = sub.add_parser("window", help="Export the features of the last N buckets")
+    p.add_argument("--store", required=True)
+    p.add_argument("--buckets", type=int, required=True, help="Window length in buckets (7 = 7 days at 7200 blocks)")
+    p.add_argument("--last-bucket", type=int, default=None, help="Window end (default: newest bucket)")
+    p.add_argument("--suffix", default=None, help="Column suffix (default: _<N>b)")
+    p.add_argument("--output", default=None, help="CSV path (default: window_<N>b.csv)")
+    p = sub.add_parser("prune", help="Keep only the newest N buckets")
+    p.add_argument("--store", required=True)
+    p.add_argument("--keep", type=int, required=True)
+    args = ap.parse_args()
+
+    store = ActivityBuckets.load(args.store)
+    if args.cmd == "info":
+        for k, v in store.info().items():
+            print(f"{k}: {v}")
+    elif args.cmd == "window":
+        last = store.latest_bucket() if args.last_bucket is None else args.last_bucket
+        if last is None:
+            raise SystemExit(f"{args.store} has no buckets")
+        suffix = f"_{args.buckets}b" if args.suffix is None else args.suffix
+        df = store.window_frame(last, args.buckets, suffix)
+        out = args.output or f"window_{args.buckets}b.csv"
+        df.to_csv(out, index=False)
+        print(f"Buckets ({last - args.buckets}, {last}] -> {out} ({len(df)} addresses)")
+    else:
+        last = store.latest_bucket()
+        n = store.expire(last - args.keep + 1) if last is not None else 0
+        store.save(args.store)
+        print(f"Dropped {n} buckets, {len(store.buckets)} left")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+Compact per-address aggregation shared by both scanners.
+
+Every address is interned once as its 20 raw bytes and mapped to an integer id;
+counters live in growable NumPy arrays indexed by that id, and (from, to) pairs
+are packed into one int64 per tx. Per-tx work is two dict lookups and two list
+appends; the counting itself happens in bulk (np.unique) every `flush_every`
+txs. The output DataFrame is built straight from the arrays.
+
+    agg = CompactAggregate()
+    agg.add_block(block)                       # dict blocks with hex addresses
+    agg.add_tx(frm, to)                        # or one tx at a time
+    is_contract = {...}                        # for agg.recipients()
+    df = agg.frame(is_contract, balances)      # same schema as before
+
+See bench_aggregate.py for memory per million addresses vs the dict version.
+"""
+
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def address_key(addr: str) -> Optional[bytes]:
+    """'0xAbC...' (any case) -> 20 raw bytes; None for anything that is not an address."""
+    try:
+        key = bytes.fromhex(addr[2:] if addr[:2] in ("0x", "0X") else addr)
+    except (TypeError, ValueError):
+        return None
+    return key if len(key) == 20 else None
+
+
+def internal_receive_counts(trace_method: str, payload: Any) -> Dict[str, int]:
+    """
+    One pass over a traced block: {to_lower: number of value > 0 internal transfers}.
+    trace_block: every call/create/suicide trace whose action.value > 0 counts for
+    action.to. debug_trace (callTracer, per-tx results as a list or a dict keyed by tx
+    hash): every node of each call tree with value > 0 counts for its `to`, nested
+    calls included. Malformed entries are skipped.
+    """
+    out: Dict[str, int] = {}
+
+    def hit(to: str):
+        out[to] = out.get(to, 0) + 1
+
+    if trace_method == "trace_block":
+        if isinstance(payload, list):
+            for t in payload:
+                try:
+                    if t.get("type") not in ("call", "create", "suicide"):
+                        continue
+                    action = t.get("action", {}) or {}
+                    to = str(action.get("to", "")).lower()
+                    v = action.get("value", 0)
+                    if isinstance(v, str):
+                        v = int(v, 16) if v.startswith("0x") else int(v or 0)
+                    if v > 0:
+                        hit(to)
+                except Exception:
+                    continue
+    elif trace_method == "debug_trace":
+        def dfs(node: Dict[str, Any]):
+            try:
+                to = str(node.get("to", "")).lower()
+                v = node.get("value", "0x0")
+                val = int(v, 16) if isinstance(v, str) and v.startswith("0x") else int(v or 0)
+                if val > 0:
+                    hit(to)
+                for c in node.get("calls", []) or []:
+                    dfs(c)
+            except Exception:
+                return
+
+        items = payload.values() if isinstance(payload, dict) else payload if isinstance(payload, list) else []
+        for item in items:
+            root = item.get("result") or item
+            if isinstance(root, dict):
+                dfs(root)
+    return out
+
+
+class GrowableArray:
+    """1-D NumPy array with amortized O(1) append/extend (capacity doubles)."""
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self._data = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+
+    def _reserve(self, n: int):
+        if n > len(self._data):
+            cap = max(n, 2 * len(self._data))
+            data = np.zeros(cap, dtype=self._data.dtype)
+            data[:self.size] = self._data[:self.size]
+            self._data = data
+
+    def resize(self, n: int):
+        """Grow to n elements (new ones are zero)."""
+        self._reserve(n)
+        self.size = max(self.size, n)
+
+    def extend(self, values: np.ndarray):
+        n = self.size + len(values)
+        self._reserve(n)
+        self._data[self.size:n] = values
+        self.size = n
+
+    def set(self, values: np.ndarray):
+        self.size = 0
+        self.extend(values)
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._data[:self.size]
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+
+class CompactAggregate:
+    """
+    Integer-interned replacement for the dict-of-str aggregation. Mergeable
+    (merge() remaps ids) and picklable, so partial aggregates can cross processes.
+    """
+
+    def __init__(self, flush_every: int = 1 << 16):
+        self._ids: Dict[bytes, int] = {}
+        self._keys: List[bytes] = []
+        self.sent = GrowableArray(np.int64)
+        self.received = GrowableArray(np.int64)
+        self.internal_recv = GrowableArray(np.int64)
+        # (from_id << 32 | to_id), compacted to unique keys + counts
+        self._edge_keys = GrowableArray(np.int64)
+        self._edge_counts = GrowableArray(np.int64)
+        self._compacted = 0
+        self._buf_from: List[int] = []
+        self._buf_to: List[int] = []
+        self.flush_every = flush_every
+        self.blocks = 0
+        self.txs = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # -------- interning --------
+    def intern(self, addr: str) -> int:
+        """Id for a 0x-prefixed address string (any case); -1 if it is empty/None or malformed."""
+        # 热路径：不调用 address_key，少一层函数调用
+        try:
+            key = bytes.fromhex(addr[2:])
+        except (TypeError, ValueError):
+            return -1
+        if len(key) != 20:
+            return -1
+        n = len(self._keys)
+        i = self._ids.setdefault(key, n)
+        if i == n:
+            self._keys.append(key)
+        return i
+
+    def _intern_key(self, key: bytes) -> int:
+        i = self._ids.get(key)
+        if i is None:
+            i = self._ids[key] = len(self._keys)
+            self._keys.append(key)
+        return i
+
+    def lookup(self, addr: str) -> int:
+        key = address_key(addr) if addr else None
+        return -1 if key is None else self._ids.get(key, -1)
+
+    def address(self, i: int) -> str:
+        return "0x" + self._keys[i].hex()
+
+    # -------- recording --------
+    def add_tx(self, frm: Optional[str], to: Optional[str]):
+        """One external tx; either side may be None/empty (e.g. contract creation)."""
+        self._buf_from.append(self.intern(frm))
+        self._buf_to.append(self.intern(to))
+        self.txs += 1
+        if len(self._buf_from) >= self.flush_every:
+            self._flush()
+
+    def add_block(self, block: Dict[str, Any], want_ids: bool = False) -> Optional[Set[int]]:
+        """
+        Aggregate the external txs of one JSON-RPC block. With want_ids=True,
+        returns the ids of the addresses seen in it (for add_trace).
+        """
+        if not block or isinstance(block, dict) and "error" in block:
+            return set() if want_ids else None
+        self.blocks += 1
+        start = len(self._buf_from)
+        intern, bf, bt = self.intern, self._buf_from, self._buf_to
+        n = 0
+        for tx in block.get("transactions") or []:
+            if not isinstance(tx, dict):
+                continue
+            bf.append(intern(tx.get("from")))
+            bt.append(intern(tx.get("to")))
+            n += 1
+        self.txs += n
+        ids = None
+        if want_ids:
+            ids = set(bf[start:]) | set(bt[start:])
+            ids.discard(-1)
+        if len(bf) >= self.flush_every:
+            self._flush()
+        return ids
+
+    def add_trace(self, method: str, payload: Any, ids_in_block: Set[int]):
+        """Count internal ETH receives, only for addresses that appeared in the traced block."""
+        counts = internal_receive_counts(method, payload)
+        if not counts:
+            return
+        self.internal_recv.resize(len(self._keys))
+        arr = self.internal_recv.view
+        for to, c in counts.items():
+            i = self.lookup(to)
+            if i in ids_in_block:
+                arr[i] += c
+
+    def _flush(self):
+        n = len(self._keys)
+        for g in (self.sent, self.received, self.internal_recv):
+            g.resize(n)
+        if not self._buf_from:
+            return
+        frm = np.array(self._buf_from, dtype=np.int64)
+        to = np.array(self._buf_to, dtype=np.int64)
+        self._buf_from, self._buf_to = [], []
+        for ids, g in ((frm, self.sent), (to, self.received)):
+            u, c = np.unique(ids[ids >= 0], return_counts=True)
+            g.view[u] += c
+        both = (frm >= 0) & (to >= 0)
+        u, c = np.unique((frm[both] << _ID_BITS) | to[both], return_counts=True)
+        self._edge_keys.extend(u)
+        self._edge_counts.extend(c)
+        # 原始边日志超过上次压缩后两倍时再去重，摊还 O(E log E)
+        if self._edge_keys.size > 2 * max(self._compacted, self.flush_every):
+            self._compact_edges()
+
+    def _compact_edges(self):
+        keys, counts = self._edge_keys.view, self._edge_counts.view
+        u, inv = np.unique(keys, return_inverse=True)
+        c = np.bincount(inv, weights=counts, minlength=len(u)).astype(np.int64)
+        nz = c != 0   # merge(sign=-1) 之后归零的边直接丢弃
+        u, c = u[nz], c[nz]
+        self._edge_keys.set(u)
+        self._edge_counts.set(c)
+        self._compacted = len(u)
+
+    def finalize(self) -> "CompactAggregate":
+        self._flush()
+        if self._edge_keys.size != self._compacted:
+            self._compact_edges()
+        return self
+
+    # -------- merge / pickle --------
+    def merge(self, other: "CompactAggregate", sign: int = 1) -> "CompactAggregate":
+        """
+        Add other's counters into self (ids are remapped through the address keys);
+        sign=-1 subtracts them again, e.g. to expire a bucket from a rolling window.
+        """
+        self._flush()
+        other.finalize()
+        remap = np.fromiter((self._intern_key(k) for k in other._keys), dtype=np.int64, count=len(other._keys))
+        self._flush()   # 扩容到新地址数
+        for mine, theirs in ((self.sent, other.sent), (self.received, other.received),
+                             (self.internal_recv, other.internal_recv)):
+            mine.view[remap] += sign * theirs.view   # remap 无重复，可直接花式索引累加
+        if other._edge_keys.size:
+            keys = other._edge_keys.view
+            frm, to = remap[keys >> _ID_BITS], remap[keys & _ID_MASK]
+            self._edge_keys.extend((frm << _ID_BITS) | to)
+            self._edge_counts.extend(sign * other._edge_counts.view)
+            self._compact_edges()
+        self.blocks += sign * other.blocks
+        self.txs += sign * other.txs
+        return self
+
+    def __getstate__(self):
+        self.finalize()
+        return {
+            "keys": b"".join(self._keys),
+            "sent": self.sent.view, "received": self.received.view, "internal_recv": self.internal_recv.view,
+            "edge_keys": self._edge_keys.view, "edge_counts": self._edge_counts.view,
+            "flush_every": self.flush_every, "blocks": self.blocks, "txs": self.txs,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state["flush_every"])
+        raw = state["keys"]
+        self._keys = [raw[i:i + 20] for i in range(0, len(raw), 20)]
+        self._ids = {k: i for i, k in enumerate(self._keys)}
+        for name in ("sent", "received", "internal_recv"):
+            getattr(self, name).set(state[name])
+        self._edge_keys.set(state["edge_keys"])
+        self._edge_counts.set(state["edge_counts"])
+        self._compacted = self._edge_keys.size
+        self.blocks, self.txs = state["blocks"], state["txs"]
+
+    # -------- results --------
+    def _edges(self):
+        self.finalize()
+        keys = self._edge_keys.view
+        return keys >> _ID_BITS, keys & _ID_MASK, self._edge_counts.view
+
+    def recipients(self) -> List[str]:
+        """Sorted tx recipients (to of a tx with a sender) — the addresses whose code matters."""
+        _, to, _ = self._edges()
+        return [self.address(i) for i in self._sorted_ids(np.unique(to))]
+
+    def _sorted_ids(self, ids: np.ndarray) -> np.ndarray:
+        # 20 字节大端序与小写 hex 字符串同序，结果与原先 sorted(str) 一致
+        if not len(ids):
+            return ids
+        keys = np.frombuffer(b"".join(self._keys[i] for i in ids), dtype="S20")
+        return ids[np.argsort(keys, kind="stable")]
+
+    def active_ids(self) -> np.ndarray:
+        """Ids with any activity, sorted by address (after a subtracting merge some may be all zero)."""
+        self._flush()
+        n = len(self._keys)
+        total = self.sent.view[:n] + self.received.view[:n] + self.internal_recv.view[:n]
+        return self._sorted_ids(np.flatnonzero(total))
+
+    def active_count(self) -> int:
+        self._flush()
+        return int(np.count_nonzero(self.sent.view + self.received.view + self.internal_recv.view))
+
+    def addresses(self) -> List[str]:
+        return [self.address(i) for i in self.active_ids()]
+
+    def contract_mask(self, is_contract: Dict[str, bool]) -> np.ndarray:
+        mask = np.zeros(len(self._keys), dtype=bool)
+        for addr, ok in is_contract.items():
+            if ok:
+                i = self.lookup(addr)
+                if i >= 0:
+                    mask[i] = True
+        return mask
+
+    def sent_to_contract(self, is_contract: Dict[str, bool]) -> np.ndarray:
+        frm, to, counts = self._edges()
+        sel = self.contract_mask(is_contract)[to]
+        return np.bincount(frm[sel], weights=counts[sel], minlength=len(self._keys)).astype(np.int64)
+
+    def frame(self, is_contract: Dict[str, bool], balances: Dict[str, float], limit: int = 0) -> pd.DataFrame:
+        """
+        AI-friendly flat rows (same columns/order as the scanners' old row dicts), sorted
+        by address; limit > 0 keeps the first `limit` addresses.
+        """
+        self.finalize()
+        ids = self.active_ids()
+        if limit > 0:
+            ids = ids[:limit]
+        addrs = [self.address(i) for i in ids]
+        sent = self.sent.view[ids]
+        recv = self.received.view[ids]
+        internal = self.internal_recv.view[ids]
+        return pd.DataFrame({
+            "address": addrs,
+            "eth_balance": [balances.get(a, None) for a in addrs],
+            "total_txs": sent + recv + internal,
+            "sent_txs": sent,
+            "received_txs": recv,
+            "sent_to_contract_txs": self.sent_to_contract(is_contract)[ids],
+            "received_from_contract_txs": internal,
+            "external_txs": sent + recv,
+            "internal_txs": internal,
+        })
+
+    def nbytes(self) -> int:
+        """Rough footprint of the NumPy side (the dict/key list are measured by the benchmark)."""
+        return sum(g.nbytes for g in (self.sent, self.received, self.internal_recv,
+                                      self._edge_keys, self._edge_counts))
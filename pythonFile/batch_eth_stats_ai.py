@@ -1,3 +1,4 @@
+import os
 import time
 import json
 import requests
@@ -199,6 +200,12 @@ def main():
 
     pd.DataFrame(results).to_csv("eth_stats.csv", index=False)
 
+    # 可选：写入特征库。Etherscan 统计的是全历史总数，整行覆盖而不是累加
+    store_path = os.environ.get("FEATURE_STORE")
+    if store_path and results:
+        from feature_sink import save_to_feature_store
+        save_to_feature_store(store_path, results, "etherscan", mode="replace")
+
     print("\nDone. Exported:")
     print(" - eth_stats.json")
     print(" - eth_stats.csv")
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Aggregation core benchmark: dict-of-str counters (what both scanners used to keep)
+vs CompactAggregate (address_agg.py).
+
+Synthetic blocks are generated lazily with fresh address strings per tx, like a
+JSON decoder would produce, so the retained memory measured with tracemalloc is
+the aggregate itself. Reports bytes per address (and per million addresses) and
+txs/s, and checks both produce the same DataFrame.
+
+  python bench_aggregate.py --addresses 1000000 --txs 3000000
+  python bench_aggregate.py --addresses 200000 --txs 600000 --output bench_agg.json
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Dict, Set, Tuple
+
+import pandas as pd
+
+from address_agg import CompactAggregate
+
+
+class DictAggregate:
+    """The previous per-scanner aggregation: separate Dict[str, int] maps + seen set."""
+
+    def __init__(self):
+        self.sent_txs: Dict[str, int] = {}
+        self.received_txs: Dict[str, int] = {}
+        self.internal_recv_txs: Dict[str, int] = {}
+        self.edges: Dict[Tuple[str, str], int] = {}
+        self.seen_addrs: Set[str] = set()
+
+    def add_block(self, block):
+        for tx in block["transactions"]:
+            frm = str(tx.get("from") or "").lower()
+            to = str(tx.get("to") or "").lower()
+            if frm:
+                self.seen_addrs.add(frm)
+                self.sent_txs[frm] = self.sent_txs.get(frm, 0) + 1
+            if to:
+                self.seen_addrs.add(to)
+                self.received_txs[to] = self.received_txs.get(to, 0) + 1
+                if frm:
+                    self.edges[(frm, to)] = self.edges.get((frm, to), 0) + 1
+
+    def recipients(self):
+        return sorted({to for (_, to) in self.edges})
+
+    def frame(self, is_contract, balances):
+        to_contract: Dict[str, int] = {}
+        for (frm, to), n in self.edges.items():
+            if is_contract.get(to):
+                to_contract[frm] = to_contract.get(frm, 0) + n
+        rows = []
+        for a in sorted(self.seen_addrs):
+            s, r, i = self.sent_txs.get(a, 0), self.received_txs.get(a, 0), self.internal_recv_txs.get(a, 0)
+            rows.append({"address": a, "eth_balance": balances.get(a, None), "total_txs": s + r + i,
+                         "sent_txs": s, "received_txs": r, "sent_to_contract_txs": to_contract.get(a, 0),
+                         "received_from_contract_txs": i, "external_txs": s + r, "internal_txs": i})
+        return pd.DataFrame(rows)
+
+
+def gen_blocks(n_addrs: int, n_txs: int, txs_per_block: int, seed: int):
+    """Yield blocks; ~5% of txs are contract creations (to=None). Mixed-case hex like real checksummed input."""
+    rnd = random.Random(seed)
+    for start in range(0, n_txs, txs_per_block):
+        txs = []
+        for _ in range(min(txs_per_block, n_txs - start)):
+            frm = f"0x{rnd.randrange(n_addrs) * 2654435761 % (1 << 160):040x}"
+            to = None if rnd.random() < 0.05 else f"0x{rnd.randrange(n_addrs) * 2654435761 % (1 << 160):040X}"
+            txs.append({"from": frm, "to": to})
+        yield {"transactions": txs}
+
+
+def measure(name, make, args):
+    gc.collect()
+    tracemalloc.start()
+    agg = make()
+    t0 = time.perf_counter()
+    for block in gen_blocks(args.addresses, args.txs, args.txs_per_block, args.seed):
+        agg.add_block(block)
+    if isinstance(agg, CompactAggregate):
+        agg.finalize()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return agg, {"name": name, "elapsed_s": round(elapsed, 3), "retained_mb": round(retained / 2**20, 1),
+                 "peak_mb": round(peak / 2**20, 1)}
+
+
+def throughput(make, blocks, n_txs):
+    agg = make()
+    t0 = time.perf_counter()
+    for block in blocks:
+        agg.add_block(block)
+    if isinstance(agg, CompactAggregate):
+        agg.finalize()
+    return n_txs / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Dict vs integer-interned address aggregation")
+    ap.add_argument("--addresses", type=int, default=1_000_000, help="Address pool size")
+    ap.add_argument("--txs", type=int, default=3_000_000)
+    ap.add_argument("--txs-per-block", type=int, default=200)
+    ap.add_argument("--throughput-txs", type=int, default=500_000, help="Pre-generated txs for the txs/s measurement")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--output", default=None, help="Write the report as JSON")
+    args = ap.parse_args()
+
+    report = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "results": []}
+    frames = {}
+    for name, make in (("dict", DictAggregate), ("compact", CompactAggregate)):
+        agg, r = measure(name, make, args)
+        n = len(agg.seen_addrs) if name == "dict" else len(agg)
+        r["addresses"] = n
+        r["bytes_per_address"] = round(r["retained_mb"] * 2**20 / n, 1)
+        r["mb_per_million_addresses"] = round(r["retained_mb"] * 1e6 / n, 1)
+        # 一半收款地址当作合约，对比 sent_to_contract
+        is_contract = {a: i % 2 == 0 for i, a in enumerate(agg.recipients())}
+        t0 = time.perf_counter()
+        frames[name] = agg.frame(is_contract, {})
+        r["frame_s"] = round(time.perf_counter() - t0, 3)
+        del agg
+        gc.collect()
+        report["results"].append(r)
+
+    blocks = list(gen_blocks(args.addresses, args.throughput_txs, args.txs_per_block, args.seed + 1))
+    for r, make in zip(report["results"], (DictAggregate, CompactAggregate)):
+        r["txs_per_s"] = round(throughput(make, blocks, args.throughput_txs))
+
+    pd.testing.assert_frame_equal(frames["dict"], frames["compact"], check_dtype=False)
+    report["frames_equal"] = True
+    for r in report["results"]:
+        print(f"[{r['name']:7}] {r['addresses']} addresses: retained {r['retained_mb']} MB "
+              f"({r['mb_per_million_addresses']} MB per 1M addresses, {r['bytes_per_address']} B/addr), "
+              f"peak {r['peak_mb']} MB, {r['txs_per_s']:,} txs/s, frame {r['frame_s']}s")
+    d, c = report["results"]
+    print(f"compact vs dict: memory x{c['retained_mb'] / d['retained_mb']:.2f}, "
+          f"throughput x{c['txs_per_s'] / d['txs_per_s']:.2f}; DataFrames identical")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
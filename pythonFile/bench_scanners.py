@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Scanner throughput benchmark against the local replay server (rpc_replay.py).
+
+Each scanner runs in a fresh subprocess (so peak RSS is its own) over the same
+block range; the replay server counts calls and HTTP requests. Reports blocks/sec,
+RPC calls and HTTP requests per block, and peak memory. --baseline compares
+against an earlier --output JSON.
+
+  python bench_scanners.py --blocks 100                                 # synthetic fixtures
+  python bench_scanners.py --fixtures mainnet.jsonl.gz --latency 0.03 --error-rate 0.01
+  python bench_scanners.py --scanners highperf --trace --output bench_scan.json --baseline bench_old.json
+  python bench_scanners.py --blocks 400 --scanners highperf sharded --workers 8 --per-call-latency 0.0005
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from rpc_replay import load_fixtures, save_fixtures, start_replay_server, synth_fixtures
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_CHILD = r'''
+import asyncio, json, resource, sys, time
+scanner, url, start, end, trace, concurrency = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), sys.argv[5] == "1", int(sys.argv[6])
+workers = int(sys.argv[8])
+from scan_metrics import NULL_METRICS, ScanMetrics
+metrics = ScanMetrics() if sys.argv[7] == "1" else NULL_METRICS
+t0 = time.perf_counter()
+if scanner == "highperf":
+    from scan_eth_highperf_api import RPCClient, scan_range
+    async def run():
+        async with RPCClient([url], max_retries=8, backoff_base=0.05, metrics=metrics) as client:
+            return await scan_range(client, start, end, concurrency=concurrency, trace_enabled=trace)
+    df = asyncio.run(run())
+elif scanner == "sharded":
+    from scan_eth_highperf_api import RPCClient, scan_range_sharded
+    async def run():
+        async with RPCClient([url], max_retries=8, backoff_base=0.05, metrics=metrics) as client:
+            return await scan_range_sharded(client, start, end, workers, concurrency=concurrency, trace_enabled=trace)
+    df = asyncio.run(run())
+else:
+    from scan_eth_public_rpc import connect_any, scan_range
+    w3 = connect_any([url])
+    df = scan_range(w3, start, end, trace_enabled=trace, endpoints=[url], metrics=metrics)
+elapsed = time.perf_counter() - t0
+print(json.dumps({"elapsed_s": elapsed, "rows": len(df),
+                  "peak_rss_mb": max(resource.getrusage(r).ru_maxrss for r in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) / 1024,
+                  "stage_seconds": metrics.snapshot().get("stage_seconds")}))
+'''
+
+
+def block_range(fixtures):
+    nums = sorted(int(r["params"][0], 16) for r in fixtures.values() if r["method"] == "eth_getBlockByNumber")
+    return nums[0], nums[-1]
+
+
+def run_scanner(name, server, url, start, end, trace, concurrency, metrics=False, workers=1):
+    server.stats.reset()
+    env = dict(os.environ, TQDM_DISABLE="1")
+    out = subprocess.run([sys.executable, "-c", _CHILD, name, url, str(start), str(end), "1" if trace else "0",
+                          str(concurrency), "1" if metrics else "0", str(workers)], cwd=HERE, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{out.stderr[-2000:]}")
+    res = json.loads(out.stdout.strip().splitlines()[-1])
+    blocks = end - start + 1
+    s = server.stats.snapshot()
+    return {
+        "scanner": name,
+        "blocks": blocks,
+        "rows": res["rows"],
+        "elapsed_s": round(res["elapsed_s"], 3),
+        "blocks_per_s": round(blocks / res["elapsed_s"], 2),
+        "calls_per_block": round(s["calls"] / blocks, 2),
+        "http_requests_per_block": round(s["http_requests"] / blocks, 2),
+        "mean_batch_size": round(s["mean_batch_size"], 1),
+        "peak_rss_mb": round(res["peak_rss_mb"], 1),
+        "injected_errors": s["injected_errors"],
+        "missing": s["missing"],
+        "by_method": s["by_method"],
+        "stage_seconds": res["stage_seconds"],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark both scanners against replayed JSON-RPC")
+    ap.add_argument("--fixtures", default=None, help="Recorded fixture file (default: synthesize one)")
+    ap.add_argument("--blocks", type=int, default=100, help="Blocks to synthesize when --fixtures is not given")
+    ap.add_argument("--txs-per-block", type=int, default=150)
+    ap.add_argument("--scanners", nargs="+", choices=["highperf", "sharded", "public"], default=["highperf", "public"])
+    ap.add_argument("--trace", action="store_true")
+    ap.add_argument("--concurrency", type=int, default=32, help="highperf scanner concurrency")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Processes for the sharded scanner")
+    ap.add_argument("--latency", type=float, default=0.0, help="Replay latency per HTTP request (s)")
+    ap.add_argument("--per-call-latency", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--batch-limit", type=int, default=0)
+    ap.add_argument("--metrics", action="store_true", help="Enable scan_metrics in the scanners and report stage times")
+    ap.add_argument("--output", default=None, help="Write the report as JSON")
+    ap.add_argument("--baseline", default=None, help="Earlier --output JSON to compare against")
+    args = ap.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = synth_fixtures(args.blocks, args.txs_per_block)
+        # 落一份到临时文件，便于复现
+        tmp = os.path.join(tempfile.gettempdir(), f"synth_{args.blocks}x{args.txs_per_block}.jsonl.gz")
+        save_fixtures(tmp, fixtures)
+        print(f"Synthetic fixtures: {tmp}")
+    start, end = block_range(fixtures)
+
+    server, url = start_replay_server(fixtures, latency=args.latency, per_call_latency=args.per_call_latency,
+                                      error_rate=args.error_rate, batch_limit=args.batch_limit)
+    report = {"config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+              "start": start, "end": end, "results": []}
+    for name in args.scanners:
+        r = run_scanner(name, server, url, start, end, args.trace, args.concurrency, args.metrics, args.workers)
+        report["results"].append(r)
+        print(f"[{name}] {r['blocks_per_s']:.1f} blocks/s, {r['calls_per_block']:.1f} calls/block, "
+              f"{r['http_requests_per_block']:.1f} HTTP req/block, peak RSS {r['peak_rss_mb']:.0f} MB, "
+              f"{r['rows']} rows ({r['elapsed_s']:.2f}s)")
+        if r["stage_seconds"]:
+            print(f"[{name}] stage seconds: " + ", ".join(f"{k}={v:.2f}" for k, v in r["stage_seconds"].items()))
+    server.shutdown()
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            old = {r["scanner"]: r for r in json.load(f)["results"]}
+        for r in report["results"]:
+            o = old.get(r["scanner"])
+            if o:
+                print(f"[{r['scanner']}] vs baseline: blocks/s x{r['blocks_per_s'] / o['blocks_per_s']:.2f}, "
+                      f"calls/block {o['calls_per_block']} -> {r['calls_per_block']}, "
+                      f"peak RSS {o['peak_rss_mb']} -> {r['peak_rss_mb']} MB")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
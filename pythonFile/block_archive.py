@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Local columnar archive of scanned blocks, so the per-address feature table can be
+recomputed after a feature change without fetching anything from the RPC again.
+
+Layout (Parquet, zstd; one file per table per block-range partition):
+
+  <root>/blocks/<first>-<last>.parquet     block_number, timestamp, tx_count, gas_used, base_fee_gwei
+  <root>/txs/<first>-<last>.parquet        block_number, tx_index, hash, from, to, value_eth, gas,
+                                           gas_price_gwei, nonce, input_size, tx_type, status
+  <root>/traces/<first>-<last>.parquet     block_number, type, from, to, value_eth, depth, created, error
+  <root>/contracts/<first>-<last>.parquet  address, is_contract, block_number   (scan results, no RPC later)
+  <root>/balances/<first>-<last>.parquet   address, eth_balance, block_number
+
+Addresses are lowercase 0x hex (dictionary-encoded by Parquet); `to` is null for
+contract creations; `status` is only known when the scan pulled receipts.
+Partitions are PARTITION_BLOCKS wide; a file never spans two partitions and a block
+is never archived twice.
+
+  python scan_eth_highperf_api.py --rpc ... --start 20000000 --end 20099999 --trace --archive archive/
+  python block_archive.py info --archive archive/
+  python block_archive.py recompute --archive archive/ --output scan_stats.csv
+"""
+
+import argparse
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from activity_buckets import merge_ranges
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:   # 归档是可选功能，没有 pyarrow 时扫描器照常运行
+    pa = None
+
+PARTITION_BLOCKS = 1000
+TABLES = ("blocks", "txs", "traces", "contracts", "balances")
+WEI = 10 ** 18
+GWEI = 10 ** 9
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise SystemExit("Block archive needs pyarrow (pip install pyarrow)")
+
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    return {
+        "blocks": pa.schema([("block_number", pa.int64()), ("timestamp", pa.int64()), ("tx_count", pa.int32()),
+                             ("gas_used", pa.int64()), ("base_fee_gwei", pa.float64())]),
+        "txs": pa.schema([("block_number", pa.int64()), ("tx_index", pa.int32()), ("hash", pa.string()),
+                          ("from", pa.string()), ("to", pa.string()), ("value_eth", pa.float64()),
+                          ("gas", pa.int64()), ("gas_price_gwei", pa.float64()), ("nonce", pa.int64()),
+                          ("input_size", pa.int32()), ("tx_type", pa.int8()), ("status", pa.int8())]),
+        "traces": pa.schema([("block_number", pa.int64()), ("type", pa.string()), ("from", pa.string()),
+                             ("to", pa.string()), ("value_eth", pa.float64()), ("depth", pa.int16()),
+                             ("created", pa.string()), ("error", pa.bool_())]),
+        "contracts": pa.schema([("address", pa.string()), ("is_contract", pa.bool_()), ("block_number", pa.int64())]),
+        "balances": pa.schema([("address", pa.string()), ("eth_balance", pa.float64()), ("block_number", pa.int64())]),
+    }
+
+
+# -------- 解码：JSON-RPC（hex 字符串）与 web3 AttributeDict（int/HexBytes）两种输入 --------
+def _int(v) -> Optional[int]:
+    if v is None:
+        return None
+    if isinstance(v, str):
+        return int(v, 16) if v.startswith("0x") else int(v or 0)
+    return int(v)
+
+
+def _addr(v) -> Optional[str]:
+    """Lowercase 0x address, or None if empty/malformed (same rule as CompactAggregate.intern)."""
+    if not v:
+        return None
+    s = str(v).lower()
+    try:
+        return s if len(bytes.fromhex(s[2:])) == 20 else None
+    except ValueError:
+        return None
+
+
+def _hex(v) -> Optional[str]:
+    if v is None or isinstance(v, str):
+        return v
+    return "0x" + bytes(v).hex()
+
+
+def _size(v) -> int:
+    if not v:
+        return 0
+    return (len(v) - 2) // 2 if isinstance(v, str) else len(v)
+
+
+def _trace_rows(method: str, payload: Any) -> Iterable[Tuple]:
+    """(type, from, to, value_wei, depth, created, error) per trace entry / callTracer node."""
+    if method == "trace_block":
+        for t in payload if isinstance(payload, list) else []:
+            try:
+                action = t.get("action", {}) or {}
+                typ = t.get("type")
+                created = (t.get("result") or {}).get("address") if typ == "create" else None
+                yield (typ, _addr(action.get("from")), _addr(action.get("to")), _int(action.get("value")) or 0,
+                       len(t.get("traceAddress") or []), _addr(created), bool(t.get("error")))
+            except Exception:
+                continue
+    elif method == "debug_trace":
+        def dfs(node: Dict[str, Any], depth: int):
+            try:
+                typ = str(node.get("type", "")).lower()
+                to = _addr(node.get("to"))
+                yield (typ, _addr(node.get("from")), to, _int(node.get("value")) or 0, depth,
+                       to if typ in ("create", "create2") else None, bool(node.get("error")))
+                for c in node.get("calls", []) or []:
+                    yield from dfs(c, depth + 1)
+            except Exception:
+                return
+
+        items = payload.values() if isinstance(payload, dict) else payload if isinstance(payload, list) else []
+        for item in items:
+            root = item.get("result") or item
+            if isinstance(root, dict):
+                yield from dfs(root, 0)
+
+
+def _range_name(first: int, last: int) -> str:
+    return f"{first:010d}-{last:010d}.parquet"
+
+
+def _parse_range(name: str) -> Optional[Tuple[int, int]]:
+    try:
+        a, b = name[:-len(".parquet")].split("-")
+        return int(a), int(b)
+    except ValueError:
+        return None
+
+
+class ArchiveWriter:
+    """
+    Buffers the decoded rows of one scan range and writes each partition as soon as all of
+    its blocks in the range have been added, so memory stays at about one partition.
+    with_blocks=False only writes the scan's contracts/balances (blocks archived by shard workers).
+    """
+
+    def __init__(self, archive: "BlockArchive", first: int, last: int, with_blocks: bool = True):
+        self.archive = archive
+        self.first, self.last = first, last
+        self._rows: Dict[int, Dict[str, List[Tuple]]] = {}
+        self._pending: Dict[int, int] = {}   # partition -> blocks still missing
+        if with_blocks:
+            for p, a, b in archive.split(first, last):
+                self._pending[p] = b - a + 1
+        self.rows_written = 0
+
+    def add_block(self, block: Any, trace_method: Optional[str] = None, trace_payload: Any = None,
+                  status: Optional[List[Optional[int]]] = None, number: Optional[int] = None):
+        """
+        One block with full txs (JSON-RPC dict or web3 AttributeDict) plus its trace, if any.
+        `status` is the receipt status per tx when known; `number` names a block that failed to fetch.
+        """
+        ok = block and hasattr(block, "get") and "error" not in block
+        bn = _int(block.get("number")) if ok else number
+        if bn is None or bn < self.first or bn > self.last:
+            return
+        p = bn // self.archive.partition_blocks
+        rows = self._rows.setdefault(p, {"blocks": [], "txs": [], "traces": []})
+        if ok:
+            txs = block.get("transactions") or []
+            base_fee = _int(block.get("baseFeePerGas"))
+            rows["blocks"].append((bn, _int(block.get("timestamp")), len(txs), _int(block.get("gasUsed")),
+                                   None if base_fee is None else base_fee / GWEI))
+            out = rows["txs"]
+            for i, tx in enumerate(txs):
+                if not hasattr(tx, "get"):
+                    continue
+                price = _int(tx.get("gasPrice"))
+                out.append((bn, i, _hex(tx.get("hash")), _addr(tx.get("from")), _addr(tx.get("to")),
+                            (_int(tx.get("value")) or 0) / WEI, _int(tx.get("gas")),
+                            None if price is None else price / GWEI, _int(tx.get("nonce")),
+                            _size(tx.get("input")), _int(tx.get("type")) or 0,
+                            status[i] if status and i < len(status) else None))
+            if trace_method and trace_payload:
+                rows["traces"].extend((bn, typ, frm, to, v / WEI, depth, created, err)
+                                      for typ, frm, to, v, depth, created, err in _trace_rows(trace_method, trace_payload))
+        if p in self._pending:
+            self._pending[p] -= 1
+            if self._pending[p] <= 0:
+                self._flush(p)
+
+    def _flush(self, p: int):
+        rows = self._rows.pop(p, None)
+        self._pending.pop(p, None)
+        lo, hi = self.archive.partition_range(p)
+        name = _range_name(max(lo, self.first), min(hi, self.last))
+        for table in ("blocks", "txs", "traces"):
+            data = rows[table] if rows else []
+            self.rows_written += len(data)
+            self.archive.write_rows(table, name, data)
+
+    def write_contracts(self, is_contract: Dict[str, bool]):
+        name = _range_name(self.first, self.last)
+        self.archive.write_rows("contracts", name, [(a.lower(), bool(ok), self.last) for a, ok in is_contract.items()])
+
+    def write_balances(self, balances: Dict[str, float]):
+        name = _range_name(self.first, self.last)
+        self.archive.write_rows("balances", name, [(a.lower(), v, self.last) for a, v in balances.items()
+                                                   if v is not None])
+
+    def close(self):
+        """Write whatever is left (partitions with blocks that never arrived)."""
+        for p in sorted(self._pending):
+            self._flush(p)
+
+
+class BlockArchive:
+    def __init__(self, root: str, partition_blocks: int = PARTITION_BLOCKS):
+        _require_pyarrow()
+        self.root = root
+        self.partition_blocks = partition_blocks
+        self.schemas = _schemas()
+
+    # -------- layout --------
+    def partition_range(self, p: int) -> Tuple[int, int]:
+        return p * self.partition_blocks, (p + 1) * self.partition_blocks - 1
+
+    def split(self, first: int, last: int):
+        """(partition, first, last) pieces of a block range."""
+        b = first
+        while b <= last:
+            p = b // self.partition_blocks
+            end = min(last, self.partition_range(p)[1])
+            yield p, b, end
+            b = end + 1
+
+    def files(self, table: str, start: Optional[int] = None, end: Optional[int] = None) -> List[Tuple[int, int, str]]:
+        """(first, last, path) of a table's files overlapping [start, end], in block order."""
+        d = os.path.join(self.root, table)
+        out = []
+        for name in os.listdir(d) if os.path.isdir(d) else []:
+            r = _parse_range(name) if name.endswith(".parquet") else None
+            if r is None:
+                continue
+            if (start is None or r[1] >= start) and (end is None or r[0] <= end):
+                out.append((r[0], r[1], os.path.join(d, name)))
+        return sorted(out)
+
+    def is_covered(self, first: int, last: int) -> bool:
+        """True if any block of [first, last] is already archived."""
+        return bool(self.files("blocks", first, last))
+
+    # -------- writes --------
+    def writer(self, first: int, last: int, with_blocks: bool = True) -> ArchiveWriter:
+        """Writer for blocks [first, last]; raises ValueError if any of them is already archived."""
+        if with_blocks and self.is_covered(first, last):
+            raise ValueError(f"blocks [{first}, {last}] overlap blocks already in {self.root}")
+        return ArchiveWriter(self, first, last, with_blocks)
+
+    def write_rows(self, table: str, name: str, rows: List[Tuple]):
+        schema = self.schemas[table]
+        cols = list(zip(*rows)) if rows else [[] for _ in schema.names]
+        t = pa.table({f.name: pa.array(c, type=f.type) for f, c in zip(schema, cols)}, schema=schema)
+        d = os.path.join(self.root, table)
+        os.makedirs(d, exist_ok=True)
+        path = os.path.join(d, name)
+        tmp = path + ".tmp"
+        pq.write_table(t, tmp, compression="zstd")
+        os.replace(tmp, path)
+
+    # -------- reads --------
+    def read(self, table: str, start: Optional[int] = None, end: Optional[int] = None,
+             columns: Optional[List[str]] = None) -> "pa.Table":
+        files = self.files(table, start, end)
+        if not files:
+            return self.schemas[table].empty_table().select(columns or self.schemas[table].names)
+        t = pa.concat_tables(pq.read_table(path, columns=columns) for _, _, path in files)
+        if "block_number" in t.column_names and table in ("blocks", "txs", "traces"):
+            if start is not None:
+                t = t.filter(pc.greater_equal(t["block_number"], start))
+            if end is not None:
+                t = t.filter(pc.less_equal(t["block_number"], end))
+        return t
+
+    def info(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"partition_blocks": self.partition_blocks}
+        ranges = [(a, b) for a, b, _ in self.files("blocks")]
+        out["block_ranges"] = merge_ranges(ranges)
+        for table in TABLES:
+            files = self.files(table)
+            rows = sum(pq.ParquetFile(path).metadata.num_rows for _, _, path in files)
+            size = sum(os.path.getsize(path) for _, _, path in files)
+            out[table] = f"{len(files)} files, {rows} rows, {size / 2**20:.1f} MB"
+        return out
+
+    # -------- recompute --------
+    def recompute(self, start: Optional[int] = None, end: Optional[int] = None, check_success: bool = False,
+                  balance_limit: int = 0) -> pd.DataFrame:
+        """
+        Rebuild the scanners' feature table (same columns and order as CompactAggregate.frame)
+        from the archive with Arrow group-bys; contract status and balances come from the
+        scans' own results. check_success drops txs whose archived receipt status is 0.
+        """
+        txs = self.read("txs", start, end, columns=["block_number", "from", "to", "status"])
+        block_addrs = pa.concat_tables([
+            txs.select(["block_number", "from"]).rename_columns(["block_number", "address"]),
+            txs.select(["block_number", "to"]).rename_columns(["block_number", "address"]),
+        ]).filter(pc.is_valid(pc.field("address")))
+        if check_success:
+            txs = txs.filter(pc.not_equal(pc.fill_null(txs["status"], 1), 0))
+
+        def count_by(t: "pa.Table", key: str) -> pd.Series:
+            g = t.filter(pc.is_valid(t[key])).group_by(key).aggregate([([], "count_all")])
+            return pd.Series(g["count_all"].to_numpy(), index=g[key].to_pylist(), dtype="int64")
+
+        sent = count_by(txs, "from")
+        received = count_by(txs, "to")
+
+        contracts = self.read("contracts", columns=["address", "is_contract"])
+        contract_addrs = contracts.filter(contracts["is_contract"])["address"].unique()
+        edges = txs.filter(pc.and_(pc.is_valid(txs["from"]), pc.is_valid(txs["to"])))
+        to_contract = count_by(edges.filter(pc.is_in(edges["to"], value_set=contract_addrs)), "from")
+
+        # 内部转账：value>0 且收款方出现在同一区块的交易里（与 add_trace 的 ids_in_block 规则一致）
+        traces = self.read("traces", start, end, columns=["block_number", "to", "value_eth"])
+        traces = traces.filter(pc.and_(pc.is_valid(traces["to"]), pc.greater(traces["value_eth"], 0)))
+        hits = traces.group_by(["block_number", "to"]).aggregate([([], "count_all")]) \
+            .rename_columns(["block_number", "address", "n"])
+        seen = block_addrs.group_by(["block_number", "address"]).aggregate([])
+        internal_t = hits.join(seen, ["block_number", "address"], join_type="inner") \
+            .group_by("address").aggregate([("n", "sum")])
+        internal = pd.Series(internal_t["n_sum"].to_numpy(), index=internal_t["address"].to_pylist(), dtype="int64")
+
+        addrs = pc.unique(pa.concat_arrays([c.combine_chunks() for c in (txs["from"], txs["to"])]).drop_null())
+        addrs = pc.take(addrs, pc.sort_indices(addrs)).to_pylist()
+        if balance_limit > 0:
+            addrs = addrs[:balance_limit]
+        internal = internal.reindex(addrs, fill_value=0).to_numpy()
+        sent_a = sent.reindex(addrs, fill_value=0).to_numpy()
+        recv_a = received.reindex(addrs, fill_value=0).to_numpy()
+
+        # 同一地址多次扫描时取最新一次的余额
+        bal = self.read("balances")
+        bal = bal.take(pc.sort_indices(bal["block_number"]))
+        balances = dict(zip(bal["address"].to_pylist(), bal["eth_balance"].to_pylist()))
+        return pd.DataFrame({
+            "address": addrs,
+            "eth_balance": [balances.get(a, None) for a in addrs],
+            "total_txs": sent_a + recv_a + internal,
+            "sent_txs": sent_a,
+            "received_txs": recv_a,
+            "sent_to_contract_txs": to_contract.reindex(addrs, fill_value=0).to_numpy(),
+            "received_from_contract_txs": internal,
+            "external_txs": sent_a + recv_a,
+            "internal_txs": internal,
+        })
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local Parquet archive of scanned blocks")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("info", help="Show archived block ranges and table sizes")
+    p.add_argument("--archive", required=True)
+    p = sub.add_parser("recompute", help="Rebuild the per-address feature table from the archive (no RPC)")
+    p.add_argument("--archive", required=True)
+    p.add_argument("--start", type=int, default=None, help="First block (default: all archived)")
+    p.add_argument("--end", type=int, default=None, help="Last block (default: all archived)")
+    p.add_argument("--check-success", action="store_true", help="Drop txs whose archived receipt status is failed")
+    p.add_argument("--balance-limit", type=int, default=0, help="Keep only the first N addresses (0=all)")
+    p.add_argument("--output", default="scan_stats.csv", help="CSV path")
+    p.add_argument("--parquet", action="store_true", help="Also export <output>.parquet")
+    args = ap.parse_args()
+
+    archive = BlockArchive(args.archive)
+    if args.cmd == "info":
+        for k, v in archive.info().items():
+            print(f"{k}: {v}")
+        return
+    t0 = time.perf_counter()
+    df = archive.recompute(args.start, args.end, args.check_success, args.balance_limit)
+    print(f"Recomputed {len(df)} addresses in {time.perf_counter() - t0:.2f}s")
+    df.to_csv(args.output, index=False)
+    if args.parquet:
+        df.to_parquet(os.path.splitext(args.output)[0] + ".parquet", index=False)
+    print(f"Exported: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of signed ClaimRequests keyed by (to, score, tier_id).
+
+A cached claim is returned until `margin` seconds before its own deadline,
+so the caller always has at least that long to submit it on chain. Entries
+also leave the cache by LRU eviction once `maxsize` is exceeded.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Key = Tuple[str, int, int]
+
+
+def claim_key(to: str, score: int, tier_id: int) -> Key:
+    return (to.lower(), int(score), int(tier_id))
+
+
+class ClaimCache:
+    """Thread-safe LRU cache whose entries expire at deadline - margin (wall clock)."""
+
+    def __init__(self, maxsize: int = 10000, margin: float = 60.0, clock: Callable[[], float] = time.time):
+        self.maxsize = int(maxsize)
+        self.margin = float(margin)
+        self._clock = clock
+        self._data: "OrderedDict[Key, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, to: str, score: int, tier_id: int) -> Optional[Dict[str, Any]]:
+        key = claim_key(to, score, tier_id)
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            valid_until, claim = item
+            if valid_until <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return claim
+
+    def put(self, claim: Dict[str, Any]):
+        """Store a signed claim as returned by sign_claim_py / sign_claims_batch."""
+        if self.maxsize <= 0:
+            return
+        value = claim["value"]
+        valid_until = value["deadline"] - self.margin
+        if valid_until <= self._clock():
+            return
+        key = claim_key(value["to"], value["score"], value["tierId"])
+        with self._lock:
+            self._data[key] = (valid_until, claim)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def purge_expired(self) -> int:
+        now = self._clock()
+        with self._lock:
+            stale = [k for k, (valid_until, _) in self._data.items() if valid_until <= now]
+            for k in stale:
+                del self._data[k]
+            self.expirations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "margin": self.margin,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
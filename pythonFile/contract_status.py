@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Contract / EOA status inferred from chain data the scanners already download,
+so eth_getCode is only needed for the addresses nothing else resolves.
+
+Rules (first evidence wins; contradicting evidence sends the address back to getCode):
+  tx_sender        `from` of a signed transaction is an EOA (EIP-7702 delegation is ignored:
+                   a delegated EOA has code 0xef0100... and getCode would call it a contract)
+  creation_tx      tx with to = null creates keccak(rlp([sender, nonce]))[12:] (needs `rlp`;
+                   a reverted creation leaves no code but is rarely a later tx recipient)
+  create_trace     trace_block `create` result.address / callTracer CREATE/CREATE2 `to` without error
+  internal_caller  `from` of a nested call (trace_block traceAddress != [], callTracer child) is a contract
+
+    clf = ContractClassifier()
+    clf.observe_block(block); clf.observe_trace(method, payload)
+    known, unknown = clf.resolve(recipients)       # getCode only `unknown`
+    clf.stats()                                    # calls saved per rule
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from address_agg import address_key
+
+try:
+    import rlp
+    from eth_utils import keccak
+except ImportError:   # creation_tx 规则需要 rlp；缺失时该规则不生效
+    rlp = None
+
+RULES = ("tx_sender", "creation_tx", "create_trace", "internal_caller")
+# 规则 -> (is_contract, rule)，共享同一个元组对象，省内存
+_EVIDENCE = {"tx_sender": (False, "tx_sender"), "creation_tx": (True, "creation_tx"),
+             "create_trace": (True, "create_trace"), "internal_caller": (True, "internal_caller")}
+
+
+def _int(v) -> int:
+    if isinstance(v, str):
+        return int(v, 16) if v.startswith("0x") else int(v or 0)
+    return int(v or 0)
+
+
+def create_address(sender: str, nonce) -> Optional[str]:
+    """CREATE address of a contract-creation tx; None without `rlp` or for malformed input."""
+    key = address_key(sender) if sender else None
+    if rlp is None or key is None:
+        return None
+    try:
+        return "0x" + keccak(rlp.encode([key, _int(nonce)]))[12:].hex()
+    except (TypeError, ValueError):
+        return None
+
+
+class ContractClassifier:
+    def __init__(self):
+        self.evidence: Dict[bytes, Tuple[bool, str]] = {}
+        self.conflicts: Set[bytes] = set()
+        self.saved: Dict[str, int] = {r: 0 for r in RULES}
+        self.get_code_calls = 0
+
+    def _mark(self, addr: Any, rule: str):
+        key = address_key(str(addr)) if addr else None
+        if key is None:
+            return
+        ev = _EVIDENCE[rule]
+        cur = self.evidence.setdefault(key, ev)
+        if cur[0] != ev[0]:
+            self.conflicts.add(key)
+
+    # -------- learning --------
+    def observe_block(self, block: Any):
+        """Block with full txs: JSON-RPC dict or web3 AttributeDict."""
+        if not block or not hasattr(block, "get") or "error" in block:
+            return
+        mark = self._mark
+        for tx in block.get("transactions") or []:
+            if not hasattr(tx, "get"):
+                continue
+            frm = tx.get("from")
+            mark(frm, "tx_sender")
+            if not tx.get("to") and frm:
+                mark(create_address(str(frm), tx.get("nonce", 0)), "creation_tx")
+
+    def observe_trace(self, method: str, payload: Any):
+        mark = self._mark
+        if method == "trace_block":
+            for t in payload if isinstance(payload, list) else []:
+                try:
+                    typ = t.get("type")
+                    action = t.get("action", {}) or {}
+                    if typ == "create":
+                        if not t.get("error"):
+                            mark((t.get("result") or {}).get("address"), "create_trace")
+                    elif typ == "call" and t.get("traceAddress"):
+                        mark(action.get("from"), "internal_caller")
+                except Exception:
+                    continue
+        elif method == "debug_trace":
+            def dfs(node: Dict[str, Any], depth: int):
+                try:
+                    typ = str(node.get("type", "")).upper()
+                    if typ in ("CREATE", "CREATE2") and not node.get("error"):
+                        mark(node.get("to"), "create_trace")
+                    if depth > 0:
+                        mark(node.get("from"), "internal_caller")
+                    for c in node.get("calls", []) or []:
+                        dfs(c, depth + 1)
+                except Exception:
+                    return
+
+            items = payload.values() if isinstance(payload, dict) else payload if isinstance(payload, list) else []
+            for item in items:
+                root = item.get("result") or item
+                if isinstance(root, dict):
+                    dfs(root, 0)
+
+    def merge(self, other: "ContractClassifier") -> "ContractClassifier":
+        """Fold in another classifier's evidence (e.g. from a shard worker)."""
+        for key, ev in other.evidence.items():
+            cur = self.evidence.setdefault(key, ev)
+            if cur[0] != ev[0]:
+                self.conflicts.add(key)
+        self.conflicts |= other.conflicts
+        return self
+
+    # -------- lookup --------
+    def resolve(self, addrs: Iterable[str]) -> Tuple[Dict[str, bool], List[str]]:
+        """({addr: is_contract} inferred from chain data, addresses that still need getCode)."""
+        known: Dict[str, bool] = {}
+        unknown: List[str] = []
+        evidence, conflicts, saved = self.evidence, self.conflicts, self.saved
+        for a in addrs:
+            key = address_key(a)
+            ev = evidence.get(key) if key is not None and key not in conflicts else None
+            if ev is None:
+                unknown.append(a)
+            else:
+                known[a.lower()] = ev[0]
+                saved[ev[1]] += 1
+        self.get_code_calls += len(unknown)
+        return known, unknown
+
+    def stats(self) -> Dict[str, Any]:
+        saved = sum(self.saved.values())
+        total = saved + self.get_code_calls
+        return {
+            "saved_by_rule": dict(self.saved),
+            "saved": saved,
+            "get_code_calls": self.get_code_calls,
+            "saved_ratio": round(saved / total, 4) if total else None,
+            "conflicts": len(self.conflicts),
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        rules = ", ".join(f"{r} {n}" for r, n in s["saved_by_rule"].items() if n)
+        return (f"[classify] {s['saved'] + s['get_code_calls']} recipients: {s['saved']} inferred from chain data"
+                f"{' (' + rules + ')' if rules else ''}, {s['get_code_calls']} via eth_getCode")
+
+    def report(self, metrics):
+        for rule, n in self.saved.items():
+            if n:
+                metrics.inc("getcode_saved_total", rule, n)
@@ -1,8 +1,12 @@
 from eth_account import Account
 from eth_account.messages import encode_typed_data
-import time, os
+import atexit, time, os
 from web3 import Web3
 
+from claim_signer import sign_claims_batch
+from claim_cache import ClaimCache, claim_key
+from nonce_store import NonceAllocator
+
 PRIVATE_KEY = os.environ["PRIVATE_KEY"]
 CONTRACT = os.environ["CONTRACT_ADDRESS"]
 CHAIN_ID = int(os.environ.get("CHAIN_ID", "1"))
@@ -10,10 +14,27 @@ TTL = int(os.environ.get("SIGN_TTL_SECONDS", "600"))
 
 acct = Account.from_key(PRIVATE_KEY)
 
-def sign_claim_py(to: str, score: int, tier_id: int, nonce: int | None = None):
+# nonce 按块从本地 SQLite 预留，多进程共用同一文件也不会重复
+nonces = NonceAllocator(os.environ.get("NONCE_DB", "claim_nonces.sqlite3"),
+                        block_size=int(os.environ.get("NONCE_BLOCK_SIZE", "1024")))
+# 已发出的 nonce 在内存里攒批落盘，进程退出前把剩下的写进 issued 表
+atexit.register(nonces.close)
+
+# 相同 (to, score, tier_id) 在 deadline - margin 之前直接复用已签名的 claim
+claim_cache = ClaimCache(maxsize=int(os.environ.get("CLAIM_CACHE_SIZE", "10000")),
+                         margin=float(os.environ.get("CLAIM_CACHE_MARGIN", "60")))
+
+def sign_claim_py(to: str, score: int, tier_id: int, nonce: int | None = None, use_cache: bool = True):
+    # 显式指定 nonce 时不走缓存
+    cacheable = use_cache and nonce is None
+    if cacheable:
+        cached = claim_cache.get(to, score, tier_id)
+        if cached is not None:
+            return cached
+
     deadline = int(time.time()) + TTL
     if nonce is None:
-        nonce = int(time.time_ns())  # 简易
+        nonce = nonces.allocate(to)
 
     domain = {
         "name": "CreditScoreBadge",
@@ -38,6 +59,111 @@ def sign_claim_py(to: str, score: int, tier_id: int, nonce: int | None = None):
         "deadline": int(deadline),
     }
 
-    encoded = encode_typed_data(domain_data=domain, message_types={"ClaimRequest": types["ClaimRequest"]}, message_data=message, primary_type="ClaimRequest")
+    encoded = encode_typed_data(domain_data=domain, message_types={"ClaimRequest": types["ClaimRequest"]}, message_data=message)
     signed = Account.sign_message(encoded, private_key=PRIVATE_KEY)
-    return {"value": message, "signature": signed.signature.hex()}
+    result = {"value": message, "signature": signed.signature.hex()}
+    if cacheable:
+        claim_cache.put(result)
+    return result
+
+
+def sign_claims_batch_py(claims, workers: int | None = None, chunk_size: int = 2000, use_cache: bool = True):
+    """
+    批量签名。claims 为 (to, score, tier_id) 或 (to, score, tier_id, nonce) 的序列，
+    同一批共用一个 deadline；返回结果与输入顺序一致，格式同 sign_claim_py。
+    未给出 nonce 的条目先查 claim_cache，批内重复的请求只签一次；其余一次性从 nonces
+    预留连续区间（整批只有一次落盘事务）。
+    """
+    deadline = int(time.time()) + TTL
+    claims = list(claims)
+    out = [None] * len(claims)
+    pending = {}     # claim_key -> 需要填入同一结果的下标
+    explicit = []    # 显式 nonce，不缓存
+    for i, c in enumerate(claims):
+        to, score, tier_id = c[0], int(c[1]), int(c[2])
+        if len(c) > 3 and c[3] is not None:
+            explicit.append(i)
+            continue
+        key = claim_key(to, score, tier_id)
+        if key in pending:
+            pending[key].append(i)
+            continue
+        cached = claim_cache.get(to, score, tier_id) if use_cache else None
+        if cached is not None:
+            out[i] = cached
+        else:
+            pending[key] = [i]
+
+    keys = list(pending)
+    fresh = nonces.allocate_many([claims[pending[k][0]][0] for k in keys]) if keys else []
+    normalized = [(claims[pending[k][0]][0], k[1], k[2], n, deadline) for k, n in zip(keys, fresh)]
+    normalized += [(claims[i][0], int(claims[i][1]), int(claims[i][2]), int(claims[i][3]), deadline) for i in explicit]
+    signed = sign_claims_batch(PRIVATE_KEY, CHAIN_ID, CONTRACT, normalized, workers=workers, chunk_size=chunk_size)
+
+    for k, item in zip(keys, signed):
+        if use_cache:
+            claim_cache.put(item)
+        for i in pending[k]:
+            out[i] = item
+    for i, item in zip(explicit, signed[len(keys):]):
+        out[i] = item
+    return out
+
+
+def _bench(n: int, workers: int | None, baseline_n: int):
+    """对比逐条 sign_claim_py 与批量签名的吞吐，并抽样校验签名可恢复出签名地址"""
+    import secrets
+    claims = [("0x" + secrets.token_hex(20), 500 + i % 300, i % 4, None) for i in range(n)]
+
+    t0 = time.perf_counter()
+    # 吞吐对比不走缓存，否则后面的批量签名会命中前面签过的条目
+    for to, score, tier, _ in claims[:baseline_n]:
+        sign_claim_py(to, score, tier, use_cache=False)
+    base_rate = baseline_n / (time.perf_counter() - t0)
+    print(f"sign_claim_py: {base_rate:,.0f} 签名/秒（{baseline_n} 条）")
+
+    for w in sorted({1, workers or os.cpu_count() or 1}):
+        tx0 = nonces.transactions
+        t0 = time.perf_counter()
+        out = sign_claims_batch_py(claims, workers=w, use_cache=False)
+        rate = n / (time.perf_counter() - t0)
+        print(f"sign_claims_batch_py workers={w}: {rate:,.0f} 签名/秒（{n} 条，x{rate / base_rate:.1f}，"
+              f"nonce 落盘事务 {nonces.transactions - tx0} 次）")
+    issued = [item["value"]["nonce"] for item in out]
+    assert len(set(issued)) == len(issued), "nonce 重复"
+
+    # 重复请求：从 n/10 个 (to, score, tier_id) 中抽样，观察缓存命中率与节省的签名数
+    import random
+    claim_cache.clear()
+    claim_cache.reset_stats()
+    pool = claims[: max(1, n // 10)]
+    rng = random.Random(0)
+    t0 = time.perf_counter()
+    for _ in range(baseline_n * 5):
+        to, score, tier, _ = rng.choice(pool)
+        sign_claim_py(to, score, tier)
+    rate = baseline_n * 5 / (time.perf_counter() - t0)
+    print(f"重复请求 sign_claim_py: {rate:,.0f} 次/秒，缓存 {claim_cache.stats()}")
+
+    domain = {"name": "CreditScoreBadge", "version": "1", "chainId": CHAIN_ID,
+              "verifyingContract": Web3.to_checksum_address(CONTRACT)}
+    types = {"ClaimRequest": [
+        {"name": "to", "type": "address"}, {"name": "score", "type": "uint256"},
+        {"name": "tierId", "type": "uint8"}, {"name": "nonce", "type": "uint256"},
+        {"name": "deadline", "type": "uint256"},
+    ]}
+    for item in out[:: max(1, n // 20)]:
+        encoded = encode_typed_data(domain_data=domain, message_types=types,
+                                    message_data=item["value"])
+        assert Account.recover_message(encoded, signature=item["signature"]) == acct.address
+    print("抽样校验通过：签名均可恢复出签名地址")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="ClaimRequest 签名吞吐测试")
+    ap.add_argument("--bench", type=int, default=20000, help="批量签名条数")
+    ap.add_argument("--baseline", type=int, default=1000, help="逐条 sign_claim_py 的条数")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    _bench(args.bench, args.workers, args.baseline)
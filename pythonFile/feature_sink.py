@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Write scanner output into the shared feature store (model/prediction_models/feature_store.py).
+
+Scanners count txs per block range, so they use mode="merge" with their range;
+the store refuses a merge whose blocks overlap ranges already merged. Full-history
+sources (Etherscan) use mode="replace".
+"""
+
+import os
+import sys
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model", "prediction_models")
+
+
+def save_to_feature_store(path: str, rows, source: str, first_block=None, last_block=None, mode: str = "merge") -> int:
+    """Bulk-upsert rows (DataFrame or list of dicts); exits with a message if the block range was merged before."""
+    if MODEL_DIR not in sys.path:
+        sys.path.insert(0, MODEL_DIR)
+    from feature_store import FeatureStore
+
+    store = FeatureStore(path)
+    try:
+        n = store.upsert(rows, source, first_block, last_block, mode=mode)
+        print(f"Upserted {n} rows into feature store {path} ({mode}), {len(store)} addresses total")
+    except ValueError as e:
+        raise SystemExit(f"--store: {e}")
+    finally:
+        store.close()
+    return n
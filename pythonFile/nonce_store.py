@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent nonce allocator for ClaimRequest signing (SQLite, stdlib only).
+
+- Nonces come from a single global counter. Each process reserves a block of
+  `block_size` values in one short IMMEDIATE transaction and then hands them
+  out from memory. Multiple processes can share one database file: blocks
+  never overlap, so every (to, nonce) pair is unique.
+- Issued nonces are buffered in memory and written in bulk (one executemany
+  per flush). `allocate_many` reserves and records a whole batch with O(1)
+  transactions, so there is no per-claim disk I/O.
+- `mark_consumed` records nonces seen on chain (CreditScoreBadge.usedNonce),
+  and `status(address)` reports the issued/consumed state per address.
+
+Within one allocator, nonces for a recipient increase strictly. Across
+processes each block is monotonic on its own; the contract only needs
+uniqueness per (to, nonce).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS blocks (
+    start INTEGER NOT NULL, stop INTEGER NOT NULL, pid INTEGER, reserved_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS issued (
+    address TEXT NOT NULL, nonce INTEGER NOT NULL, issued_at INTEGER NOT NULL,
+    consumed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (address, nonce)
+);
+"""
+
+
+class NonceAllocator:
+    def __init__(self, path: str = "claim_nonces.sqlite3", block_size: int = 1024,
+                 start: int = 1, flush_every: int = 4096):
+        self.path = path
+        self.block_size = block_size
+        self.start = start
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._next = 0
+        self._stop = 0
+        self._pending: List[Tuple[str, int, int]] = []
+        self.transactions = 0   # 实际落盘事务数（用于观察热路径是否触盘）
+
+    # -------- connection (re-opened after fork) --------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            # 所有访问都在 self._lock 内串行，允许跨线程复用同一连接
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('next_nonce', ?)", (self.start,))
+            self._pid = os.getpid()
+            self._next = self._stop = 0
+            self._pending = []
+        return self._conn
+
+    def _reserve(self, count: int) -> Tuple[int, int]:
+        """Atomically reserve [start, start+count) from the shared counter."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            start = db.execute("SELECT value FROM meta WHERE key = 'next_nonce'").fetchone()[0]
+            db.execute("UPDATE meta SET value = ? WHERE key = 'next_nonce'", (start + count,))
+            db.execute("INSERT INTO blocks (start, stop, pid, reserved_at) VALUES (?, ?, ?, ?)",
+                       (start, start + count, os.getpid(), int(time.time())))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self.transactions += 1
+        return start, start + count
+
+    # -------- allocation --------
+    def allocate(self, address: str) -> int:
+        """Hot path: memory only, except when the current block is exhausted."""
+        with self._lock:
+            self._db()
+            if self._next >= self._stop:
+                self._flush_locked()
+                self._next, self._stop = self._reserve(self.block_size)
+            nonce = self._next
+            self._next += 1
+            self._pending.append((address.lower(), nonce, int(time.time())))
+            if len(self._pending) >= self.flush_every:
+                self._flush_locked()
+            return nonce
+
+    def allocate_many(self, addresses: Sequence[str]) -> List[int]:
+        """Reserve a contiguous range for the whole batch and record it in one write."""
+        with self._lock:
+            self._db()
+            self._flush_locked()
+            start, _ = self._reserve(len(addresses))
+            now = int(time.time())
+            nonces = list(range(start, start + len(addresses)))
+            self._pending = [(a.lower(), n, now) for a, n in zip(addresses, nonces)]
+            self._flush_locked()
+            return nonces
+
+    # -------- state --------
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("INSERT OR IGNORE INTO issued (address, nonce, issued_at) VALUES (?, ?, ?)", self._pending)
+            db.execute("COMMIT")
+        except Exception:
+            # 失败时回滚，连接才能开下一个事务；_pending 保留，下次 flush 重试
+            db.execute("ROLLBACK")
+            raise
+        self.transactions += 1
+        self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def mark_consumed(self, pairs: Iterable[Tuple[str, int]]):
+        """Record (address, nonce) pairs that have been used on chain."""
+        with self._lock:
+            self._flush_locked()
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany("UPDATE issued SET consumed = 1 WHERE address = ? AND nonce = ?",
+                               [(a.lower(), int(n)) for a, n in pairs])
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            self.transactions += 1
+
+    def status(self, address: str) -> Dict[str, Optional[int]]:
+        with self._lock:
+            self._flush_locked()
+            row = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(consumed), 0), MAX(nonce) FROM issued WHERE address = ?",
+                (address.lower(),),
+            ).fetchone()
+        return {"issued": row[0], "consumed": row[1], "outstanding": row[0] - row[1], "last_nonce": row[2]}
+
+    def close(self):
+        with self._lock:
+            if self._conn is None or self._pid != os.getpid():
+                # 没连过库，或是 fork 前父进程的连接：子进程里不碰它
+                self._conn = None
+                return
+            self._flush_locked()
+            self._conn.close()
+            self._conn = None
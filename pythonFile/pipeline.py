@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end streaming pipeline: scan -> features -> score -> sign.
+
+Per-address feature rows flow through bounded asyncio queues in chunks; no
+intermediate full-table file is written. Each stage runs a configurable number
+of workers and reports its own throughput at the end.
+
+  scan     rpc:       per chunk of --scan-chunk-blocks blocks: aggregate_range +
+                      finish_scan (scan_eth_highperf_api), rows emitted per chunk
+           etherscan: per-address stats from batch_eth_stats_ai (addresses file)
+  features rpc only:  batched getBalance per address chunk -> flat rows
+  score    batched prediction.py (one predict_proba per chunk) + deterministic
+           credit score + tier mapping (same thresholds as scripts/setTiers.ts)
+  sign     eligible rows (tier >= 1) are batch-signed via eth-account.py
+  write    one JSON line per address (per address and scan chunk for rpc)
+
+Examples:
+  python pipeline.py --output claims.jsonl rpc --rpc https://eth-mainnet.g.alchemy.com/v2/KEY --last-blocks 500
+  python pipeline.py --score-workers 2 --chunk-size 1000 --no-sign rpc --rpc https://... --start 23100000 --end 23100200
+  python pipeline.py --output claims.jsonl etherscan --addresses addresses.txt
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "model", "prediction_models"))
+
+from scan_eth_highperf_api import (
+    RPCClient, add_scan_args, aggregate_range, aggregate_sharded, batch_get_balance, finish_scan, resolve_range,
+    split_range,
+)
+from activity_buckets import ActivityBuckets
+from block_archive import BlockArchive
+from contract_status import ContractClassifier
+from scan_metrics import add_metrics_args, metrics_from_args
+
+# 与 scripts/setTiers.ts / signer-api 的 mapScoreToTier 一致：(最低分, tierId)
+TIERS = [(800, 4), (750, 3), (700, 2), (600, 1)]
+
+
+def map_score_to_tier(score: int) -> int:
+    """Return the tierId for a score, 0 if the score is below every tier."""
+    for min_score, tier_id in TIERS:
+        if score >= min_score:
+            return tier_id
+    return 0
+
+
+class StageStats:
+    """Items processed, busy time and wall-clock span of one stage."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+    def record(self, items: int, started: float, ended: float):
+        self.items += items
+        self.batches += 1
+        self.busy += ended - started
+        self.first = started if self.first is None else min(self.first, started)
+        self.last = ended if self.last is None else max(self.last, ended)
+
+    def report(self) -> Dict[str, Any]:
+        wall = (self.last - self.first) if self.first is not None else 0.0
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items": self.items,
+            "batches": self.batches,
+            "wall_s": round(wall, 3),
+            "busy_s": round(self.busy, 3),
+            "items_per_s": round(self.items / wall, 1) if wall > 0 else None,
+            "utilization": round(self.busy / (wall * self.workers), 3) if wall > 0 else None,
+        }
+
+
+async def run_stage(fn: Callable[[Any], Awaitable[Any]], in_q: asyncio.Queue, out_q: Optional[asyncio.Queue],
+                    workers: int, downstream_workers: int, stats: StageStats):
+    """
+    Run `workers` consumers of in_q; each chunk goes through fn and the result (if not None)
+    is put on out_q; throughput counts the rows of the result (of the chunk for sinks).
+    One None per worker on in_q shuts the stage down; afterwards one None per downstream
+    worker is forwarded.
+    """
+    async def worker():
+        while True:
+            chunk = await in_q.get()
+            if chunk is None:
+                return
+            t0 = time.perf_counter()
+            result = await fn(chunk)
+            stats.record(len(result) if isinstance(result, list) else len(chunk), t0, time.perf_counter())
+            if out_q is not None and result:
+                await out_q.put(result)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if out_q is not None:
+        for _ in range(downstream_workers):
+            await out_q.put(None)
+
+
+# ---------------------------
+# Sources
+# ---------------------------
+
+async def scan_rpc(client: RPCClient, start_block: int, end_block: int, args, out_q: asyncio.Queue,
+                   stats: StageStats, downstream_workers: int, buckets: Optional[ActivityBuckets] = None):
+    """
+    Scan the range in chunks of --scan-chunk-blocks blocks. Each chunk goes through
+    aggregate_range (aggregate_sharded with --workers > 1) and finish_scan, and its rows
+    go downstream as soon as the chunk is done, so the later stages run while the next
+    blocks are fetched. Rows are per chunk (an address active in several chunks gets one
+    row each, tagged with first_block/last_block); balances are filled downstream.
+    """
+    # 合约推断的证据跨块累积，后面的块能少调 getCode
+    classifier = None if args.always_get_code else ContractClassifier()
+    archive = BlockArchive(args.archive) if args.archive else None
+    if archive is not None and archive.is_covered(start_block, end_block):
+        raise SystemExit(f"--archive: blocks [{start_block}, {end_block}] overlap blocks already in {args.archive}")
+    if buckets is not None and buckets.is_covered(start_block, end_block):
+        raise SystemExit(f"--activity-store: blocks [{start_block}, {end_block}] overlap the activity store")
+    chunk_blocks = args.scan_chunk_blocks if args.scan_chunk_blocks > 0 else end_block - start_block + 1
+    blocks = txs = 0
+    for first, last in split_range(start_block, end_block, chunk_blocks):
+        t0 = time.perf_counter()
+        if args.workers > 1:
+            # 分片模式下区块由各进程写入归档，这里只写合约判断
+            agg = await aggregate_sharded(client, first, last, args.workers, args.shard_blocks, args.concurrency,
+                                          args.trace, buckets, classifier, archive)
+            writer = archive.writer(first, last, with_blocks=False) if archive is not None else None
+        else:
+            writer = archive.writer(first, last) if archive is not None else None
+            agg = await aggregate_range(client, first, last, args.concurrency, args.trace, buckets, classifier, writer)
+        frame = await finish_scan(client, agg, with_balances=False, balance_limit=args.balance_limit,
+                                  batch_size=args.batch_size, buckets=buckets, classifier=classifier, archive=writer)
+        stats.record(agg.blocks, t0, time.perf_counter())
+        blocks, txs = blocks + agg.blocks, txs + agg.txs
+        print(f"[scan] blocks [{first}, {last}]: {agg.blocks} blocks, {agg.txs} txs, {len(frame)} addresses")
+        frame.insert(1, "first_block", first)
+        frame.insert(2, "last_block", last)
+        for i in range(0, len(frame), args.chunk_size):
+            await out_q.put(frame.iloc[i:i + args.chunk_size])
+    print(f"[scan] {blocks} blocks, {txs} txs")
+    for _ in range(downstream_workers):
+        await out_q.put(None)
+
+
+async def scan_etherscan(path: str, workers: int, chunk_size: int, out_q: asyncio.Queue,
+                         stats: StageStats, downstream_workers: int):
+    """Per-address stats via Etherscan (rate-limited by batch_eth_stats_ai itself)."""
+    import batch_eth_stats_ai as es
+
+    addresses = es.load_addresses(path)
+    contract_cache: Dict[str, bool] = {}
+    todo: asyncio.Queue = asyncio.Queue()
+    for i in range(0, len(addresses), chunk_size):
+        todo.put_nowait(addresses[i:i + chunk_size])
+
+    async def worker():
+        while not todo.empty():
+            chunk = todo.get_nowait()
+            rows = []
+            for addr in chunk:
+                t0 = time.perf_counter()
+                try:
+                    rows.append(await asyncio.to_thread(es.classify_for_address, addr, contract_cache))
+                except Exception as e:
+                    print(f"[scan warn] {addr} failed: {e}")
+                stats.record(1, t0, time.perf_counter())
+            if rows:
+                await out_q.put(rows)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    for _ in range(downstream_workers):
+        await out_q.put(None)
+
+
+# ---------------------------
+# Pipeline
+# ---------------------------
+
+def load_signer():
+    """eth-account.py has a hyphen in its name; load it by path (needs PRIVATE_KEY / CONTRACT_ADDRESS)."""
+    spec = importlib.util.spec_from_file_location("eth_account_signer", os.path.join(HERE, "eth-account.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def run_pipeline(args, metrics=None, buckets: Optional[ActivityBuckets] = None) -> Dict[str, Any]:
+    import prediction
+    from fast_score import deterministic_score
+
+    signer = None if args.no_sign else load_signer()
+    q = lambda: asyncio.Queue(maxsize=args.queue_size)
+    features_q, score_q, sign_q, write_q = q(), q(), q(), q()
+
+    stats = {
+        "scan": StageStats("scan", args.workers if args.source == "rpc" else args.source_workers),
+        "features": StageStats("features", args.feature_workers),
+        "score": StageStats("score", args.score_workers),
+        "sign": StageStats("sign", args.sign_workers),
+        "write": StageStats("write", 1),
+    }
+    totals = {"scored": 0, "eligible": 0, "signed": 0}
+    out = open(args.output, "w", encoding="utf-8")
+
+    async def features(chunk):
+        rows = chunk.to_dict("records")
+        if not args.no_balance:
+            balances = await batch_get_balance(client, [r["address"] for r in rows], batch_size=args.batch_size)
+            for r in rows:
+                r["eth_balance"] = balances.get(r["address"])
+        return rows
+
+    def score_chunk(rows):
+        pros = prediction.predict_professional_batch(rows)
+        scored = []
+        for row, pro in zip(rows, pros):
+            score = deterministic_score(float(pro), row)
+            scored.append(dict(row, professional=round(float(pro), 6), score=score, tier=map_score_to_tier(score)))
+        return scored
+
+    async def score(rows):
+        scored = await asyncio.to_thread(score_chunk, rows)
+        totals["scored"] += len(scored)
+        return scored
+
+    async def sign(rows):
+        eligible = [r for r in rows if r["tier"] > 0]
+        totals["eligible"] += len(eligible)
+        if signer is not None and eligible:
+            claims = [(r["address"], r["score"], r["tier"]) for r in eligible]
+            signed = await asyncio.to_thread(signer.sign_claims_batch_py, claims, args.sign_processes)
+            for r, claim in zip(eligible, signed):
+                r["claim"] = claim
+            totals["signed"] += len(signed)
+        return rows
+
+    async def write(rows):
+        out.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows))
+        return None
+
+    client = None
+    t0 = time.perf_counter()
+    try:
+        if args.source == "rpc":
+            endpoints = [args.rpc] + list(args.rpc_fallback)
+            async with RPCClient(endpoints, metrics=metrics) as client:
+                start_block, end_block = await resolve_range(client, args)
+                print(f"[pipeline] blocks [{start_block}, {end_block}]")
+                await asyncio.gather(
+                    scan_rpc(client, start_block, end_block, args, features_q, stats["scan"], args.feature_workers,
+                             buckets),
+                    run_stage(features, features_q, score_q, args.feature_workers, args.score_workers, stats["features"]),
+                    run_stage(score, score_q, sign_q, args.score_workers, args.sign_workers, stats["score"]),
+                    run_stage(sign, sign_q, write_q, args.sign_workers, 1, stats["sign"]),
+                    run_stage(write, write_q, None, 1, 0, stats["write"]),
+                )
+        else:
+            del stats["features"]
+            await asyncio.gather(
+                scan_etherscan(args.addresses, args.source_workers, args.chunk_size, score_q, stats["scan"],
+                               args.score_workers),
+                run_stage(score, score_q, sign_q, args.score_workers, args.sign_workers, stats["score"]),
+                run_stage(sign, sign_q, write_q, args.sign_workers, 1, stats["sign"]),
+                run_stage(write, write_q, None, 1, 0, stats["write"]),
+            )
+    finally:
+        out.close()
+
+    return {"elapsed_s": round(time.perf_counter() - t0, 3), **totals,
+            "stages": [s.report() for s in stats.values()]}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Streaming scan -> features -> score -> sign pipeline")
+    ap.add_argument("--output", default="pipeline_claims.jsonl", help="One JSON line per scored address")
+    ap.add_argument("--chunk-size", type=int, default=500, help="Addresses per chunk between stages")
+    ap.add_argument("--queue-size", type=int, default=4, help="Max chunks buffered between two stages")
+    ap.add_argument("--feature-workers", type=int, default=4, help="Concurrent getBalance chunks (rpc source)")
+    ap.add_argument("--score-workers", type=int, default=1)
+    ap.add_argument("--sign-workers", type=int, default=1)
+    ap.add_argument("--sign-processes", type=int, default=1, help="Process pool size inside each sign batch")
+    ap.add_argument("--no-sign", action="store_true", help="Score and map tiers only")
+    sub = ap.add_subparsers(dest="source", required=True)
+
+    rpc = sub.add_parser("rpc", help="Scan a block range via scan_eth_highperf_api")
+    add_scan_args(rpc)
+    rpc.add_argument("--scan-chunk-blocks", type=int, default=100,
+                     help="Blocks per scan chunk; rows go downstream after each chunk (0 = whole range at once)")
+    add_metrics_args(rpc)
+
+    es = sub.add_parser("etherscan", help="Per-address stats via batch_eth_stats_ai")
+    es.add_argument("--addresses", default="addresses.txt")
+    es.add_argument("--source-workers", type=int, default=1, help="Concurrent Etherscan lookups")
+    args = ap.parse_args()
+
+    if args.source != "rpc":
+        report = asyncio.run(run_pipeline(args))
+    else:
+        metrics, close_metrics = metrics_from_args(args)
+        buckets = ActivityBuckets.load(args.activity_store, args.bucket_blocks) if args.activity_store else None
+        try:
+            report = asyncio.run(run_pipeline(args, metrics, buckets))
+        finally:
+            close_metrics()
+        if buckets is not None:
+            buckets.save(args.activity_store)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Exported: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+Record/replay JSON-RPC stand-in for offline scanner tests and benchmarks.
+
+- record: a local proxy in front of a real endpoint. Point a scanner's --rpc at it;
+  every call (single or batched) is forwarded and the responses of
+  eth_getBlockByNumber / eth_getCode / eth_getBalance / trace_block /
+  debug_traceBlockByNumber (plus the chain-info calls) are saved to a gzip JSONL fixture.
+- replay: serves a fixture file, with configurable per-request latency, random
+  error rate (HTTP 503) and max batch size (JSON-RPC error -32005 like most providers).
+- synth:  writes a deterministic synthetic fixture (no mainnet needed).
+
+  python rpc_replay.py record --upstream https://eth-mainnet.g.alchemy.com/v2/KEY --fixtures mainnet.jsonl.gz --port 8545
+  python scan_eth_highperf_api.py --rpc http://127.0.0.1:8545 --start 23100000 --end 23100200   # 录制
+  python rpc_replay.py replay --fixtures mainnet.jsonl.gz --port 8545 --latency 0.05 --error-rate 0.01 --batch-limit 100
+  python rpc_replay.py synth --fixtures synth.jsonl.gz --blocks 200 --txs-per-block 150
+"""
+
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+RECORDED_METHODS = {
+    "eth_getBlockByNumber", "eth_getCode", "eth_getBalance", "trace_block", "debug_traceBlockByNumber",
+    "eth_getTransactionReceipt", "eth_blockNumber", "eth_chainId", "net_version", "web3_clientVersion",
+}
+
+
+def fixture_key(method: str, params: List[Any]) -> str:
+    """Addresses/hex are case-insensitive; the public-RPC scanner sends checksummed addresses."""
+    norm = [p.lower() if isinstance(p, str) else p for p in (params or [])]
+    return method + ":" + json.dumps(norm, separators=(",", ":"), sort_keys=True)
+
+
+def load_fixtures(path: str) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            out[fixture_key(rec["method"], rec["params"])] = rec
+    return out
+
+
+def save_fixtures(path: str, records: Dict[str, Any]):
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+        for rec in records.values():
+            f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+
+
+class ReplayStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.http_requests = 0
+            self.calls = 0
+            self.by_method: Dict[str, int] = {}
+            self.batch_sizes: List[int] = []
+            self.injected_errors = 0
+            self.rejected_batches = 0
+            self.missing = 0
+            self.bytes_sent = 0
+
+    def record(self, calls: List[Dict[str, Any]], batched: bool):
+        with self._lock:
+            self.http_requests += 1
+            self.calls += len(calls)
+            if batched:
+                self.batch_sizes.append(len(calls))
+            for c in calls:
+                m = c.get("method")
+                self.by_method[m] = self.by_method.get(m, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = self.batch_sizes
+            return {
+                "http_requests": self.http_requests,
+                "calls": self.calls,
+                "by_method": dict(self.by_method),
+                "batches": len(sizes),
+                "mean_batch_size": (sum(sizes) / len(sizes)) if sizes else 0.0,
+                "injected_errors": self.injected_errors,
+                "rejected_batches": self.rejected_batches,
+                "missing": self.missing,
+                "bytes_sent": self.bytes_sent,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "rpc-replay/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload: Any):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.stats._lock:
+            self.server.stats.bytes_sent += len(body)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+        batched = isinstance(body, list)
+        calls = body if batched else [body]
+        srv = self.server
+        srv.stats.record(calls, batched)
+        delay = srv.latency + srv.per_call_latency * len(calls)
+        if delay > 0:
+            time.sleep(delay)
+        if srv.error_rate > 0 and srv.rng.random() < srv.error_rate:
+            with srv.stats._lock:
+                srv.stats.injected_errors += 1
+            self._send(503, {"error": "injected failure"})
+            return
+        if batched and srv.batch_limit and len(calls) > srv.batch_limit:
+            with srv.stats._lock:
+                srv.stats.rejected_batches += 1
+            self._send(200, {"jsonrpc": "2.0", "id": None,
+                             "error": {"code": -32005, "message": f"batch size too large (max {srv.batch_limit})"}})
+            return
+        out = [srv.answer(c) for c in calls]
+        self._send(200, out if batched else out[0])
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Serves recorded responses; unknown calls get a JSON-RPC error (counted as `missing`)."""
+    daemon_threads = True
+
+    def __init__(self, addr, fixtures: Dict[str, Any], latency=0.0, per_call_latency=0.0,
+                 error_rate=0.0, batch_limit=0, seed=0):
+        super().__init__(addr, _Handler)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.per_call_latency = per_call_latency
+        self.error_rate = error_rate
+        self.batch_limit = batch_limit
+        self.rng = random.Random(seed)
+        self.stats = ReplayStats()
+
+    def answer(self, call: Dict[str, Any]) -> Dict[str, Any]:
+        rec = self.fixtures.get(fixture_key(call.get("method"), call.get("params")))
+        if rec is None:
+            with self.stats._lock:
+                self.stats.missing += 1
+            return {"jsonrpc": "2.0", "id": call.get("id"),
+                    "error": {"code": -32601, "message": f"not recorded: {call.get('method')}"}}
+        if "error" in rec:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": rec["error"]}
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": rec["result"]}
+
+
+class _RecordHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        resp = self.server.session.post(self.server.upstream, data=raw,
+                                        headers={"Content-Type": "application/json"}, timeout=120)
+        body = resp.content
+        try:
+            req, res = json.loads(raw), resp.json()
+            calls = req if isinstance(req, list) else [req]
+            items = res if isinstance(res, list) else [res]
+            by_id = {r.get("id"): r for r in items if isinstance(r, dict)}
+            with self.server.lock:
+                for call in calls:
+                    item = by_id.get(call.get("id"))
+                    if call.get("method") in RECORDED_METHODS and isinstance(item, dict) and ("result" in item or "error" in item):
+                        rec = {"method": call["method"], "params": call.get("params", [])}
+                        rec.update({"result": item["result"]} if "result" in item else {"error": item["error"]})
+                        self.server.records[fixture_key(call["method"], call.get("params"))] = rec
+        except ValueError:
+            pass
+        self.send_response(resp.status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RecordServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, upstream: str, path: str):
+        super().__init__(addr, _RecordHandler)
+        self.upstream = upstream
+        self.path = path
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        try:
+            self.records = {fixture_key(r["method"], r["params"]): r for r in load_fixtures(path).values()}
+        except FileNotFoundError:
+            self.records = {}
+
+    def save(self) -> int:
+        with self.lock:
+            save_fixtures(self.path, self.records)
+            return len(self.records)
+
+
+def start_replay_server(fixtures, host="127.0.0.1", port=0, **kwargs) -> Tuple[ReplayServer, str]:
+    """Start a replay server in a background thread; returns (server, url)."""
+    if isinstance(fixtures, str):
+        fixtures = load_fixtures(fixtures)
+    server = ReplayServer((host, port), fixtures, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+# ---------------------------
+# Synthetic fixtures
+# ---------------------------
+
+def synth_fixtures(blocks=200, txs_per_block=150, n_addrs=20000, contract_ratio=0.1,
+                   first_block=20_000_000, seed=7) -> Dict[str, Any]:
+    """
+    Deterministic mainnet-shaped fixtures: blocks with full txs, code, balances and trace_block.
+    Only EOAs send txs; creation txs and `create` traces add contracts (with code) at their real
+    CREATE addresses when `rlp` is available.
+    """
+    from contract_status import create_address
+
+    rng = random.Random(seed)
+    addrs = ["0x%040x" % rng.getrandbits(160) for _ in range(n_addrs)]
+    n_ctr = int(n_addrs * contract_ratio)
+    contracts, eoas = addrs[:n_ctr], addrs[n_ctr:]
+    contract_set = set(contracts)
+    # 少数热门地址（交易所、路由合约）占大部分流量；发送方只能是 EOA
+    hot = eoas[:200] + contracts[:50]
+    hot_senders = eoas[:200]
+
+    def new_contract(addr):
+        if addr and addr not in contract_set:
+            contracts.append(addr)
+            contract_set.add(addr)
+
+    records: Dict[str, Any] = {}
+
+    def put(method, params, result):
+        records[fixture_key(method, params)] = {"method": method, "params": params, "result": result}
+
+    last = first_block + blocks - 1
+    put("eth_blockNumber", [], hex(last))
+    put("eth_chainId", [], "0x1")
+    put("net_version", [], "1")
+    put("web3_clientVersion", [], "rpc-replay/synthetic")
+    seen = set()
+    for bn in range(first_block, last + 1):
+        txs, traces = [], []
+        for i in range(txs_per_block):
+            frm = rng.choice(hot_senders) if rng.random() < 0.3 else rng.choice(eoas)
+            if rng.random() < 0.01:
+                to = None
+            elif rng.random() < 0.45:
+                to = rng.choice(contracts)
+            else:
+                to = rng.choice(hot) if rng.random() < 0.3 else rng.choice(addrs)
+            h = "0x%064x" % rng.getrandbits(256)
+            nonce = rng.randrange(1000)
+            txs.append({
+                "blockNumber": hex(bn), "from": frm, "to": to, "hash": h, "transactionIndex": hex(i),
+                "nonce": hex(nonce), "value": hex(rng.randrange(10 ** 18)), "gas": "0x5208",
+                "gasPrice": hex(rng.randrange(10 ** 9, 10 ** 11)), "input": "0x", "type": "0x0",
+            })
+            seen.add(frm)
+            if not to:
+                new_contract(create_address(frm, nonce))
+            if to:
+                seen.add(to)
+                if to in contract_set and rng.random() < 0.2:
+                    dst = rng.choice(eoas)
+                    traces.append({"type": "call", "action": {"from": to, "to": dst, "value": hex(rng.randrange(1, 10 ** 17))},
+                                   "traceAddress": [0], "transactionHash": h, "blockNumber": bn})
+                elif to in contract_set and rng.random() < 0.02:
+                    # 工厂合约内部 CREATE
+                    created = "0x%040x" % rng.getrandbits(160)
+                    traces.append({"type": "create", "action": {"from": to, "value": "0x0"}, "result": {"address": created},
+                                   "traceAddress": [0], "transactionHash": h, "blockNumber": bn})
+                    new_contract(created)
+        put("eth_getBlockByNumber", [hex(bn), True], {
+            "number": hex(bn), "hash": "0x%064x" % rng.getrandbits(256), "parentHash": "0x%064x" % rng.getrandbits(256),
+            "timestamp": hex(1_700_000_000 + 12 * (bn - first_block)), "miner": rng.choice(eoas),
+            "gasLimit": "0x1c9c380", "gasUsed": hex(21000 * len(txs)), "transactions": txs,
+        })
+        put("trace_block", [hex(bn)], traces)
+    for a in sorted(seen):
+        code = "0x6080604052" if a in contract_set else "0x"
+        put("eth_getCode", [a, "latest"], code)
+        put("eth_getBalance", [a, "latest"], hex(rng.randrange(10 ** 21)))
+    return records
+
+
+def main():
+    ap = argparse.ArgumentParser(description="JSON-RPC record/replay stand-in")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    rec = sub.add_parser("record", help="Proxy to a real endpoint and save responses")
+    rec.add_argument("--upstream", required=True)
+    rec.add_argument("--fixtures", required=True, help="gzip JSONL fixture file (appended to if it exists)")
+    rec.add_argument("--host", default="127.0.0.1")
+    rec.add_argument("--port", type=int, default=8545)
+
+    rep = sub.add_parser("replay", help="Serve a fixture file")
+    rep.add_argument("--fixtures", required=True)
+    rep.add_argument("--host", default="127.0.0.1")
+    rep.add_argument("--port", type=int, default=8545)
+    rep.add_argument("--latency", type=float, default=0.0, help="Seconds added to every HTTP request")
+    rep.add_argument("--per-call-latency", type=float, default=0.0, help="Extra seconds per call in a batch")
+    rep.add_argument("--error-rate", type=float, default=0.0, help="Probability of an HTTP 503 per request")
+    rep.add_argument("--batch-limit", type=int, default=0, help="Reject batches larger than this (0=unlimited)")
+
+    syn = sub.add_parser("synth", help="Write a synthetic fixture file")
+    syn.add_argument("--fixtures", required=True)
+    syn.add_argument("--blocks", type=int, default=200)
+    syn.add_argument("--txs-per-block", type=int, default=150)
+    syn.add_argument("--addresses", type=int, default=20000)
+    syn.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    if args.cmd == "synth":
+        records = synth_fixtures(args.blocks, args.txs_per_block, args.addresses, seed=args.seed)
+        save_fixtures(args.fixtures, records)
+        print(f"Wrote {len(records)} fixtures to {args.fixtures}")
+    elif args.cmd == "record":
+        server = RecordServer((args.host, args.port), args.upstream, args.fixtures)
+        print(f"Recording {args.upstream} via http://{args.host}:{args.port}/ -> {args.fixtures} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        print(f"Saved {server.save()} fixtures to {args.fixtures}")
+    else:
+        server, url = start_replay_server(args.fixtures, args.host, args.port, latency=args.latency,
+                                          per_call_latency=args.per_call_latency, error_rate=args.error_rate,
+                                          batch_limit=args.batch_limit)
+        print(f"Replaying {len(server.fixtures)} fixtures on {url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(json.dumps(server.stats.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
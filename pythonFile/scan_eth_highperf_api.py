@@ -3,14 +3,17 @@
 High-performance Ethereum scanner using API-key RPC (Alchemy/Infura/QuickNode...).
 - Async + batched JSON-RPC for blocks/balances/codes
 - Optional `--trace` for internal transfers (if RPC supports)
-- Checkpoint resume, robust retries, multiple fallbacks
+- Robust retries, multiple fallbacks
+- Optional `--workers N`: block-range shards scanned in N processes, merged before one getCode/getBalance pass
 - Exports CSV/JSON (+ optional Parquet)
 
 Examples:
   python scan_eth_highperf_api.py --rpc https://eth-mainnet.g.alchemy.com/v2/YOUR_KEY --last-blocks 2000
   python scan_eth_highperf_api.py --rpc https://mainnet.infura.io/v3/YOUR_KEY --start 23100000 --end 23101000 --concurrency 32
   python scan_eth_highperf_api.py --rpc https://eth-mainnet.g.alchemy.com/v2/YOUR_KEY --last-blocks 1500 --trace
-  python scan_eth_highperf_api.py --rpc https://... --rpc-fallback https://... --resume --follow --batch-size 500
+  python scan_eth_highperf_api.py --rpc https://... --rpc-fallback https://... --batch-size 500
+  python scan_eth_highperf_api.py --rpc https://... --start 23100000 --end 23150000 --workers 8   # sharded
+  python scan_eth_highperf_api.py --rpc https://... --start 23100000 --end 23150000 --trace --archive archive/
 """
 
 import asyncio
@@ -20,10 +23,17 @@ import json
 import os
 import math
 import time
-from typing import Dict, List, Set, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any
 
 import pandas as pd
 
+from activity_buckets import BUCKET_BLOCKS, ActivityBuckets
+from address_agg import CompactAggregate
+from block_archive import ArchiveWriter, BlockArchive
+from contract_status import ContractClassifier
+from feature_sink import save_to_feature_store
+from scan_metrics import NULL_METRICS, ScanMetrics, add_metrics_args, metrics_from_args
+
 # ---------------------------
 # Utils
 # ---------------------------
@@ -33,9 +43,11 @@ def now_ms() -> int:
 
 class RPCClient:
     """Async JSON-RPC client with retries, batch & fallback endpoints."""
-    def __init__(self, endpoints: List[str], timeout: int = 60, max_retries: int = 5, backoff_base: float = 0.75):
+    def __init__(self, endpoints: List[str], timeout: int = 60, max_retries: int = 5, backoff_base: float = 0.75,
+                 metrics=None):
         assert endpoints, "At least one RPC endpoint is required"
         self.endpoints = endpoints
+        self.metrics = metrics or NULL_METRICS
         self.timeout = timeout
         self.max_retries = max_retries
         self.backoff_base = backoff_base
@@ -65,19 +77,37 @@ class RPCClient:
 
     async def _post(self, payload: Any) -> Any:
         """POST with retries & endpoint rotation."""
+        metrics = self.metrics
+        if metrics.enabled:
+            calls = payload if isinstance(payload, list) else [payload]
+            methods = {c["method"] for c in calls}
+            method = methods.pop() if len(methods) == 1 else "mixed"
+            batch = len(calls) if isinstance(payload, list) else 0
         for attempt in range(1, self.max_retries + 1):
             url = self._cur_endpoint()
             try:
+                t0 = time.perf_counter()
                 async with self._session.post(url, json=payload, ssl=False) as resp:
                     resp.raise_for_status()
-                    return await resp.json(content_type=None)
+                    if not metrics.enabled:
+                        return await resp.json(content_type=None)
+                    body = await resp.read()
+                t1 = time.perf_counter()
+                result = json.loads(body)
+                # 解码发生在各阶段的 RPC 内部，单独计数而不作为阶段，避免重复计时
+                metrics.inc("rpc_decode_seconds_total", method, time.perf_counter() - t1)
+                metrics.observe_rpc(method, t1 - t0, url, batch)
+                metrics.inc("rpc_bytes_received_total", url, len(body))
+                return result
             except Exception as e:
                 sleep = min(8.0, self.backoff_base * (2 ** (attempt - 1)))
                 print(f"[rpc warn] POST failed on {url} attempt {attempt}/{self.max_retries}: {e} -> sleep {sleep:.2f}s")
+                metrics.inc("rpc_retries_total", url)
                 await asyncio.sleep(sleep)
                 # rotate endpoint after second failure
                 if attempt >= 2 and len(self.endpoints) > 1:
                     self._rotate_endpoint()
+                    metrics.inc("rpc_rotations_total", url)
         raise RuntimeError("RPC POST failed after retries across endpoints")
 
     # ------------- single call -------------
@@ -125,53 +155,6 @@ async def debug_trace_block(client: RPCClient, bn_hex: str):
     res = await client.call("debug_traceBlockByNumber", params)
     return ("debug_trace", res)
 
-def count_internal_receives(trace_method: str, payload: Any, target: str) -> int:
-    target = target.lower()
-    cnt = 0
-    if trace_method == "trace_block":
-        # payload: list of traces
-        if isinstance(payload, list):
-            for t in payload:
-                try:
-                    typ = t.get("type")
-                    if typ not in ("call", "create", "suicide"):
-                        continue
-                    action = t.get("action", {}) or {}
-                    to = str(action.get("to", "")).lower()
-                    v = action.get("value", 0)
-                    if isinstance(v, str):
-                        v = int(v, 16) if v.startswith("0x") else int(v or 0)
-                    if to == target and v > 0:
-                        cnt += 1
-                except Exception:
-                    continue
-    elif trace_method == "debug_trace":
-        # payload: dict keyed by txHash or list of results
-        def dfs(node: Dict[str, Any]):
-            nonlocal cnt
-            try:
-                to = str(node.get("to", "")).lower()
-                v = node.get("value", "0x0")
-                val = int(v, 16) if isinstance(v, str) and v.startswith("0x") else int(v or 0)
-                if to == target and val > 0:
-                    cnt += 1
-                for c in node.get("calls", []) or []:
-                    dfs(c)
-            except Exception:
-                return
-
-        if isinstance(payload, dict):
-            for v in payload.values():
-                root = v.get("result") or v
-                if isinstance(root, dict):
-                    dfs(root)
-        elif isinstance(payload, list):
-            for item in payload:
-                root = item.get("result") or item
-                if isinstance(root, dict):
-                    dfs(root)
-    return cnt
-
 # ---------------------------
 # Scanner
 # ---------------------------
@@ -225,6 +208,18 @@ async def batch_get_balance(client: RPCClient, addrs: List[str], block_tag: str
                 out[addr.lower()] = None
     return out
 
+async def resolve_contracts(client: RPCClient, addrs: List[str], batch_size: int = 100,
+                            classifier: Optional[ContractClassifier] = None) -> Dict[str, bool]:
+    """{addr_lower: is_contract}: inferred by `classifier` where possible, eth_getCode for the rest."""
+    if classifier is None:
+        return await batch_get_code(client, addrs, batch_size=batch_size)
+    known, unknown = classifier.resolve(addrs)
+    is_contract = await batch_get_code(client, unknown, batch_size=batch_size)
+    is_contract.update(known)
+    classifier.report(client.metrics)
+    print(classifier.summary())
+    return is_contract
+
 async def try_trace_one_block(client: RPCClient, bn: int):
     bn_hex = hex(bn)
     try:
@@ -237,6 +232,99 @@ async def try_trace_one_block(client: RPCClient, bn: int):
         pass
     return (None, None)
 
+async def aggregate_range(client: RPCClient, start_block: int, end_block: int, concurrency: int = 32,
+                          trace_enabled: bool = False, buckets: Optional[ActivityBuckets] = None,
+                          classifier: Optional[ContractClassifier] = None,
+                          archive: Optional[ArchiveWriter] = None) -> CompactAggregate:
+    """
+    Fetch [start_block, end_block] and aggregate its txs (and traces); no getCode/getBalance yet.
+    With `buckets`, blocks are aggregated per activity bucket and also added to that store;
+    with `classifier`, blocks and traces also feed contract/EOA inference; with `archive`,
+    the decoded blocks and traces are written to the local block archive.
+    """
+    metrics = client.metrics
+    if buckets is not None and buckets.is_covered(start_block, end_block):
+        raise ValueError(f"blocks [{start_block}, {end_block}] overlap the activity store")
+    # 1) 并发抓区块
+    block_numbers = list(range(start_block, end_block + 1))
+    with metrics.stage("fetch_blocks"):
+        blocks = await fetch_blocks(client, block_numbers, concurrency=concurrency)
+
+    # 2) 扫描外部交易，先只记录 (from,to)，合约判断与余额后批量处理
+    agg = CompactAggregate()
+    parts: Dict[int, CompactAggregate] = {}
+    # aggregate 只计本地聚合，trace 请求单独计时，两个阶段互不重叠
+    agg_s = trace_s = 0.0
+    t0 = time.perf_counter()
+    for bn, block in zip(block_numbers, blocks):
+        target = agg
+        if buckets is not None and isinstance(block, dict) and block.get("number"):
+            target = parts.setdefault(buckets.bucket_of(int(block["number"], 16)), CompactAggregate())
+        ids_in_block = target.add_block(block, want_ids=trace_enabled)
+        if classifier is not None:
+            classifier.observe_block(block)
+        method = payload = None
+        if trace_enabled and ids_in_block:
+            t1 = time.perf_counter()
+            agg_s += t1 - t0
+            method, payload = await try_trace_one_block(client, int(block["number"], 16))
+            t0 = time.perf_counter()
+            trace_s += t0 - t1
+            if method and payload:
+                target.add_trace(method, payload, ids_in_block)
+                if classifier is not None:
+                    classifier.observe_trace(method, payload)
+        if archive is not None:
+            archive.add_block(block, method, payload, number=bn)
+    if buckets is not None:
+        for bucket, first, last in buckets.split(start_block, end_block):
+            part = parts.get(bucket) or CompactAggregate()
+            agg.merge(part)
+            buckets.add_part(bucket, part, first, last)
+    agg.finalize()
+    metrics.add_stage("aggregate", agg_s + time.perf_counter() - t0)
+    if trace_enabled:
+        metrics.add_stage("trace", trace_s)
+    metrics.inc("scan_blocks_total", "", agg.blocks)
+    metrics.inc("scan_txs_total", "", agg.txs)
+    return agg
+
+async def finish_scan(
+    client: RPCClient,
+    agg: CompactAggregate,
+    with_balances: bool = True,
+    balance_limit: int = 0,
+    batch_size: int = 100,
+    buckets: Optional[ActivityBuckets] = None,
+    classifier: Optional[ContractClassifier] = None,
+    archive: Optional[ArchiveWriter] = None,
+) -> pd.DataFrame:
+    """
+    Global pass over an (possibly merged) aggregate: getCode of recipients, balances, rows.
+    With `archive`, contract status and balances are archived too (recompute needs no RPC).
+    """
+    metrics = client.metrics
+    # 3) 合约判断：只对出现过的收款地址做一次批量 getCode（能从链上数据推断的跳过）
+    with metrics.stage("get_code"):
+        is_contract = await resolve_contracts(client, agg.recipients(), batch_size, classifier)
+    if buckets is not None:
+        buckets.learn_contracts(is_contract)
+    if archive is not None:
+        archive.write_contracts(is_contract)
+
+    # 4) 余额
+    addr_list = agg.addresses()
+    if balance_limit > 0:
+        addr_list = addr_list[:balance_limit]
+    with metrics.stage("get_balance"):
+        balances = await batch_get_balance(client, addr_list, batch_size=batch_size) if with_balances else {}
+    if archive is not None:
+        archive.write_balances(balances)
+        archive.close()
+
+    with metrics.stage("build_rows"):
+        return agg.frame(is_contract, balances, limit=balance_limit)
+
 async def scan_range(
     client: RPCClient,
     start_block: int,
@@ -246,15 +334,207 @@ async def scan_range(
     with_balances: bool = True,
     balance_limit: int = 0,
     trace_enabled: bool = False,
+    batch_size: int = 100,
+    buckets: Optional[ActivityBuckets] = None,
+    infer_contracts: bool = True,
+    archive: Optional[BlockArchive] = None,
 ) -> pd.DataFrame:
-    # 1) 并发抓区块
-    block_numbers = list(range(start_block, end_block + 1))
-    blocks = await fetch_blocks(client, block_numbers, concurrency=concurrency)
+    classifier = ContractClassifier() if infer_contracts else None
+    writer = archive.writer(start_block, end_block) if archive is not None else None
+    agg = await aggregate_range(client, start_block, end_block, concurrency, trace_enabled, buckets, classifier,
+                                writer)
+    return await finish_scan(client, agg, with_balances, balance_limit, batch_size, buckets, classifier, writer)
+
+# ---------------------------
+# Sharded (multi-process) scanning
+# ---------------------------
+
+def split_range(start_block: int, end_block: int, shard_blocks: int) -> List[Tuple[int, int]]:
+    """Contiguous [first, last] shards of at most shard_blocks blocks."""
+    return [(b, min(b + shard_blocks - 1, end_block)) for b in range(start_block, end_block + 1, shard_blocks)]
 
-    # 2) 扫描外部交易，先只记录 (from,to,txhash)，合约判断与余额后批量处理
-    sent_txs: Dict[str, int] = {}
-    received_txs: Dict[str, int] = {}
-    sent_to_contract_txs: Dict[str, int] = {}
-    internal_recv_from_contract_txs: Dict[str, int] = {}
+def scan_shard(endpoints: List[str], first: int, last: int, concurrency: int, trace_enabled: bool,
+               timeout: int, max_retries: int, bucket_blocks: int = 0,
+               infer_contracts: bool = False, archive: Optional[BlockArchive] = None,
+               with_metrics: bool = False) -> Tuple[Any, Optional[ContractClassifier], Any, float]:
+    """
+    Worker-process entry: own event loop + RPCClient. Returns the shard's partial aggregate
+    (or, with bucket_blocks > 0, its ActivityBuckets, whose parts add up to that aggregate),
+    its ContractClassifier evidence if requested, its ScanMetrics if `with_metrics`, and the
+    elapsed seconds. With `archive`, the worker writes the shard's blocks to it directly.
+    """
+    metrics = ScanMetrics() if with_metrics else NULL_METRICS
+    buckets = ActivityBuckets(bucket_blocks) if bucket_blocks > 0 else None
+    classifier = ContractClassifier() if infer_contracts else None
+    writer = archive.writer(first, last) if archive is not None else None
+
+    async def run():
+        async with RPCClient(endpoints, timeout=timeout, max_retries=max_retries, metrics=metrics) as client:
+            agg = await aggregate_range(client, first, last, concurrency, trace_enabled, buckets, classifier,
+                                        writer)
+            if writer is not None:
+                writer.close()
+            return agg
+    t0 = time.perf_counter()
+    agg = asyncio.run(run())
+    elapsed = time.perf_counter() - t0
+    return (agg if buckets is None else buckets), classifier, (metrics if with_metrics else None), elapsed
+
+async def aggregate_sharded(client: RPCClient, start_block: int, end_block: int, workers: int,
+                            shard_blocks: int = 0, concurrency: int = 32, trace_enabled: bool = False,
+                            buckets: Optional[ActivityBuckets] = None,
+                            classifier: Optional[ContractClassifier] = None,
+                            archive: Optional[BlockArchive] = None) -> CompactAggregate:
+    """
+    aggregate_range spread over `workers` processes (own event loop + RPCClient each);
+    partial aggregates and each shard's metrics are merged here as shards finish.
+    shard_blocks=0 picks ~4 shards per worker so one slow shard does not idle the others.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    metrics = client.metrics
+    if buckets is not None and buckets.is_covered(start_block, end_block):
+        raise ValueError(f"blocks [{start_block}, {end_block}] overlap the activity store")
+    total = end_block - start_block + 1
+    if shard_blocks <= 0:
+        shard_blocks = max(1, math.ceil(total / (workers * 4)))
+    shards = split_range(start_block, end_block, shard_blocks)
+    # 每个进程各自的并发窗口，总并发与单进程模式大致相当
+    per_worker = max(1, concurrency // workers)
+
+    loop = asyncio.get_running_loop()
+    agg = CompactAggregate()
+    # 分片的 fetch_blocks / aggregate / trace 由 worker 计时后并入，这里只记 merge
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futs = [loop.run_in_executor(pool, scan_shard, client.endpoints, a, b, per_worker, trace_enabled,
+                                     client.timeout, client.max_retries, buckets.bucket_blocks if buckets else 0,
+                                     classifier is not None, archive, metrics.enabled)
+                for a, b in shards]
+        for done, fut in enumerate(asyncio.as_completed(futs), 1):
+            part, part_classifier, part_metrics, elapsed = await fut
+            if part_metrics is not None:
+                metrics.merge(part_metrics)
+            with metrics.stage("merge"):
+                if classifier is not None:
+                    classifier.merge(part_classifier)
+                if isinstance(part, ActivityBuckets):
+                    for p in part.buckets.values():
+                        agg.merge(p)
+                    buckets.merge(part)
+                else:
+                    agg.merge(part)
+            print(f"[shard {done}/{len(shards)}] shard done in {elapsed:.1f}s")
+    return agg
+
+async def scan_range_sharded(
+    client: RPCClient,
+    start_block: int,
+    end_block: int,
+    workers: int,
+    shard_blocks: int = 0,
+    concurrency: int = 32,
+    with_balances: bool = True,
+    balance_limit: int = 0,
+    trace_enabled: bool = False,
+    batch_size: int = 100,
+    buckets: Optional[ActivityBuckets] = None,
+    infer_contracts: bool = True,
+    archive: Optional[BlockArchive] = None,
+) -> pd.DataFrame:
+    """Same result as scan_range; getCode/getBalance run once over the globally deduplicated addresses."""
+    classifier = ContractClassifier() if infer_contracts else None
+    if archive is not None and archive.is_covered(start_block, end_block):
+        raise ValueError(f"blocks [{start_block}, {end_block}] overlap blocks already in {archive.root}")
+    agg = await aggregate_sharded(client, start_block, end_block, workers, shard_blocks, concurrency, trace_enabled,
+                                  buckets, classifier, archive)
+    # 区块由各分片进程写入，这里只写全局的合约判断与余额
+    writer = archive.writer(start_block, end_block, with_blocks=False) if archive is not None else None
+    return await finish_scan(client, agg, with_balances, balance_limit, batch_size, buckets, classifier, writer)
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+async def resolve_range(client: RPCClient, args) -> Tuple[int, int]:
+    latest = await get_latest_block(client)
+    if args.last_blocks is not None:
+        return max(0, latest - args.last_blocks + 1), latest
+    if args.end is None:
+        raise SystemExit("--start 模式需要 --end")
+    if args.end < args.start:
+        raise SystemExit("--end 必须 >= --start")
+    return args.start, args.end
+
+def add_scan_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--rpc", required=True, help="Primary RPC endpoint (API-key URL)")
+    ap.add_argument("--rpc-fallback", nargs="*", default=[], help="Fallback RPC endpoints (optional)")
+    grp = ap.add_mutually_exclusive_group(required=True)
+    grp.add_argument("--last-blocks", type=int, help="Scan last N blocks")
+    grp.add_argument("--start", type=int, help="Start block (inclusive)")
+    ap.add_argument("--end", type=int, help="End block (inclusive), required if --start is used")
+    ap.add_argument("--concurrency", type=int, default=32, help="Concurrent batch requests for blocks")
+    ap.add_argument("--batch-size", type=int, default=100, help="Calls per batch for getCode/getBalance")
+    ap.add_argument("--no-balance", action="store_true", help="Skip fetching balances")
+    ap.add_argument("--balance-limit", type=int, default=0, help="Max addresses to fetch balances for (0=all)")
+    ap.add_argument("--trace", action="store_true", help="Try to use trace APIs if available")
+    ap.add_argument("--workers", type=int, default=1, help="Processes for sharded scanning (1 = single event loop)")
+    ap.add_argument("--shard-blocks", type=int, default=0, help="Blocks per shard in sharded mode (0 = auto)")
+    ap.add_argument("--always-get-code", action="store_true",
+                    help="Call eth_getCode for every recipient instead of inferring contract/EOA status from chain data")
+    ap.add_argument("--archive", default=None,
+                    help="Also write decoded blocks/txs/traces to this Parquet archive directory (see block_archive.py)")
+    ap.add_argument("--activity-store", default=None,
+                    help="Also add the scanned blocks to this rolling-window bucket file (see activity_buckets.py)")
+    ap.add_argument("--bucket-blocks", type=int, default=BUCKET_BLOCKS, help="Blocks per activity bucket (new stores only)")
+
+async def amain(args, metrics=None, buckets: Optional[ActivityBuckets] = None, archive: Optional[BlockArchive] = None):
+    endpoints = [args.rpc] + list(args.rpc_fallback)
+    async with RPCClient(endpoints, metrics=metrics) as client:
+        start_block, end_block = await resolve_range(client, args)
+        print(f"Scanning blocks [{start_block}, {end_block}]")
+        t0 = time.perf_counter()
+        opts = dict(concurrency=args.concurrency, with_balances=not args.no_balance, balance_limit=args.balance_limit,
+                    trace_enabled=args.trace, batch_size=args.batch_size, buckets=buckets,
+                    infer_contracts=not args.always_get_code, archive=archive)
+        if args.workers > 1:
+            df = await scan_range_sharded(client, start_block, end_block, args.workers, args.shard_blocks, **opts)
+        else:
+            df = await scan_range(client, start_block, end_block, **opts)
+        print(f"Scanned {end_block - start_block + 1} blocks in {time.perf_counter() - t0:.1f}s")
+    return df, start_block, end_block
+
+def main():
+    ap = argparse.ArgumentParser(description="High-performance async Ethereum scanner (API-key RPC).")
+    add_scan_args(ap)
+    ap.add_argument("--parquet", action="store_true", help="Also export scan_stats.parquet")
+    ap.add_argument("--store", default=None, help="Also upsert rows into this feature store (SQLite), merging counters")
+    add_metrics_args(ap)
+    args = ap.parse_args()
+
+    metrics, close_metrics = metrics_from_args(args)
+    buckets = ActivityBuckets.load(args.activity_store, args.bucket_blocks) if args.activity_store else None
+    archive = BlockArchive(args.archive) if args.archive else None
+    try:
+        df, start_block, end_block = asyncio.run(amain(args, metrics, buckets, archive))
+    except ValueError as e:
+        if buckets is None and archive is None:
+            raise
+        raise SystemExit(str(e))
+    finally:
+        close_metrics()
+    if buckets is not None:
+        buckets.save(args.activity_store)
+        info = buckets.info()
+        print(f"Activity store {args.activity_store}: buckets {info['first_bucket']}..{info['last_bucket']} "
+              f"({info['buckets']} x {info['bucket_blocks']} blocks)")
+    df.to_csv("scan_stats.csv", index=False)
+    df.to_json("scan_stats.json", orient="records")
+    if args.parquet:
+        df.to_parquet("scan_stats.parquet", index=False)
+    print("Exported: scan_stats.csv, scan_stats.json" + (", scan_stats.parquet" if args.parquet else ""))
+    print("Rows:", len(df))
+    if args.store:
+        save_to_feature_store(args.store, df, "scan_eth_highperf_api", start_block, end_block)
 
-    seen_addrs:_
+if __name__ == "__main__":
+    main()
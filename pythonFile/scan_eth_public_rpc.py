@@ -25,6 +25,13 @@ from requests.exceptions import SSLError, ConnectionError as ReqConnErr
 from urllib3.exceptions import ProtocolError, SSLError as URLLibSSLError
 from web3.exceptions import ContractLogicError
 
+from activity_buckets import BUCKET_BLOCKS, ActivityBuckets
+from address_agg import CompactAggregate
+from block_archive import BlockArchive
+from contract_status import ContractClassifier
+from feature_sink import save_to_feature_store
+from scan_metrics import NULL_METRICS, add_metrics_args, metrics_from_args
+
 # -----------------------
 # Helpers
 # -----------------------
@@ -37,7 +44,7 @@ def get_latest_block_with_retries(w3: Web3, endpoints: list[str], max_retry: int
     for attempt in range(1, max_retry + 1):
         try:
             return w3.eth.block_number
-        except (ReqSSLError, URLSSLError, ProtocolError, ReqConnErr, TimeoutError) as e:
+        except (SSLError, URLLibSSLError, ProtocolError, ReqConnErr, TimeoutError) as e:
             print(f"[warn] get block_number failed (network): attempt {attempt}/{max_retry}: {e}")
             time.sleep(min(delay, 10))
             delay *= 1.7
@@ -55,6 +62,7 @@ def get_block_with_retries(
     endpoints: list[str],
     max_retry: int = 6,
     base_sleep: float = 1.5,
+    metrics=NULL_METRICS,
 ):
     """
     取区块（含交易）时遇到 SSL/连接错误会自动重试与重连，必要时切换到备用 RPC。
@@ -62,8 +70,13 @@ def get_block_with_retries(
     attempt = 0
     while True:
         attempt += 1
+        if attempt > 1:
+            metrics.inc("rpc_retries_total", w3.provider.endpoint_uri)
         try:
-            return w3.eth.get_block(bn, full_transactions=True)
+            t0 = time.perf_counter()
+            block = w3.eth.get_block(bn, full_transactions=True)
+            metrics.observe_rpc("eth_getBlockByNumber", time.perf_counter() - t0, w3.provider.endpoint_uri)
+            return block
         except (SSLError, URLLibSSLError, ProtocolError, ReqConnErr, TimeoutError) as e:
             # 典型网络/SSL断连：指数退避 + 重新连接
             sleep = base_sleep * (2 ** (attempt - 1))
@@ -72,6 +85,7 @@ def get_block_with_retries(
             try:
                 # 重新连当前端点；失败则切到备份端点
                 w3 = connect_any(endpoints)
+                metrics.inc("rpc_rotations_total", w3.provider.endpoint_uri)
             except SystemExit:
                 # 如果所有端点都挂了，仍再试（也许短暂恢复）
                 pass
@@ -96,25 +110,31 @@ def iter_blocks(w3: Web3, start: int, end: int):
         # full_transactions=True returns full tx objects
         yield w3.eth.get_block(bn, full_transactions=True)
 
-def is_contract(w3: Web3, addr: str, cache: Dict[str, bool]) -> bool:
+def is_contract(w3: Web3, addr: str, cache: Dict[str, bool], metrics=NULL_METRICS) -> bool:
     """Use eth_getCode to check if address is a contract; cache results."""
     if not addr:
         return False
     al = Web3.to_checksum_address(addr)
     if al.lower() in cache:
         return cache[al.lower()]
+    t0 = time.perf_counter()
     code = w3.eth.get_code(al)
+    dt = time.perf_counter() - t0
+    metrics.observe_rpc("eth_getCode", dt, w3.provider.endpoint_uri)
+    metrics.add_stage("get_code", dt)
     # code is HexBytes; empty contract code == b'' (len 0)
     ok = bool(code and len(code) > 0)
     cache[al.lower()] = ok
     return ok
 
-def get_balances(w3: Web3, addrs: Iterable[str], tag: str = "latest") -> Dict[str, float]:
+def get_balances(w3: Web3, addrs: Iterable[str], tag: str = "latest", metrics=NULL_METRICS) -> Dict[str, float]:
     """Fetch balances sequentially (simple & robust)."""
     out: Dict[str, float] = {}
     for a in tqdm(addrs, desc="Fetching balances"):
         try:
+            t0 = time.perf_counter()
             wei = w3.eth.get_balance(Web3.to_checksum_address(a), block_identifier=tag)
+            metrics.observe_rpc("eth_getBalance", time.perf_counter() - t0, w3.provider.endpoint_uri)
             out[a] = wei / 1e18
         except Exception:
             out[a] = None
@@ -160,70 +180,6 @@ def try_trace_block(w3: Web3, block_number: int) -> Tuple[str, Any]:
 
     return (None, None)
 
-def count_internal_receives(trace_method: str, trace_payload: Any, target_addr: str) -> int:
-    """
-    Count internal ETH transfers (value > 0) received by target_addr in a traced block.
-    Supports:
-      - trace_block: list of traces with 'action' {to, value, ...}
-      - debug_trace (callTracer): nested call tree per tx
-    """
-    target = target_addr.lower()
-    cnt = 0
-
-    if trace_method == "trace_block":
-        # payload: list of traces
-        for t in trace_payload:
-            try:
-                typ = t.get("type")
-                if typ not in ("call", "create", "suicide"):
-                    continue
-                action = t.get("action", {}) or {}
-                to = str(action.get("to", "")).lower()
-                # value may be int or str decimal/hex depending on node; normalize
-                val = action.get("value", 0)
-                if isinstance(val, str):
-                    if val.startswith("0x"):
-                        val = int(val, 16)
-                    else:
-                        val = int(val or 0)
-                if to == target and val > 0:
-                    cnt += 1
-            except Exception:
-                continue
-
-    elif trace_method == "debug_trace":
-        # callTracer payload: dict keyed by txHash OR list of per-tx results
-        def dfs(node: Dict[str, Any]):
-            nonlocal cnt
-            try:
-                to = str(node.get("to", "")).lower()
-                v = node.get("value", "0x0")
-                if isinstance(v, str) and v.startswith("0x"):
-                    val = int(v, 16)
-                else:
-                    val = int(v or 0)
-                if to == target and val > 0:
-                    cnt += 1
-                for c in node.get("calls", []) or []:
-                    dfs(c)
-            except Exception:
-                return
-
-        if isinstance(trace_payload, dict):
-            # common: { txHash: {result: <call tree>} }
-            for v in trace_payload.values():
-                root = v.get("result") or v
-                if isinstance(root, dict):
-                    dfs(root)
-        elif isinstance(trace_payload, list):
-            # sometimes a list of {result: <call tree>}
-            for item in trace_payload:
-                root = item.get("result") or item
-                if isinstance(root, dict):
-                    dfs(root)
-
-    return cnt
-
 # -----------------------
 # Main scanning logic
 # -----------------------
@@ -236,23 +192,28 @@ def scan_range(
     with_balances: bool = True,
     balance_limit: int = 0,  # 0 = all
     trace_enabled: bool = False,
-    endpoints: list[str] | None = None
+    endpoints: list[str] | None = None,
+    metrics=NULL_METRICS,
+    buckets: ActivityBuckets | None = None,
+    infer_contracts: bool = True,
+    archive: BlockArchive | None = None,
 ) -> pd.DataFrame:
     """
     Scan [start_block, end_block], aggregate per-address stats.
     Returns a DataFrame with AI-friendly columns.
+    Stage times: get_block / trace are RPC-bound inside the block loop, aggregate is the rest of it.
+    With `buckets`, the blocks are also added to that rolling-window activity store.
+    With `infer_contracts`, recipients whose status the scanned txs/traces already prove skip eth_getCode.
+    With `archive`, decoded blocks, traces, contract status and balances go to the local block archive.
     """
+    if buckets is not None and buckets.is_covered(start_block, end_block):
+        raise ValueError(f"blocks [{start_block}, {end_block}] overlap the activity store")
 
-    sent_txs: Dict[str, int] = {}
-    received_txs: Dict[str, int] = {}
-    sent_to_contract_txs: Dict[str, int] = {}
-    internal_recv_from_contract_txs: Dict[str, int] = {}
-
-    seen_addrs: Set[str] = set()
+    agg = CompactAggregate()
+    parts: Dict[int, CompactAggregate] = {}   # activity bucket -> this scan's part of it
     contract_cache: Dict[str, bool] = {}
-
-    def add(d: Dict[str, int], k: str, inc: int = 1):
-        d[k] = d.get(k, 0) + inc
+    writer = archive.writer(start_block, end_block) if archive is not None else None
+    classifier = ContractClassifier() if infer_contracts else None
 
     def tx_success(h_hex: str) -> bool:
         if not check_success:
@@ -260,11 +221,22 @@ def scan_range(
         return get_tx_status(w3, h_hex) == 1
 
     total_blocks = end_block - start_block + 1
+    agg_s = 0.0   # 只计本地聚合；get_block / trace 各自计时，阶段互不重叠
     for bn in tqdm(range(start_block, end_block + 1), total=total_blocks, desc="Scanning blocks"):
-        block: BlockData = get_block_with_retries(w3, bn, endpoints)
+        block_t0 = time.perf_counter()
+        block: BlockData = get_block_with_retries(w3, bn, endpoints, metrics=metrics)
+        t0 = time.perf_counter()
+        metrics.add_stage("get_block", t0 - block_t0)
         txs: List[TxData] = block.transactions or []
+        metrics.inc("scan_blocks_total")
+        metrics.inc("scan_txs_total", "", len(txs))
+        target = agg if buckets is None else parts.setdefault(buckets.bucket_of(bn), CompactAggregate())
+        target.blocks += 1
+        if classifier is not None:
+            classifier.observe_block(block)
 
         # 1) Aggregate external txs
+        statuses: List[int | None] = []
         for tx in txs:
             try:
                 frm = str(tx.get("from", "")).lower()
@@ -277,71 +249,79 @@ def scan_range(
                 h = tx.get("hash")
                 h_hex = h.hex() if hasattr(h, "hex") else str(h or "")
 
-            if check_success and not tx_success(h_hex):
-                continue
+            if check_success:
+                ok = tx_success(h_hex)
+                statuses.append(int(ok))
+                if not ok:
+                    continue
 
-            if frm:
-                seen_addrs.add(frm)
-                add(sent_txs, frm, 1)
-            if to:
-                seen_addrs.add(to)
-                add(received_txs, to, 1)
-                # sent to contract?
-                try:
-                    if to and is_contract(w3, to, contract_cache):
-                        add(sent_to_contract_txs, frm, 1)
-                except Exception:
-                    # ignore occasional RPC hiccups
-                    pass
+            # (from, to) 先记下，sent_to_contract 在扫完后按收款地址统一判断
+            target.add_tx(frm, to)
 
         # 2) Internal transfers (trace) — best-effort per block, only if supported
+        method = payload = None
         if trace_enabled:
+            t1 = time.perf_counter()
+            agg_s += t1 - t0
             method, payload = try_trace_block(w3, bn)
+            t0 = time.perf_counter()
+            metrics.add_stage("trace", t0 - t1)
             if method and payload:
                 # consider only addresses that appeared in this block for internal receive counting
-                addrs_in_block: Set[str] = set()
+                ids_in_block: Set[int] = set()
                 for tx in txs:
-                    if tx.get("from"):
-                        addrs_in_block.add(str(tx["from"]).lower())
-                    if tx.get("to"):
-                        addrs_in_block.add(str(tx["to"]).lower())
-                for addr in addrs_in_block:
-                    try:
-                        c = count_internal_receives(method, payload, addr)
-                        if c:
-                            add(internal_recv_from_contract_txs, addr, c)
-                            seen_addrs.add(addr)
-                    except Exception:
-                        # ignore per-block trace parse errors
-                        pass
+                    for a in (tx.get("from"), tx.get("to")):
+                        i = target.lookup(str(a)) if a else -1
+                        if i >= 0:
+                            ids_in_block.add(i)
+                target.add_trace(method, payload, ids_in_block)
+                if classifier is not None:
+                    classifier.observe_trace(method, payload)
             # if unsupported, payload is None and we gracefully skip
-
-    # 3) Balances
-    addr_list = sorted(seen_addrs)
+        if writer is not None:
+            writer.add_block(block, method, payload, status=statuses or None, number=bn)
+        agg_s += time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if buckets is not None:
+        for bucket, first, last in buckets.split(start_block, end_block):
+            part = parts.get(bucket) or CompactAggregate()
+            agg.merge(part)
+            buckets.add_part(bucket, part, first, last)
+    agg.finalize()
+    metrics.add_stage("aggregate", agg_s + time.perf_counter() - t0)
+
+    # 3) Contract status of every tx recipient (cached per address); inferred ones skip getCode
+    recipients = agg.recipients()
+    if classifier is not None:
+        known, recipients = classifier.resolve(recipients)
+        contract_cache.update(known)
+        classifier.report(metrics)
+        print(classifier.summary())
+    for to in tqdm(recipients, desc="Checking contracts"):
+        try:
+            is_contract(w3, to, contract_cache, metrics)
+        except Exception:
+            # ignore occasional RPC hiccups
+            pass
+    if buckets is not None:
+        buckets.learn_contracts(contract_cache)
+    if writer is not None:
+        writer.write_contracts(contract_cache)
+
+    # 4) Balances
+    addr_list = agg.addresses()
     if balance_limit > 0:
         addr_list = addr_list[:balance_limit]
-    balances = get_balances(w3, addr_list) if with_balances else {}
-
-    # 4) Build rows (AI-friendly flat fields)
-    rows = []
-    for a in addr_list:
-        ext_sent = sent_txs.get(a, 0)
-        ext_recv = received_txs.get(a, 0)
-        ext_to_contract = sent_to_contract_txs.get(a, 0)
-        internal_recv = internal_recv_from_contract_txs.get(a, 0)
-
-        rows.append({
-            "address": a,
-            "eth_balance": balances.get(a, None),
-            "total_txs": int(ext_sent + ext_recv + internal_recv),
-            "sent_txs": int(ext_sent),
-            "received_txs": int(ext_recv),
-            "sent_to_contract_txs": int(ext_to_contract),
-            "received_from_contract_txs": int(internal_recv),
-            "external_txs": int(ext_sent + ext_recv),
-            "internal_txs": int(internal_recv),
-        })
-    return pd.DataFrame(rows)
+    with metrics.stage("get_balance"):
+        balances = get_balances(w3, addr_list, metrics=metrics) if with_balances else {}
+    if writer is not None:
+        writer.write_balances(balances)
+        writer.close()
+
+    # 5) Build rows (AI-friendly flat fields)
+    with metrics.stage("build_rows"):
+        return agg.frame(contract_cache, balances, limit=balance_limit)
 
 # -----------------------
 # CLI
@@ -389,7 +369,19 @@ def main():
     ap.add_argument("--no-balance", action="store_true", help="Skip fetching balances")
     ap.add_argument("--balance-limit", type=int, default=0, help="Max addresses to fetch balances for (0=all)")
     ap.add_argument("--trace", action="store_true", help="Try to use trace APIs if available")
+    ap.add_argument("--always-get-code", action="store_true",
+                    help="Call eth_getCode for every recipient instead of inferring contract/EOA status from chain data")
+    ap.add_argument("--store", default=None, help="Also upsert rows into this feature store (SQLite), merging counters")
+    ap.add_argument("--activity-store", default=None,
+                    help="Also add the scanned blocks to this rolling-window bucket file (see activity_buckets.py)")
+    ap.add_argument("--bucket-blocks", type=int, default=BUCKET_BLOCKS, help="Blocks per activity bucket (new stores only)")
+    ap.add_argument("--archive", default=None,
+                    help="Also write decoded blocks/txs/traces to this Parquet archive directory (see block_archive.py)")
+    add_metrics_args(ap)
     args = ap.parse_args()
+    metrics, close_metrics = metrics_from_args(args)
+    buckets = ActivityBuckets.load(args.activity_store, args.bucket_blocks) if args.activity_store else None
+    archive = BlockArchive(args.archive) if args.archive else None
 
     endpoints = [args.rpc] + list(args.rpc_fallback)
     w3 = connect_any(endpoints)
@@ -406,6 +398,10 @@ def main():
         start_block, end_block = args.start, args.end
 
     print(f"Scanning blocks [{start_block}, {end_block}] (latest={latest})")
+    if buckets is not None and buckets.is_covered(start_block, end_block):
+        raise SystemExit(f"--activity-store: blocks [{start_block}, {end_block}] overlap blocks already in {args.activity_store}")
+    if archive is not None and archive.is_covered(start_block, end_block):
+        raise SystemExit(f"--archive: blocks [{start_block}, {end_block}] overlap blocks already in {args.archive}")
     df = scan_range(
         w3,
         start_block,
@@ -414,13 +410,24 @@ def main():
         with_balances=not args.no_balance,
         balance_limit=args.balance_limit,
         trace_enabled=args.trace,
-        endpoints=endpoints,  # 这里传入主 RPC 和备用 RPC 列表
         endpoints=endpoints,  # 关键：把主+备用RPC传进去，scan里取块可断线重连
+        metrics=metrics,
+        buckets=buckets,
+        infer_contracts=not args.always_get_code,
+        archive=archive,
     )
+    close_metrics()
+    if buckets is not None:
+        buckets.save(args.activity_store)
+        info = buckets.info()
+        print(f"Activity store {args.activity_store}: buckets {info['first_bucket']}..{info['last_bucket']} "
+              f"({info['buckets']} x {info['bucket_blocks']} blocks)")
     df.to_csv("scan_stats.csv", index=False)
     df.to_json("scan_stats.json", orient="records")
     print("Exported: scan_stats.csv, scan_stats.json")
     print("Rows:", len(df))
+    if args.store:
+        save_to_feature_store(args.store, df, "scan_eth_public_rpc", start_block, end_block)
 
 if __name__ == "__main__":
     main()
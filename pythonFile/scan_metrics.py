@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight metrics for the scanners (stdlib only).
+
+- per-method RPC latency histograms, batch-size histogram
+- per-endpoint requests / retries / rotations / bytes received
+- seconds spent in each scan stage (fetch, aggregate, trace, getCode, ...); stages never overlap
+- JSON decode seconds per method (inside the RPC stages, so kept out of stage_seconds)
+
+Exposed as Prometheus text (`serve_prometheus(port)` -> GET /metrics) or a
+periodic JSON dump (`start_json_dump(path, interval)`). When disabled, scanners
+use NULL_METRICS whose methods are no-ops, so the hot path only pays a method call.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # 最后一格是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None when empty)."""
+        if not self.count:
+            return None
+        target, acc = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def to_dict(self):
+        return {"count": self.count, "sum": round(self.sum, 6),
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95),
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts))}
+
+
+class ScanMetrics:
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[str, Histogram] = {}
+        self.batch_size = Histogram(BATCH_BUCKETS)
+        self.counters: Dict[Tuple[str, str], float] = {}   # (name, label) -> value
+        self.stage_seconds: Dict[str, float] = {}
+        self.started = time.time()
+
+    # 锁不能 pickle：分片 worker 的指标要传回父进程合并
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # -------- recording --------
+    def observe_rpc(self, method: str, seconds: float, endpoint: str, batch: int = 0):
+        with self._lock:
+            h = self.latency.get(method)
+            if h is None:
+                h = self.latency[method] = Histogram(LATENCY_BUCKETS)
+            h.observe(seconds)
+            if batch:
+                self.batch_size.observe(batch)
+            self._inc("rpc_requests_total", endpoint)
+            self._inc("rpc_calls_total", method, batch or 1)
+
+    def _inc(self, name: str, label: str, value: float = 1):
+        key = (name, label)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def inc(self, name: str, label: str = "", value: float = 1):
+        with self._lock:
+            self._inc(name, label, value)
+
+    def add_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def merge(self, other: "ScanMetrics"):
+        """Add another process's metrics (e.g. a scan shard's) into this one."""
+        with self._lock:
+            for method, h in other.latency.items():
+                if method not in self.latency:
+                    self.latency[method] = Histogram(LATENCY_BUCKETS)
+                self.latency[method].merge(h)
+            self.batch_size.merge(other.batch_size)
+            for (name, label), v in other.counters.items():
+                self._inc(name, label, v)
+            for stage, v in other.stage_seconds.items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + v
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - t0)
+
+    # -------- export --------
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counters: Dict[str, Dict[str, float]] = {}
+            for (name, label), v in self.counters.items():
+                counters.setdefault(name, {})[label] = v
+            return {
+                "uptime_s": round(time.time() - self.started, 3),
+                "rpc_latency_seconds": {m: h.to_dict() for m, h in self.latency.items()},
+                "rpc_batch_size": self.batch_size.to_dict(),
+                "counters": counters,
+                "stage_seconds": {k: round(v, 6) for k, v in self.stage_seconds.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+
+        def hist(name, label_name, label, h):
+            lbl = f'{label_name}="{label}",' if label_name else ""
+            acc = 0
+            for b, c in zip(list(h.buckets) + ["+Inf"], h.counts):
+                acc += c
+                lines.append(f'{name}_bucket{{{lbl}le="{b}"}} {acc}')
+            tail = f"{{{lbl.rstrip(',')}}}" if lbl else ""
+            lines.append(f"{name}_sum{tail} {h.sum}")
+            lines.append(f"{name}_count{tail} {h.count}")
+
+        with self._lock:
+            lines.append("# TYPE scan_rpc_latency_seconds histogram")
+            for m, h in sorted(self.latency.items()):
+                hist("scan_rpc_latency_seconds", "method", m, h)
+            lines.append("# TYPE scan_rpc_batch_size histogram")
+            hist("scan_rpc_batch_size", "", "", self.batch_size)
+            names = sorted({n for n, _ in self.counters})
+            for n in names:
+                metric = n if n.startswith("scan_") else "scan_" + n
+                lines.append(f"# TYPE {metric} counter")
+                label_name = "method" if n in ("rpc_calls_total", "rpc_decode_seconds_total") else "endpoint" if n.startswith("rpc_") else "label"
+                for (name, label), v in sorted(self.counters.items()):
+                    if name == n:
+                        lbl = f'{{{label_name}="{label}"}}' if label else ""
+                        lines.append(f"{metric}{lbl} {v}")
+            lines.append("# TYPE scan_stage_seconds_total counter")
+            for s, v in sorted(self.stage_seconds.items()):
+                lines.append(f'scan_stage_seconds_total{{stage="{s}"}} {v}')
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+
+class _NullMetrics:
+    """Disabled metrics: every method is a no-op."""
+    enabled = False
+    _null = nullcontext()
+
+    def observe_rpc(self, method, seconds, endpoint, batch=0):
+        pass
+
+    def inc(self, name, label="", value=1):
+        pass
+
+    def add_stage(self, stage, seconds):
+        pass
+
+    def stage(self, name):
+        return self._null
+
+    def merge(self, other):
+        pass
+
+    def snapshot(self):
+        return {}
+
+
+NULL_METRICS = _NullMetrics()
+
+
+def serve_prometheus(metrics: ScanMetrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[metrics] Prometheus text on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_json_dump(metrics: ScanMetrics, path: str, interval: float = 10.0):
+    """Write a JSON snapshot every `interval` seconds; the returned function stops it after a final dump."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            metrics.dump_json(path)
+        metrics.dump_json(path)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+
+    def close():
+        stop.set()
+        thread.join()
+
+    return close
+
+
+def add_metrics_args(ap):
+    ap.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus text metrics on this port")
+    ap.add_argument("--metrics-json", default=None, help="Periodically dump metrics as JSON to this file")
+    ap.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between JSON dumps")
+
+
+def metrics_from_args(args):
+    """Returns (metrics, stop_fn). Metrics stay disabled unless a port or JSON path is given."""
+    if args.metrics_port is None and not args.metrics_json:
+        return NULL_METRICS, lambda: None
+    metrics = ScanMetrics()
+    server = serve_prometheus(metrics, args.metrics_port) if args.metrics_port is not None else None
+    stop_dump = start_json_dump(metrics, args.metrics_json, args.metrics_interval) if args.metrics_json else None
+
+    def close():
+        if stop_dump is not None:
+            stop_dump()
+        if server is not None:
+            server.shutdown()
+
+    return metrics, close
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 扫描器模块以脚本方式导入同目录模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,58 @@
+"""ActivityBuckets / RollingWindow：区块不重复计数，滚动窗口与直接求和一致（含未扫满的桶被补齐）。"""
+import pytest
+
+from activity_buckets import ActivityBuckets, RollingWindow
+from address_agg import CompactAggregate
+
+SENDER = '0x' + '11' * 20
+
+
+def scan(store, first, last):
+    """每个区块一笔 SENDER -> 新地址 的交易，按桶拆分后写入 store。"""
+    for bucket, a, b in store.split(first, last):
+        part = CompactAggregate()
+        for n in range(a, b + 1):
+            part.add_block({'transactions': [{'from': SENDER, 'to': f'0x{n + 1:040x}'}]})
+        store.add_part(bucket, part, a, b)
+
+
+def sent(frame):
+    return int(frame.set_index('address')['sent_txs'].get(SENDER, 0))
+
+
+def test_blocks_are_never_counted_twice():
+    store = ActivityBuckets(10)
+    scan(store, 0, 14)
+    assert store.covered == {0: [(0, 9)], 1: [(10, 14)]}
+    assert store.is_covered(12, 20) and not store.is_covered(15, 20)
+    with pytest.raises(ValueError):
+        scan(store, 14, 16)
+
+
+def test_window_picks_up_blocks_added_to_a_partial_bucket():
+    store = ActivityBuckets(10)
+    scan(store, 0, 14)
+    window = RollingWindow(store, 2)
+    assert sent(window.frame()) == 15
+
+    # 同一个最新桶再补几块：last_bucket 不变，也要计入
+    scan(store, 15, 17)
+    window.advance()
+    assert sent(window.frame()) == 18
+
+    # 补满桶 1 并进入桶 2
+    scan(store, 18, 24)
+    window.advance()
+    assert sent(window.frame()) == sent(RollingWindow(store, 2).frame()) == 15
+
+
+def test_window_slides_like_a_fresh_sum():
+    store = ActivityBuckets(10)
+    window = RollingWindow(store, 3)
+    for first in range(0, 100, 7):
+        scan(store, first, first + 6)
+        window.advance()
+        last = store.latest_bucket()
+        assert sent(window.frame()) == sent(store.window_frame(last, 3))
+        assert window.agg.blocks == store.window(last, 3).blocks
+    assert sorted(window.seen) == [8, 9, 10]
@@ -0,0 +1,76 @@
+"""CompactAggregate：计数与朴素 dict 统计一致，合并/相减/pickle 不丢数；internal_receive_counts 的规则。"""
+import pickle
+import random
+
+from address_agg import CompactAggregate, internal_receive_counts
+
+ADDRS = [f'0x{i:040x}' for i in range(1, 30)]
+CONTRACTS = {a: True for a in ADDRS[:5]}
+
+
+def make_blocks(seed, n=20):
+    rnd = random.Random(seed)
+    return [{'number': hex(b), 'transactions': [
+        {'from': rnd.choice(ADDRS).upper().replace('0X', '0x'), 'to': rnd.choice(ADDRS + [None])}
+        for _ in range(rnd.randint(0, 15))]} for b in range(n)]
+
+
+def naive(blocks):
+    sent, recv, to_contract = {}, {}, {}
+    for block in blocks:
+        for tx in block['transactions']:
+            frm, to = tx['from'].lower(), tx['to']
+            sent[frm] = sent.get(frm, 0) + 1
+            if to:
+                recv[to] = recv.get(to, 0) + 1
+                if to in CONTRACTS:
+                    to_contract[frm] = to_contract.get(frm, 0) + 1
+    return {a: (sent.get(a, 0), recv.get(a, 0), to_contract.get(a, 0)) for a in sorted(set(sent) | set(recv))}
+
+
+def counts(agg):
+    df = agg.frame(CONTRACTS, {})
+    return {r.address: (r.sent_txs, r.received_txs, r.sent_to_contract_txs) for r in df.itertuples()}
+
+
+def test_frame_matches_naive_counts():
+    blocks = make_blocks(1)
+    agg = CompactAggregate(flush_every=7)   # 小 flush 间隔，多次走批量计数路径
+    for block in blocks:
+        agg.add_block(block)
+    assert counts(agg) == naive(blocks)
+    assert agg.txs == sum(len(b['transactions']) for b in blocks)
+    assert agg.recipients() == sorted({tx['to'] for b in blocks for tx in b['transactions'] if tx['to']})
+
+
+def test_merge_subtract_and_pickle():
+    a_blocks, b_blocks = make_blocks(2), make_blocks(3)
+    a, b = CompactAggregate(), CompactAggregate()
+    for block in a_blocks:
+        a.add_block(block)
+    for block in b_blocks:
+        b.add_block(block)
+    b = pickle.loads(pickle.dumps(b))
+    total = CompactAggregate().merge(a).merge(b)
+    assert counts(total) == naive(a_blocks + b_blocks)
+    total.merge(b, sign=-1)
+    assert counts(total) == naive(a_blocks)
+    assert total.blocks == len(a_blocks)
+
+
+def test_internal_receive_counts():
+    x, y = ADDRS[0], ADDRS[1]
+    traces = [
+        {'type': 'call', 'action': {'to': x.upper().replace('0X', '0x'), 'value': '0x10'}},
+        {'type': 'create', 'action': {'to': y, 'value': 5}},
+        {'type': 'call', 'action': {'to': y, 'value': '0x0'}},
+        {'type': 'reward', 'action': {'to': x, 'value': '0x1'}},
+        'garbage',
+    ]
+    assert internal_receive_counts('trace_block', traces) == {x: 1, y: 1}
+
+    tree = {'to': x, 'value': '0x1', 'calls': [{'to': y, 'value': '0x2', 'calls': [{'to': x, 'value': '0x3'}]},
+                                             {'to': y, 'value': '0x0'}]}
+    assert internal_receive_counts('debug_trace', [{'result': tree}]) == {x: 2, y: 1}
+    assert internal_receive_counts('debug_trace', {'0xhash': {'result': tree}}) == {x: 2, y: 1}
+    assert internal_receive_counts(None, None) == {}
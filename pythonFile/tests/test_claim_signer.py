@@ -0,0 +1,53 @@
+"""ClaimSigner：签名与 eth_account 的 EIP-712 结果逐字节一致，进程池批量签名保持输入顺序。"""
+import pytest
+
+from claim_signer import ClaimSigner, sign_claims_batch
+
+eth_account = pytest.importorskip('eth_account')
+encode_typed_data = pytest.importorskip('eth_account.messages').encode_typed_data
+
+KEY = '0x' + '4c' * 32
+CHAIN_ID = 11155111
+CONTRACT = '0x' + '5a' * 20
+CLAIMS = [(f'0x{i + 1:040x}', 600 + i, 1 + i % 4, 100 + i, 1_900_000_000) for i in range(7)]
+
+
+def reference(claim):
+    to, score, tier_id, nonce, deadline = claim
+    typed = {
+        'types': {
+            'EIP712Domain': [{'name': 'name', 'type': 'string'}, {'name': 'version', 'type': 'string'},
+                             {'name': 'chainId', 'type': 'uint256'}, {'name': 'verifyingContract', 'type': 'address'}],
+            'ClaimRequest': [{'name': 'to', 'type': 'address'}, {'name': 'score', 'type': 'uint256'},
+                             {'name': 'tierId', 'type': 'uint8'}, {'name': 'nonce', 'type': 'uint256'},
+                             {'name': 'deadline', 'type': 'uint256'}],
+        },
+        'primaryType': 'ClaimRequest',
+        'domain': {'name': 'CreditScoreBadge', 'version': '1', 'chainId': CHAIN_ID, 'verifyingContract': CONTRACT},
+        'message': {'to': to, 'score': score, 'tierId': tier_id, 'nonce': nonce, 'deadline': deadline},
+    }
+    signable = encode_typed_data(full_message=typed)
+    return signable, eth_account.Account.sign_message(signable, KEY).signature.hex()
+
+
+def test_signature_matches_eth_account():
+    signer = ClaimSigner(KEY, CHAIN_ID, CONTRACT)
+    assert signer.address == eth_account.Account.from_key(KEY).address
+    for claim in CLAIMS[:3]:
+        signable, expected = reference(claim)
+        signed = signer.sign_claim(claim)
+        assert signed['signature'] == expected.removeprefix('0x')
+        assert eth_account.Account.recover_message(signable, signature=bytes.fromhex(signed['signature'])) \
+            == signer.address
+
+
+def test_batch_keeps_input_order():
+    in_process = sign_claims_batch(KEY, CHAIN_ID, CONTRACT, CLAIMS, workers=1)
+    pooled = sign_claims_batch(KEY, CHAIN_ID, CONTRACT, CLAIMS, workers=2, chunk_size=2)
+    assert pooled == in_process
+    assert [s['value']['nonce'] for s in pooled] == [c[3] for c in CLAIMS]
+
+
+def test_invalid_address():
+    with pytest.raises(ValueError):
+        ClaimSigner(KEY, CHAIN_ID, CONTRACT).sign('0x1234', 700, 2, 1, 1)
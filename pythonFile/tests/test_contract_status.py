@@ -0,0 +1,55 @@
+"""ContractClassifier：各条推断规则、冲突证据退回 getCode、分片合并。"""
+import pytest
+
+import contract_status
+from contract_status import ContractClassifier, create_address
+
+EOA, OTHER = '0x' + '11' * 20, '0x' + '22' * 20
+CALLER, CREATED = '0x' + '33' * 20, '0x' + '44' * 20
+DEPLOYER = '0x6ac7ea33f8831ea9dcc53393aaa88b25a785dbf0'
+
+
+@pytest.mark.skipif(contract_status.rlp is None, reason='creation_tx needs rlp')
+def test_create_address():
+    # 常用的 CREATE 地址示例：该地址以 nonce 0 / 1 部署出的合约
+    assert create_address(DEPLOYER, 0) == '0xcd234a471b72ba2f1ccf0a70fcaba648a5eecd8d'
+    assert create_address(DEPLOYER, '0x1') == '0x343c43a37d37dff08ae8c4a11544c718abb4fcf8'
+    assert create_address('not an address', 0) is None
+
+
+def test_rules_and_resolve():
+    clf = ContractClassifier()
+    clf.observe_block({'transactions': [{'from': EOA.upper().replace('0X', '0x'), 'to': OTHER}]})
+    clf.observe_trace('trace_block', [
+        {'type': 'call', 'traceAddress': [], 'action': {'from': EOA, 'to': OTHER}},
+        {'type': 'call', 'traceAddress': [0], 'action': {'from': CALLER, 'to': OTHER}},
+        {'type': 'create', 'result': {'address': CREATED}},
+    ])
+    known, unknown = clf.resolve([EOA, CALLER, CREATED, OTHER])
+    assert known == {EOA: False, CALLER: True, CREATED: True}
+    assert unknown == [OTHER]
+    assert clf.stats()['saved_by_rule'] == {'tx_sender': 1, 'creation_tx': 0, 'create_trace': 1, 'internal_caller': 1}
+    assert clf.stats()['get_code_calls'] == 1
+
+
+def test_debug_trace_and_failed_create():
+    clf = ContractClassifier()
+    tree = {'type': 'CALL', 'from': EOA, 'to': OTHER, 'calls': [
+        {'type': 'CREATE2', 'from': OTHER, 'to': CREATED},
+        {'type': 'CREATE', 'from': OTHER, 'to': CALLER, 'error': 'out of gas'},
+    ]}
+    clf.observe_trace('debug_trace', {'0xhash': {'result': tree}})
+    known, unknown = clf.resolve([EOA, OTHER, CREATED, CALLER])
+    # 根调用的 from 不作证据；OTHER 发起了内部调用，是合约
+    assert known == {OTHER: True, CREATED: True}
+    assert unknown == [EOA, CALLER]
+
+
+def test_conflicting_evidence_goes_to_get_code():
+    a, b = ContractClassifier(), ContractClassifier()
+    a.observe_block({'transactions': [{'from': CALLER, 'to': OTHER}]})
+    b.observe_trace('trace_block', [{'type': 'call', 'traceAddress': [1], 'action': {'from': CALLER}}])
+    assert b.resolve([CALLER])[0] == {CALLER: True}
+    a.merge(b)
+    assert a.resolve([CALLER]) == ({}, [CALLER])
+    assert a.stats()['conflicts'] == 1
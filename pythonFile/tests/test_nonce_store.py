@@ -0,0 +1,40 @@
+"""NonceAllocator：分配/落盘/重开后不复用，写失败时回滚，连接仍可继续用。"""
+import pytest
+
+from nonce_store import NonceAllocator
+
+A = '0x' + 'aa' * 20
+B = '0x' + 'bb' * 20
+
+
+def test_allocate_flush_reopen(tmp_path):
+    path = str(tmp_path / 'nonces.sqlite3')
+    store = NonceAllocator(path, block_size=4, flush_every=100)
+    first = [store.allocate(A) for _ in range(6)]
+    assert first == list(range(1, 7))
+    assert store.allocate_many([B, B.upper()]) == [9, 10]   # 第二块剩下的 7、8 不再用
+    store.close()
+
+    store = NonceAllocator(path, block_size=4)
+    assert store.allocate(A) == 11
+    store.mark_consumed([(A, 1), (A.upper(), 2)])
+    assert store.status(A) == {'issued': 7, 'consumed': 2, 'outstanding': 5, 'last_nonce': 11}
+    assert store.status(B)['issued'] == 2
+    store.close()
+
+
+def test_failed_writes_roll_back(tmp_path):
+    store = NonceAllocator(str(tmp_path / 'nonces.sqlite3'), block_size=4)
+    store.allocate(A)
+
+    with pytest.raises(ValueError):
+        store.mark_consumed([(A, 'not a nonce')])
+    store.mark_consumed([(A, 1)])
+
+    store._pending.append((A, object(), 0))   # sqlite 绑定不了的值，executemany 失败
+    with pytest.raises(Exception):
+        store.flush()
+    store._pending.pop()
+    store.flush()
+    assert store.status(A) == {'issued': 1, 'consumed': 1, 'outstanding': 0, 'last_nonce': 1}
+    store.close()
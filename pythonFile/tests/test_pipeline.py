@@ -0,0 +1,58 @@
+"""pipeline rpc 源：按块扫描、逐块输出；各块的行加起来与一次性 scan_range 的结果一致。"""
+import asyncio
+import sys
+
+import pandas as pd
+import pytest
+
+import pipeline
+from rpc_replay import start_replay_server, synth_fixtures
+from scan_eth_highperf_api import RPCClient, scan_range
+
+FIRST, BLOCKS = 20_000_000, 12
+COUNTERS = ['total_txs', 'sent_txs', 'received_txs', 'sent_to_contract_txs', 'internal_txs']
+
+
+@pytest.fixture(scope='module')
+def rpc_url():
+    server, url = start_replay_server(synth_fixtures(blocks=BLOCKS, txs_per_block=20, n_addrs=300, first_block=FIRST))
+    yield url
+    server.shutdown()
+
+
+def run_pipeline(monkeypatch, tmp_path, url, *extra):
+    out = tmp_path / 'claims.jsonl'
+    monkeypatch.setattr(sys, 'argv', ['pipeline.py', '--no-sign', '--chunk-size', '50', '--output', str(out),
+                                      'rpc', '--rpc', url, '--start', str(FIRST), '--end', str(FIRST + BLOCKS - 1),
+                                      '--trace', *extra])
+    pipeline.main()
+    return pd.read_json(out, lines=True)
+
+
+def reference(url):
+    async def scan():
+        async with RPCClient([url]) as client:
+            return await scan_range(client, FIRST, FIRST + BLOCKS - 1, trace_enabled=True)
+    return asyncio.run(scan()).set_index('address')
+
+
+def test_chunks_add_up_to_a_full_scan(monkeypatch, tmp_path, rpc_url):
+    rows = run_pipeline(monkeypatch, tmp_path, rpc_url, '--scan-chunk-blocks', '5')
+    assert sorted(rows.groupby(['first_block', 'last_block']).groups) == [
+        (FIRST, FIRST + 4), (FIRST + 5, FIRST + 9), (FIRST + 10, FIRST + 11)]
+    assert not rows.duplicated(['address', 'first_block']).any()
+    assert rows['tier'].between(0, 4).all() and rows['score'].between(100, 800).all()
+
+    ref = reference(rpc_url)
+    summed = rows.groupby('address')[COUNTERS].sum().sort_index()
+    pd.testing.assert_frame_equal(summed, ref[COUNTERS].sort_index(), check_dtype=False, check_names=False)
+    balances = rows.drop_duplicates('address').set_index('address')['eth_balance']
+    pd.testing.assert_series_equal(balances.sort_index(), ref['eth_balance'].sort_index(), check_names=False)
+
+
+def test_single_chunk_matches_full_scan(monkeypatch, tmp_path, rpc_url):
+    rows = run_pipeline(monkeypatch, tmp_path, rpc_url, '--scan-chunk-blocks', '0', '--workers', '2').set_index('address')
+    assert (rows['first_block'] == FIRST).all()
+    ref = reference(rpc_url)
+    pd.testing.assert_frame_equal(rows[COUNTERS].sort_index(), ref[COUNTERS].sort_index(), check_dtype=False,
+                                  check_names=False)